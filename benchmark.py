@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+追踪流水线基准测试
+
+分别测量流水线各阶段和端到端的性能:
+    capture/<分辨率>     截图转换为模型输入(去alpha + letterbox)及帧差检测, 合成1080p/1440p/4K画面
+    inference/<后端>     各推理后端在 valid/images 固定帧上的延迟
+    select/<策略>        目标选择
+    tracker/update       跟踪器关联与卡尔曼更新
+    e2e/<来源>           replay.py 的完整流水线(合成画面和 valid/images)
+
+所有输入固定(文件名排序后的前N帧、固定随机种子), 结果追加到JSON历史文件;
+compare 子命令比较最近一次与基线, 吞吐量下降或延迟上升超过阈值时以非零状态退出。
+
+用法:
+    python benchmark.py run --model best.pt --backends torch onnx
+    python benchmark.py compare --threshold 0.1
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+RESOLUTIONS = (('1080p', 1920, 1080), ('1440p', 2560, 1440), ('4k', 3840, 2160))
+DEFAULT_HISTORY = os.path.join('runs', 'benchmark', 'history.json')
+
+
+def time_call(fn, repeats=50, warmup=5):
+    """重复调用fn, 返回每次耗时的统计"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000.0
+    return {
+        'mean_ms': float(times.mean()),
+        'p50_ms': float(np.percentile(times, 50)),
+        'p95_ms': float(np.percentile(times, 95)),
+        'fps': float(1000.0 / times.mean()),
+        'repeats': repeats,
+    }
+
+
+def synthetic_screen(width, height, seed=0):
+    """固定随机种子的合成BGRA截图"""
+    from frame_sources import SyntheticSource
+    return SyntheticSource(width, height, count=1, seed=seed).read()['parts'][0]['img']
+
+
+def bench_capture(imgsz=640, repeats=50):
+    """截图转换和帧差检测"""
+    from change_detector import ChangeDetector
+    from frame_grabber import InputBuffer
+    results = {}
+    for label, width, height in RESOLUTIONS:
+        screen = synthetic_screen(width, height)
+        buffer = InputBuffer(imgsz)
+        results['capture/{}'.format(label)] = time_call(lambda: buffer.prepare(screen), repeats)
+        # 同一帧反复检查: max_reuse不能在计时期间触发, 否则测到的是提前返回的整帧路径
+        detector = ChangeDetector(max_reuse=repeats + 5)
+        detector.commit(screen)
+        results['change/{}'.format(label)] = time_call(lambda: detector.check(screen), repeats, warmup=5)
+    return results
+
+
+def bench_inference(engines, frames, repeats=3):
+    """各推理后端在相同帧上的延迟"""
+    results = {}
+    for engine in engines:
+        state = {'i': 0}
+
+        def run():
+            engine.infer(frames[state['i'] % len(frames)])
+            state['i'] += 1
+        results['inference/{}'.format(engine.name)] = time_call(run, repeats * len(frames), warmup=3)
+    return results
+
+
+def bench_select(count=50, repeats=2000, seed=0):
+    """各选择策略在固定的随机检测框上"""
+    from box_select import SELECTION_POLICIES, select_index
+    rng = np.random.RandomState(seed)
+    xy = rng.uniform(0, 1800, size=(count, 2))
+    wh = rng.uniform(10, 200, size=(count, 2))
+    xyxy = np.hstack([xy, xy + wh]).astype(np.float32)
+    conf = rng.uniform(0.3, 1.0, size=count).astype(np.float32)
+    context = {'crosshair': (960.0, 540.0), 'previous': (500.0, 500.0)}
+    return dict(('select/{}'.format(policy), time_call(lambda: select_index(xyxy, conf, policy, **context), repeats))
+                for policy in sorted(SELECTION_POLICIES))
+
+
+def bench_tracker(targets=10, repeats=1000, seed=0):
+    """跟踪器关联与更新: targets个匀速目标"""
+    from target_tracker import TargetTracker
+    rng = np.random.RandomState(seed)
+    start = rng.uniform(100, 1500, size=(targets, 2))
+    velocity = rng.uniform(-200, 200, size=(targets, 2))
+    tracker = TargetTracker()
+    state = {'frame': 0}
+
+    def run():
+        t = state['frame'] / 60.0
+        xy = start + velocity * t
+        boxes = np.hstack([xy, xy + 40]).astype(np.float32)
+        tracker.update(boxes, t)
+        state['frame'] += 1
+    return {'tracker/update': time_call(run, repeats)}
+
+
+def bench_end_to_end(engine, class_id, valid_dir, frames=100, imgsz=640):
+    """replay.py 的完整流水线: 合成画面与 valid/images"""
+    from frame_sources import ImageDirSource, SyntheticSource
+    from replay import replay
+    sources = [('e2e/synthetic-{}'.format(label), lambda w=width, h=height: SyntheticSource(w, h, count=frames))
+               for label, width, height in RESOLUTIONS]
+    if os.path.isdir(valid_dir):
+        sources.append(('e2e/valid', lambda: ImageDirSource(valid_dir, class_id=class_id, limit=frames)))
+    results = {}
+    for name, make_source in sources:
+        source = make_source()
+        try:
+            report = replay(engine, source, class_id, imgsz=imgsz)
+        finally:
+            source.close()
+        results[name] = {
+            'mean_ms': report['frame_ms']['mean'],
+            'p50_ms': report['frame_ms']['p50'],
+            'p95_ms': report['frame_ms']['p95'],
+            'fps': report['fps'],
+            'repeats': report['frames'],
+            'hit_rate': report['hit_rate'],
+        }
+    return results
+
+
+def environment():
+    """记录运行环境, 便于判断结果是否可比"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+
+
+def run_suite(model=None, backends=('torch',), valid_dir='valid/images', frames=20, imgsz=640,
+              target_class='tank', e2e_frames=100, skip_e2e=False):
+    """运行全部基准测试, 返回一次运行的记录"""
+    from inference_backends import load_engine, load_frames
+    results = {}
+    print("截图转换 / 帧差检测...")
+    results.update(bench_capture(imgsz))
+    print("目标选择...")
+    results.update(bench_select())
+    print("跟踪器更新...")
+    results.update(bench_tracker())
+
+    engines = []
+    if model:
+        for backend in backends:
+            try:
+                engines.append(load_engine(backend, model, imgsz))
+            except Exception as e:
+                print("[WARNING] 跳过后端 {}: {}".format(backend, e))
+    if engines:
+        bench_frames = load_frames(valid_dir, frames) if os.path.isdir(valid_dir) else []
+        if not bench_frames:
+            print("[WARNING] {} 中没有图像, 使用合成画面".format(valid_dir))
+            bench_frames = [synthetic_screen(width, height)[..., :3].copy() for _, width, height in RESOLUTIONS]
+        print("推理后端: {} ({} 帧)...".format(", ".join(e.name for e in engines), len(bench_frames)))
+        results.update(bench_inference(engines, bench_frames))
+
+        if not skip_e2e:
+            from box_select import resolve_class_id
+            engine = engines[0]
+            class_id = resolve_class_id(engine.names, target_class)
+            print("端到端 ({} 后端)...".format(engine.name))
+            results.update(bench_end_to_end(engine, class_id, valid_dir, e2e_frames, imgsz))
+
+    record = environment()
+    record.update(model=model, imgsz=imgsz, results=results)
+    return record
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+
+
+def compare_runs(baseline, current, threshold=0.1):
+    """
+    比较两次运行
+    返回:
+        [(名称, 基线p50_ms, 当前p50_ms, 基线fps, 当前fps, 是否回归)]
+        延迟(p50)上升或吞吐下降超过threshold比例视为回归
+    """
+    rows = []
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        base, cur = baseline['results'][name], current['results'][name]
+        slower = cur['p50_ms'] > base['p50_ms'] * (1.0 + threshold)
+        lower = cur['fps'] < base['fps'] * (1.0 - threshold)
+        rows.append((name, base['p50_ms'], cur['p50_ms'], base['fps'], cur['fps'], slower or lower))
+    return rows
+
+
+def print_results(record):
+    print("\n{:<24} {:>10} {:>10} {:>10} {:>10}".format('基准', 'mean(ms)', 'p50(ms)', 'p95(ms)', '次/秒'))
+    for name, r in sorted(record['results'].items()):
+        print("{:<24} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.1f}".format(
+            name, r['mean_ms'], r['p50_ms'], r['p95_ms'], r['fps']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="追踪流水线基准测试")
+    sub = parser.add_subparsers(dest='command')
+
+    run = sub.add_parser('run', help="运行基准测试并追加到历史文件")
+    run.add_argument('--model', default=None, help="模型权重; 不指定时只测不需要模型的阶段")
+    run.add_argument('--backends', nargs='+', default=['torch'])
+    run.add_argument('--valid', default='valid/images', help="固定帧集目录")
+    run.add_argument('--frames', type=int, default=20, help="推理基准使用的帧数")
+    run.add_argument('--e2e-frames', type=int, default=100, help="端到端基准每个来源的帧数")
+    run.add_argument('--skip-e2e', action='store_true')
+    run.add_argument('--imgsz', type=int, default=640)
+    run.add_argument('--target-class', default='tank')
+    run.add_argument('--history', default=DEFAULT_HISTORY)
+
+    compare = sub.add_parser('compare', help="比较最近一次运行与基线")
+    compare.add_argument('--history', default=DEFAULT_HISTORY)
+    compare.add_argument('--baseline', type=int, default=-2, help="基线在历史中的序号, 默认倒数第二次")
+    compare.add_argument('--current', type=int, default=-1, help="当前运行在历史中的序号, 默认最近一次")
+    compare.add_argument('--threshold', type=float, default=0.1, help="允许的相对变化, 0.1表示10%%")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        record = run_suite(args.model, args.backends, args.valid, args.frames, args.imgsz,
+                           args.target_class, args.e2e_frames, args.skip_e2e)
+        print_results(record)
+        history = load_history(args.history)
+        history.append(record)
+        save_history(args.history, history)
+        print("\n结果已追加到 {} (共 {} 次运行)".format(args.history, len(history)))
+    elif args.command == 'compare':
+        history = load_history(args.history)
+        if len(history) < 2:
+            print("[ERROR] {} 中至少需要两次运行".format(args.history))
+            sys.exit(2)
+        baseline, current = history[args.baseline], history[args.current]
+        print("基线: {} ({})  当前: {} ({})".format(baseline['timestamp'], baseline['commit'],
+                                              current['timestamp'], current['commit']))
+        rows = compare_runs(baseline, current, args.threshold)
+        print("\n{:<24} {:>12} {:>12} {:>10} {:>10}  {}".format('基准', '基线p50(ms)', '当前p50(ms)', '基线次/秒', '当前次/秒', ''))
+        for name, base_ms, cur_ms, base_fps, cur_fps, regressed in rows:
+            print("{:<24} {:>12.3f} {:>12.3f} {:>10.1f} {:>10.1f}  {}".format(
+                name, base_ms, cur_ms, base_fps, cur_fps, "[REGRESSION]" if regressed else "[OK]"))
+        regressions = [row[0] for row in rows if row[5]]
+        if regressions:
+            print("\n{} 项回归超过 {:.0%}: {}".format(len(regressions), args.threshold, ", ".join(regressions)))
+            sys.exit(1)
+        print("\n没有超过 {:.0%} 的回归".format(args.threshold))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
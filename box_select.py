@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+检测框的批量筛选与目标选择
+
+类别过滤、置信度过滤和打分全部在NumPy数组上一次完成,
+不再对每个框单独做张量到Python的转换。
+"""
+import numpy as np
+
+
+def boxes_to_numpy(boxes):
+    """
+    把Ultralytics的Boxes对象一次性转换为NumPy数组
+    返回:
+        (xyxy, conf, cls), 形状分别为 (N, 4), (N,), (N,)
+    """
+    if boxes is None or len(boxes) == 0:
+        return (np.zeros((0, 4), dtype=np.float32),
+                np.zeros((0,), dtype=np.float32),
+                np.zeros((0,), dtype=np.float32))
+    data = boxes.data
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    data = np.asarray(data)
+    # data的列: x1, y1, x2, y2, [track_id,] conf, cls
+    return data[:, :4], data[:, -2], data[:, -1]
+
+
+def _centers(xyxy):
+    return (xyxy[:, 0:2] + xyxy[:, 2:4]) * 0.5
+
+
+def score_largest(xyxy, conf, context):
+    """面积最大的目标"""
+    return (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+
+
+def score_confidence(xyxy, conf, context):
+    """置信度最高的目标"""
+    return conf
+
+
+def score_crosshair(xyxy, conf, context):
+    """离准星(画面中心或指定点)最近的目标"""
+    point = context.get('crosshair')
+    if point is None:
+        return score_largest(xyxy, conf, context)
+    d = _centers(xyxy) - np.asarray(point, dtype=np.float32)
+    return -(d * d).sum(axis=1)
+
+
+def score_previous(xyxy, conf, context):
+    """离上一个目标最近的目标, 没有上一个目标时退化为面积最大"""
+    point = context.get('previous')
+    if point is None:
+        return score_largest(xyxy, conf, context)
+    d = _centers(xyxy) - np.asarray(point, dtype=np.float32)
+    return -(d * d).sum(axis=1)
+
+
+SELECTION_POLICIES = {
+    'largest': score_largest,
+    'confidence': score_confidence,
+    'crosshair': score_crosshair,
+    'previous': score_previous,
+}
+
+
+def get_policy(policy):
+    """根据名称获取打分函数, 也可以直接传入自定义函数 f(xyxy, conf, context)"""
+    if callable(policy):
+        return policy
+    if policy not in SELECTION_POLICIES:
+        raise ValueError("未知的目标选择策略: {} (可选: {})".format(
+            policy, ", ".join(sorted(SELECTION_POLICIES))))
+    return SELECTION_POLICIES[policy]
+
+
+def resolve_class_id(names, target_class):
+    """按类别名查找类别ID, 先完全匹配再部分匹配, 找不到时返回None"""
+    target_lower = target_class.lower()
+    for k, v in names.items():
+        if v.lower() == target_lower:
+            return k
+    for k, v in names.items():
+        if target_lower in v.lower() or v.lower() in target_lower:
+            return k
+    return None
+
+
+def filter_boxes(xyxy, conf, cls, class_id, confidence):
+    """
+    按类别和置信度过滤检测框
+    返回:
+        (xyxy, conf), 过滤后的副本
+    """
+    idx = np.flatnonzero((cls == class_id) & (conf > confidence))
+    return xyxy[idx], conf[idx]
+
+
+def select_index(xyxy, conf, policy='largest', **context):
+    """
+    按策略从(已过滤的)检测框中选出一个
+    参数:
+        xyxy, conf: 检测框坐标和置信度数组
+        policy: 选择策略名称或打分函数, 分数最高者被选中
+        context: 传给打分函数的附加信息, 如crosshair=(x, y), previous=(x, y)
+    返回:
+        选中框的下标, 没有检测框时返回None
+    """
+    if len(xyxy) == 0:
+        return None
+    scores = get_policy(policy)(xyxy, conf, context)
+    return int(np.argmax(scores))
+
+
+def select_target(xyxy, conf, cls, class_id, confidence, policy='largest', **context):
+    """
+    从一批检测框中选出一个目标
+    参数:
+        xyxy, conf, cls: 检测框坐标、置信度和类别数组
+        class_id: 目标类别ID
+        confidence: 置信度阈值
+        policy: 选择策略名称或打分函数, 分数最高者被选中
+        context: 传给打分函数的附加信息, 如crosshair=(x, y), previous=(x, y)
+    返回:
+        (x1, y1, x2, y2, conf), 没有符合条件的目标时返回None
+    """
+    xyxy, conf = filter_boxes(xyxy, conf, cls, class_id, confidence)
+    best = select_index(xyxy, conf, policy, **context)
+    if best is None:
+        return None
+    x1, y1, x2, y2 = xyxy[best].astype(int)
+    return int(x1), int(y1), int(x2), int(y2), float(conf[best])
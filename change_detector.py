@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+推理前的画面变化检测
+
+把帧按面积平均降采样后按块计算与参考帧的平均绝对差(SAD)和最大绝对差,
+平均差反映大面积的缓慢变化, 最大差保证只占块内少数采样点的小目标移动不会被平均掉;
+面积平均使小于采样步长的目标移动一个像素也会改变采样值:
+    - 没有块发生变化: 'static', 直接复用上一次的检测结果
+    - 少量块发生变化: 'partial', 只对变化区域做推理
+    - 大面积变化或区域不同: 'full', 整帧推理
+"""
+import cv2
+import numpy as np
+
+STATIC = 'static'
+PARTIAL = 'partial'
+FULL = 'full'
+
+
+class ChangeDetector(object):
+    """
+    块级帧差检测器
+    参数:
+        step: 降采样步长(像素)
+        block: 降采样后每个块的边长
+        threshold: 块内平均绝对差超过该值(0-255)视为变化
+        peak_threshold: 块内任一采样点的绝对差超过该值视为变化(小目标, 采样已平均掉噪声)
+        full_ratio: 变化块比例超过该值时整帧推理
+        margin: 变化区域向外扩展的像素数, 保证跨边界的目标完整
+        max_reuse: 连续复用检测结果的最大帧数, 超过后强制整帧推理
+    """
+
+    def __init__(self, step=8, block=8, threshold=6.0, peak_threshold=12, full_ratio=0.4, margin=64, max_reuse=8):
+        self.step = step
+        self.block = block
+        self.threshold = threshold
+        self.peak_threshold = peak_threshold
+        self.full_ratio = full_ratio
+        self.margin = margin
+        self.max_reuse = max_reuse
+        self.stats = {STATIC: 0, PARTIAL: 0, FULL: 0}
+        self._ref = None
+        self._key = None
+        self._reused = 0
+
+    def _sample(self, bgra):
+        """绿色通道(近似亮度)按step x step面积平均降采样"""
+        h, w = bgra.shape[:2]
+        size = (max(1, w // self.step), max(1, h // self.step))
+        return cv2.resize(cv2.extractChannel(bgra, 1), size, interpolation=cv2.INTER_AREA)
+
+    def check(self, bgra, offset=(0, 0)):
+        """
+        比较当前帧与参考帧
+        参数:
+            bgra: 当前帧 (H, W, 4)
+            offset: 当前帧在全屏中的偏移, 偏移或尺寸变化时视为整帧变化
+        返回:
+            (mode, region), mode为'static'/'partial'/'full',
+            region为'partial'时需要推理的区域 (x1, y1, x2, y2), 帧内坐标
+        """
+        key = (tuple(offset), bgra.shape)
+        if self._ref is None or key != self._key or self._reused >= self.max_reuse:
+            self.stats[FULL] += 1
+            return FULL, None
+
+        sample = self._sample(bgra)
+        diff = np.abs(sample.astype(np.int16) - self._ref)
+        b = self.block
+        nby, nbx = diff.shape[0] // b, diff.shape[1] // b
+        if nby == 0 or nbx == 0:
+            self.stats[FULL] += 1
+            return FULL, None
+        blocks = diff[:nby * b, :nbx * b].reshape(nby, b, nbx, b)
+        changed = (blocks.mean(axis=(1, 3)) > self.threshold) | (blocks.max(axis=(1, 3)) > self.peak_threshold)
+        ratio = changed.mean()
+
+        if ratio == 0:
+            self._reused += 1
+            self.stats[STATIC] += 1
+            return STATIC, None
+        if ratio > self.full_ratio:
+            self.stats[FULL] += 1
+            return FULL, None
+
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        scale = b * self.step
+        h, w = bgra.shape[:2]
+        # 采样尺寸不能整除块大小时, 末尾的行列归入最后一个块
+        y2 = h if rows[-1] == nby - 1 else (rows[-1] + 1) * scale
+        x2 = w if cols[-1] == nbx - 1 else (cols[-1] + 1) * scale
+        region = (max(0, cols[0] * scale - self.margin), max(0, rows[0] * scale - self.margin),
+                  min(w, x2 + self.margin), min(h, y2 + self.margin))
+        self.stats[PARTIAL] += 1
+        return PARTIAL, tuple(int(v) for v in region)
+
+    def commit(self, bgra, offset=(0, 0)):
+        """推理完成后把当前帧设为参考帧"""
+        sample = self._sample(bgra)
+        if self._ref is None or self._ref.shape != sample.shape:
+            self._ref = np.empty(sample.shape, dtype=np.int16)
+        np.copyto(self._ref, sample)
+        self._key = (tuple(offset), bgra.shape)
+        self._reused = 0
+
+
+def merge_detections(cached_xyxy, cached_conf, new_xyxy, new_conf, region):
+    """
+    局部推理后合并检测结果: 丢弃与变化区域相交的旧框, 加入新框
+    参数:
+        region: 变化区域 (x1, y1, x2, y2), 与检测框同一坐标系
+    """
+    x1, y1, x2, y2 = region
+    outside = ((cached_xyxy[:, 2] <= x1) | (cached_xyxy[:, 0] >= x2) |
+               (cached_xyxy[:, 3] <= y1) | (cached_xyxy[:, 1] >= y2))
+    return (np.concatenate([cached_xyxy[outside], new_xyxy]),
+            np.concatenate([cached_conf[outside], new_conf]))
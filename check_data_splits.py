@@ -61,15 +61,15 @@ def check_data_splits():
                     with open(label_path, 'r') as f:
                         lines = [line.strip() for line in f.readlines() if line.strip()]
                         print(f"  {label_file}: {len(lines)} objects")
-                            
-                            # Check for negative class IDs
-                            for i, line in enumerate(lines):
-                                try:
-                                    class_id = int(float(line.split()[0]))
-                                    if class_id < 0:
-                                        print(f"    [ERROR] Negative class ID in {label_file}, line {i+1}: {class_id}")
-                                except (ValueError, IndexError) as e:
-                                    print(f"    [ERROR] Error parsing {label_file}, line {i+1}: {line}")
+
+                        # Check for negative class IDs
+                        for i, line in enumerate(lines):
+                            try:
+                                class_id = int(float(line.split()[0]))
+                                if class_id < 0:
+                                    print(f"    [ERROR] Negative class ID in {label_file}, line {i+1}: {class_id}")
+                            except (ValueError, IndexError) as e:
+                                print(f"    [ERROR] Error parsing {label_file}, line {i+1}: {line}")
     
     print("\nData split check complete!")
 
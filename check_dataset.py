@@ -1,6 +1,6 @@
 import os
 import yaml
-import cv2
+from image_meta import image_size
 import numpy as np
 
 def load_yaml(file_path):
@@ -9,10 +9,9 @@ def load_yaml(file_path):
 
 def check_image_file(img_path):
     try:
-        img = cv2.imread(img_path)
-        if img is None:
-            return False, "Failed to load image"
-        if img.size == 0:
+        # Only the header is read; corrupt headers fall back to a full decode
+        width, height = image_size(img_path)
+        if width == 0 or height == 0:
             return False, "Empty image"
         return True, "OK"
     except Exception as e:
@@ -129,7 +128,8 @@ def check_dataset():
     
     print("\nSample training label:", sample_label)
     if os.path.exists(sample_label):
-        label_ok, label_msg = check_label_file(sample_label)
+        img_shape = image_size(sample_img)[::-1] if img_ok else None
+        label_ok, label_msg = check_label_file(sample_label, img_shape)
         print("  Label check:", "OK" if label_ok else "ERROR: " + label_msg)
     else:
         print("  [ERROR] Label file not found:", sample_label)
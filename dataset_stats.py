@@ -0,0 +1,284 @@
+"""
+Full-dataset label statistics.
+
+Computes, over every label of every split (no sampling, no image decoding),
+vectorized over the label index (label_index.py):
+
+    classes         box count and images containing each class, per split
+    objects         objects per image histogram, empty-image and missing-label ratio
+    boxes           normalized and pixel width/height/area/aspect percentiles,
+                    small/medium/large counts at the training image size
+    positions       10x10 histogram of box centers
+    duplicates      exact duplicate boxes and same-class overlaps above an IoU threshold
+    anchors         k-means width/height clusters at the training image size and
+                    the share of boxes within 4x of a cluster (best possible recall)
+
+Image sizes are read from file headers (image_meta.py) to convert boxes to
+pixels. Results are written as JSON and, optionally, as a summary plot.
+
+Usage:
+    python dataset_stats.py --data data.yaml --out dataset_stats.json
+    python dataset_stats.py --data data.yaml --plot dataset_stats.png --imgsz 640
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from dataset_validator import load_yaml, resolve_split_dirs
+from label_index import load_label_index
+
+PERCENTILES = (0, 1, 5, 25, 50, 75, 95, 99, 100)
+# COCO area thresholds, in pixels at the training image size
+SMALL_AREA = 32 ** 2
+LARGE_AREA = 96 ** 2
+GRID = 10
+ANCHOR_RATIO = 4.0
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    result = dict(('p{}'.format(p), float(v)) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+    result['mean'] = float(values.mean())
+    return result
+
+
+def image_sizes(image_dir, stems):
+    """(width, height) of every image from its header, NaN where unreadable"""
+    from image_meta import image_size
+    names = dict((os.path.splitext(f)[0], f) for f in os.listdir(image_dir))
+    sizes = np.full((len(stems), 2), np.nan)
+    for i, stem in enumerate(stems):
+        try:
+            sizes[i] = image_size(os.path.join(image_dir, names[stem]), fallback=False)
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+    return sizes
+
+
+def within_image_pairs(offsets):
+    """All (i, j) row pairs with i < j that belong to the same image"""
+    counts = np.diff(offsets)
+    rows = np.arange(offsets[-1])
+    image_end = np.repeat(offsets[1:], counts)
+    partners = image_end - rows - 1
+    first = np.repeat(rows, partners)
+    starts = np.cumsum(partners) - partners
+    second = first + 1 + (np.arange(len(first)) - np.repeat(starts, partners))
+    return first, second
+
+
+def pair_iou(a, b):
+    """Elementwise IoU of two (N, 4) xyxy arrays"""
+    w = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-12)
+
+
+def duplicate_stats(index, iou_threshold=0.9):
+    """Exact duplicates (same class, same coordinates to 1e-4) and same-class overlaps"""
+    labels = index.labels
+    first, second = within_image_pairs(index.offsets)
+    same_class = labels['cls'][first] == labels['cls'][second]
+    first, second = first[same_class], second[same_class]
+    coords = np.stack([labels[c] for c in ('cx', 'cy', 'w', 'h')], axis=1).astype(np.float64)
+    exact = (np.abs(coords[first] - coords[second]) < 1e-4).all(axis=1)
+    xyxy = np.concatenate([coords[:, :2] - coords[:, 2:] / 2, coords[:, :2] + coords[:, 2:] / 2], axis=1)
+    overlap = pair_iou(xyxy[first], xyxy[second]) >= iou_threshold
+    overlap &= ~exact
+    images = np.unique(labels['image_idx'][first[exact | overlap]])
+    return {
+        'exact_duplicates': int(exact.sum()),
+        'overlapping_pairs': int(overlap.sum()),
+        'iou_threshold': iou_threshold,
+        'images_affected': int(len(images)),
+        'examples': [index.stems[i] for i in images[:10]],
+    }
+
+
+def kmeans_anchors(wh, k=9, iterations=30, seed=0):
+    """k-means on box width/height with 1 - IoU distance; returns clusters sorted by area"""
+    wh = wh[np.isfinite(wh).all(axis=1) & (wh > 0).all(axis=1)]
+    if len(wh) < k:
+        return None
+    rng = np.random.RandomState(seed)
+    clusters = wh[rng.choice(len(wh), k, replace=False)]
+    for _ in range(iterations):
+        inter = np.minimum(wh[:, None, :], clusters[None, :, :]).prod(axis=2)
+        iou = inter / (wh.prod(axis=1)[:, None] + clusters.prod(axis=1)[None, :] - inter)
+        assign = iou.argmax(axis=1)
+        updated = np.array([np.median(wh[assign == c], axis=0) if (assign == c).any() else clusters[c]
+                            for c in range(k)])
+        if np.allclose(updated, clusters):
+            break
+        clusters = updated
+    return clusters[np.argsort(clusters.prod(axis=1))]
+
+
+def anchor_stats(wh, k=9):
+    clusters = kmeans_anchors(wh, k)
+    if clusters is None:
+        return None
+    wh = wh[np.isfinite(wh).all(axis=1) & (wh > 0).all(axis=1)]
+    ratio = wh[:, None, :] / clusters[None, :, :]
+    worst = np.maximum(ratio, 1.0 / ratio).max(axis=2)
+    best = worst.min(axis=1)
+    return {
+        'clusters_wh': np.round(clusters, 1).tolist(),
+        'best_possible_recall': float((best < ANCHOR_RATIO).mean()),
+        'mean_best_ratio': float(best.mean()),
+    }
+
+
+def split_stats(index, names, image_dir, imgsz=640):
+    """Statistics of one split"""
+    labels = index.labels
+    counts = index.counts()
+    nc = max(len(names), int(labels['cls'].max()) + 1 if len(labels) else 0)
+    known = labels['cls'] >= 0
+    cls = labels['cls'][known].astype(np.int64)
+    class_boxes = np.bincount(cls, minlength=nc)
+    class_images = np.bincount(np.unique(labels['image_idx'][known] * np.int64(nc) + cls) % nc, minlength=nc)
+
+    w, h = labels['w'].astype(np.float64), labels['h'].astype(np.float64)
+    cx, cy = labels['cx'].astype(np.float64), labels['cy'].astype(np.float64)
+    stats = {
+        'images': len(index),
+        'boxes': int(len(labels)),
+        'classes': dict((names[c] if c < len(names) else str(c),
+                         {'boxes': int(class_boxes[c]), 'images': int(class_images[c])}) for c in range(nc)),
+        'objects_per_image': {
+            'mean': float(counts.mean()) if len(counts) else 0.0,
+            'max': int(counts.max()) if len(counts) else 0,
+            'histogram': np.bincount(np.minimum(counts, 20)).tolist(),  # last bin: 20 or more
+        },
+        'empty_ratio': float(index.empty().mean()) if len(index) else 0.0,
+        'missing_ratio': float(index.missing.mean()) if len(index) else 0.0,
+        'unparsable_lines': len(index.bad_lines),
+        'normalized': {'width': percentiles(w), 'height': percentiles(h), 'area': percentiles(w * h),
+                       'aspect': percentiles(w / np.maximum(h, 1e-12))},
+        'positions': {
+            'grid': GRID,
+            'centers': np.histogram2d(cy, cx, bins=GRID, range=[[0, 1], [0, 1]])[0].astype(int).tolist(),
+        },
+        'duplicates': duplicate_stats(index),
+    }
+
+    if image_dir is not None and len(labels):
+        per_image = image_sizes(image_dir, index.stems)
+        sizes = per_image[labels['image_idx']]
+        pixel_w, pixel_h = w * sizes[:, 0], h * sizes[:, 1]
+        # Boxes as the model sees them: longest image side letterboxed to imgsz
+        scale = imgsz / sizes.max(axis=1)
+        model_wh = np.stack([pixel_w * scale, pixel_h * scale], axis=1)
+        model_area = model_wh.prod(axis=1)
+        valid = np.isfinite(model_area)
+        stats['image_sizes'] = dict(('{}x{}'.format(int(a), int(b)), int(n)) for (a, b), n in
+                                    zip(*np.unique(per_image[np.isfinite(per_image).all(axis=1)], axis=0,
+                                                   return_counts=True)))
+        stats['pixels'] = {'width': percentiles(pixel_w), 'height': percentiles(pixel_h)}
+        stats['at_imgsz'] = {
+            'imgsz': imgsz,
+            'width': percentiles(model_wh[:, 0]),
+            'height': percentiles(model_wh[:, 1]),
+            'small': int((model_area[valid] < SMALL_AREA).sum()),
+            'medium': int(((model_area[valid] >= SMALL_AREA) & (model_area[valid] < LARGE_AREA)).sum()),
+            'large': int((model_area[valid] >= LARGE_AREA).sum()),
+        }
+        stats['anchors'] = anchor_stats(model_wh)
+    return stats
+
+
+def dataset_stats(data_yaml='data.yaml', imgsz=640, use_cache=True):
+    """Statistics of every split in data.yaml"""
+    config = load_yaml(data_yaml)
+    names = config.get('names') or []
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    report = {'data': data_yaml, 'names': names, 'imgsz': imgsz, 'splits': {}}
+    for split, img_dir, label_dir in resolve_split_dirs(data_yaml, config):
+        if not os.path.isdir(label_dir):
+            continue
+        image_dir = img_dir if os.path.isdir(img_dir) else None
+        index = load_label_index(label_dir, image_dir, use_cache=use_cache)
+        report['splits'][split] = split_stats(index, names, image_dir, imgsz)
+    return report
+
+
+def print_summary(report):
+    for split, stats in report['splits'].items():
+        print("\n{} set: {} images, {} boxes".format(split, stats['images'], stats['boxes']))
+        for name, info in stats['classes'].items():
+            print("  {:<16} {:>8} boxes {:>8} images".format(name, info['boxes'], info['images']))
+        objects = stats['objects_per_image']
+        print("  Objects per image: mean {:.2f}, max {}".format(objects['mean'], objects['max']))
+        print("  Empty images: {:.1%}, missing labels: {:.1%}, unparsable lines: {}".format(
+            stats['empty_ratio'], stats['missing_ratio'], stats['unparsable_lines']))
+        dup = stats['duplicates']
+        if dup['exact_duplicates'] or dup['overlapping_pairs']:
+            print("  [WARNING] {} duplicate boxes, {} same-class pairs with IoU >= {} in {} images".format(
+                dup['exact_duplicates'], dup['overlapping_pairs'], dup['iou_threshold'], dup['images_affected']))
+        if 'at_imgsz' in stats:
+            at = stats['at_imgsz']
+            print("  At imgsz {}: width p50 {:.1f}px, height p50 {:.1f}px; small {}, medium {}, large {}".format(
+                at['imgsz'], at['width']['p50'], at['height']['p50'], at['small'], at['medium'], at['large']))
+        if stats.get('anchors'):
+            print("  Anchor clusters (w, h): {}".format(stats['anchors']['clusters_wh']))
+            print("  Best possible recall (ratio < {:.0f}): {:.3f}".format(
+                ANCHOR_RATIO, stats['anchors']['best_possible_recall']))
+
+
+def plot_summary(report, path):
+    """One row of plots per split: class counts, box width/height, centers, objects per image"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    config = load_yaml(report['data'])
+    splits = resolve_split_dirs(report['data'], config)
+    splits = [s for s in splits if s[0] in report['splits']]
+    fig, axes = plt.subplots(len(splits), 4, figsize=(16, 3.6 * len(splits)), squeeze=False)
+    for row, (split, img_dir, label_dir) in zip(axes, splits):
+        stats = report['splits'][split]
+        labels = load_label_index(label_dir, img_dir if os.path.isdir(img_dir) else None).labels
+        row[0].bar(list(stats['classes']), [c['boxes'] for c in stats['classes'].values()])
+        row[0].set_title("{}: boxes per class".format(split))
+        row[1].hist2d(labels['w'], labels['h'], bins=50, range=[[0, 1], [0, 1]], cmap='Blues')
+        row[1].set_title("width vs height (normalized)")
+        row[2].imshow(np.array(stats['positions']['centers']), extent=[0, 1, 1, 0], cmap='Blues')
+        row[2].set_title("box centers")
+        row[3].bar(range(len(stats['objects_per_image']['histogram'])), stats['objects_per_image']['histogram'])
+        row[3].set_title("objects per image")
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Label statistics over the full dataset")
+    parser.add_argument('--data', default='data.yaml')
+    parser.add_argument('--imgsz', type=int, default=640, help="training image size for pixel statistics")
+    parser.add_argument('--out', default='dataset_stats.json')
+    parser.add_argument('--plot', default=None, help="also save a summary plot to this file")
+    parser.add_argument('--no-cache', action='store_true', help="rebuild the label indexes")
+    args = parser.parse_args()
+
+    report = dataset_stats(args.data, args.imgsz, use_cache=not args.no_cache)
+    print_summary(report)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("\nStatistics saved to {}".format(args.out))
+    if args.plot:
+        plot_summary(report, args.plot)
+        print("Plot saved to {}".format(args.plot))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,381 @@
+"""
+Single-pass dataset validator.
+
+Walks every split listed in data.yaml once, parses each label file once and
+reads image dimensions from the file header (no full decode), spreading the
+work over a process pool. All checks made by check_dataset.py,
+inspect_dataset.py, check_val_set.py, check_val_simple.py,
+check_data_splits.py, verify_dataset.py, verify_labels.py,
+verify_structure.py and train.validate_and_fix_dataset are collected into one
+structured report:
+
+    config      data.yaml fields missing, nc / names mismatch
+    structure   missing image or label directories
+    images      unreadable or empty images
+    labels      missing, empty or orphaned label files
+    lines       wrong field count, unparsable values, negative or out-of-range
+                class IDs, boxes outside [0, 1], box centers outside the image
+
+Per-file results are cached next to each split's labels directory
+(e.g. train/validation.cache, alongside the labels.cache written by
+Ultralytics), keyed by the image and label paths plus their mtime and size.
+Later runs only revalidate files that were added or changed.
+
+Usage:
+    python dataset_validator.py --data data.yaml
+    python dataset_validator.py --data data.yaml --workers 8 --json report.json
+    python dataset_validator.py --data data.yaml --no-cache
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png')
+REQUIRED_FIELDS = ('nc', 'names', 'train', 'val')
+SPLITS = ('train', 'val', 'test')
+MIN_IMAGES = 2
+CACHE_NAME = 'validation.cache'
+CACHE_VERSION = 3
+
+# Issue codes, grouped by what they refer to
+FILE_ISSUES = ('image_unreadable', 'image_empty', 'label_missing', 'label_empty', 'label_unreadable')
+LINE_ISSUES = ('bad_field_count', 'parse_error', 'negative_class', 'class_out_of_range',
+               'bbox_out_of_range', 'center_outside_image')
+
+
+def load_yaml(file_path):
+    with open(file_path, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def label_dir_for(img_dir):
+    """YOLO convention: .../images -> .../labels"""
+    head, tail = os.path.split(os.path.normpath(img_dir))
+    if tail == 'images':
+        return os.path.join(head, 'labels')
+    return img_dir.replace('images', 'labels')
+
+
+def resolve_split_dirs(data_yaml, config):
+    """
+    Return [(split, img_dir, label_dir)] for the splits present in data.yaml.
+    Relative paths are resolved against data.yaml's 'path' or its directory.
+    """
+    base_dir = config.get('path') or os.path.dirname(os.path.abspath(data_yaml))
+    dirs = []
+    for split in SPLITS:
+        if not config.get(split):
+            continue
+        img_dir = config[split]
+        if not os.path.isabs(img_dir):
+            img_dir = os.path.normpath(os.path.join(base_dir, img_dir))
+        dirs.append((split, img_dir, label_dir_for(img_dir)))
+    return dirs
+
+
+def read_image_size(img_path):
+    """(width, height) from the image header; raises on unreadable files"""
+    from image_meta import image_size
+    return image_size(img_path)
+
+
+def check_label_lines(content, nc=None, img_size=None):
+    """
+    Check the text of one label file.
+
+    Returns:
+        (box_count, [(line_number, issue_code, message)])
+    """
+    issues = []
+    boxes = 0
+    for i, line in enumerate(content.splitlines(), 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) != 5:
+            issues.append((i, 'bad_field_count', "Expected 5 values, got {}".format(len(parts))))
+            continue
+        try:
+            values = [float(p) for p in parts]
+            if not all(math.isfinite(v) for v in values):
+                raise ValueError("Non-finite value in: {}".format(line.strip()))
+            class_id = int(values[0])
+            x, y, w, h = values[1:]
+        except (ValueError, OverflowError) as e:
+            issues.append((i, 'parse_error', str(e)))
+            continue
+        boxes += 1
+        if class_id < 0:
+            issues.append((i, 'negative_class', "Negative class ID: {}".format(class_id)))
+        elif nc is not None and class_id >= nc:
+            issues.append((i, 'class_out_of_range', "Class ID {} not in 0-{}".format(class_id, nc - 1)))
+        if not (0 <= x <= 1 and 0 <= y <= 1 and 0 < w <= 1 and 0 < h <= 1):
+            issues.append((i, 'bbox_out_of_range', "Invalid bbox: x={}, y={}, w={}, h={}".format(x, y, w, h)))
+        elif img_size is not None:
+            img_w, img_h = img_size
+            x_abs, y_abs = int(x * img_w), int(y * img_h)
+            if not (0 <= x_abs < img_w and 0 <= y_abs < img_h):
+                issues.append((i, 'center_outside_image',
+                               "Bounding box center ({}, {}) outside image {}x{}".format(x_abs, y_abs, img_w, img_h)))
+    return boxes, issues
+
+
+def validate_pair(job):
+    """
+    Validate one image and its label file. Runs in a worker process.
+
+    Args:
+        job: (img_path, label_path, nc)
+    Returns:
+        record dict: image, label, size, boxes, issues [(line, code, message)]
+    """
+    img_path, label_path, nc = job
+    record = {'image': img_path, 'label': label_path, 'size': None, 'boxes': 0, 'issues': []}
+    try:
+        size = read_image_size(img_path)
+        if size[0] <= 0 or size[1] <= 0:
+            record['issues'].append((0, 'image_empty', "Empty image"))
+        else:
+            record['size'] = size
+    except Exception as e:
+        record['issues'].append((0, 'image_unreadable', str(e)))
+
+    try:
+        with open(label_path, 'r') as f:
+            content = f.read()
+    except (IOError, OSError) as e:
+        code = 'label_missing' if not os.path.exists(label_path) else 'label_unreadable'
+        record['issues'].append((0, code, str(e)))
+        return record
+    if not content.strip():
+        record['issues'].append((0, 'label_empty', "Empty file"))
+        return record
+    record['boxes'], issues = check_label_lines(content, nc, record['size'])
+    record['issues'].extend(issues)
+    return record
+
+
+def list_images(img_dir):
+    return sorted(f for f in os.listdir(img_dir) if f.lower().endswith(IMG_EXTS))
+
+
+def split_jobs(img_dir, label_dir, nc):
+    """Jobs for one split plus the label files that have no image"""
+    images = list_images(img_dir)
+    stems = set(os.path.splitext(f)[0] for f in images)
+    labels = [f for f in os.listdir(label_dir) if f.endswith('.txt')]
+    orphans = sorted(os.path.join(label_dir, f) for f in labels if os.path.splitext(f)[0] not in stems)
+    jobs = [(os.path.join(img_dir, f), os.path.join(label_dir, os.path.splitext(f)[0] + '.txt'), nc)
+            for f in images]
+    return jobs, len(labels), orphans
+
+
+def file_stat(path):
+    """[mtime_ns, size], or None if the file does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def cache_path_for(label_dir):
+    """train/labels -> train/validation.cache"""
+    return os.path.join(os.path.dirname(os.path.normpath(label_dir)), CACHE_NAME)
+
+
+def load_cache(path, nc):
+    """
+    Cached records {image_path: entry}; empty if the cache is missing, from an
+    older version, or was written for a different class count.
+    """
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION or cache.get('nc') != nc:
+        return {}
+    return cache.get('entries', {})
+
+
+def save_cache(path, entries, nc):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'nc': nc, 'entries': entries}, f)
+        os.replace(tmp_path, path)
+    except (IOError, OSError) as e:
+        print("[WARNING] Could not write validation cache {}: {}".format(path, e))
+
+
+def cached_record(entry, stats):
+    """The cached record if the image and label files are unchanged, else None"""
+    if entry is None or entry['stats'] != stats:
+        return None
+    record = entry['record']
+    record['size'] = tuple(record['size']) if record['size'] else None
+    record['issues'] = [tuple(issue) for issue in record['issues']]
+    return record
+
+
+def summarize_split(split, img_dir, label_dir, records, label_count, orphans):
+    """Aggregate per-file records into the split section of the report"""
+    counts = dict((code, 0) for code in FILE_ISSUES + LINE_ISSUES)
+    problems = []
+    boxes = 0
+    for record in records:
+        boxes += record['boxes']
+        for line, code, message in record['issues']:
+            counts[code] += 1
+        if record['issues']:
+            problems.append(record)
+    return {
+        'split': split,
+        'images_dir': img_dir,
+        'labels_dir': label_dir,
+        'images': len(records),
+        'labels': label_count,
+        'boxes': boxes,
+        'orphan_labels': orphans,
+        'too_few_images': len(records) < MIN_IMAGES,
+        'issue_counts': counts,
+        'cached': 0,
+        'problem_files': problems,
+        'ok': not problems and not orphans and len(records) >= MIN_IMAGES,
+    }
+
+
+def check_config(config):
+    """
+    Problems with data.yaml itself.
+
+    Returns:
+        [(field, issue_code, message)], issue_code is 'missing_field' or 'names_mismatch'
+    """
+    errors = [(field, 'missing_field', "data.yaml missing required field: {}".format(field))
+              for field in REQUIRED_FIELDS if field not in config]
+    names = config.get('names')
+    if 'nc' in config and names is not None and len(names) != config['nc']:
+        errors.append(('names', 'names_mismatch', "nc={} but {} class names".format(config['nc'], len(names))))
+    return errors
+
+
+def validate_dataset(data_yaml='data.yaml', workers=None, chunksize=64, use_cache=True):
+    """
+    Validate every split in data.yaml in one pass.
+
+    Args:
+        data_yaml: dataset configuration
+        workers: process pool size, None for os.cpu_count(), 0 to run in-process
+        chunksize: jobs sent to a worker at a time
+        use_cache: reuse results for files unchanged since the last run
+    Returns:
+        report dict: config, config_errors (see check_config), splits {name: section}, seconds, ok
+    """
+    start = time.time()
+    config = load_yaml(data_yaml)
+    report = {'data': data_yaml, 'config': config, 'config_errors': check_config(config), 'splits': {}}
+    nc = config.get('nc')
+
+    pending = []
+    for split, img_dir, label_dir in resolve_split_dirs(data_yaml, config):
+        missing = [d for d in (img_dir, label_dir) if not os.path.isdir(d)]
+        if missing:
+            report['splits'][split] = {'split': split, 'images_dir': img_dir, 'labels_dir': label_dir,
+                                       'missing_dirs': missing, 'ok': split == 'test'}
+            continue
+        jobs, label_count, orphans = split_jobs(img_dir, label_dir, nc)
+        cache = load_cache(cache_path_for(label_dir), nc) if use_cache else {}
+        stats = [[file_stat(job[0]), file_stat(job[1])] for job in jobs]
+        records = [cached_record(cache.get(job[0]), stat) for job, stat in zip(jobs, stats)]
+        pending.append((split, img_dir, label_dir, jobs, stats, records, label_count, orphans))
+
+    # Only files that are new or changed since the last run go to the pool
+    stale = [(records, i, jobs[i]) for _, _, _, jobs, _, records, _, _ in pending
+             for i, record in enumerate(records) if record is None]
+    stale_jobs = [job for _, _, job in stale]
+    if workers == 0 or len(stale_jobs) < chunksize:
+        results = [validate_pair(job) for job in stale_jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_pair, stale_jobs, chunksize=chunksize))
+    for (records, i, _), record in zip(stale, results):
+        records[i] = record
+
+    for split, img_dir, label_dir, jobs, stats, records, label_count, orphans in pending:
+        section = summarize_split(split, img_dir, label_dir, records, label_count, orphans)
+        section['cached'] = len(jobs) - sum(1 for entry in stale if entry[0] is records)
+        report['splits'][split] = section
+        if use_cache:
+            entries = dict((job[0], {'stats': stat, 'record': record})
+                           for job, stat, record in zip(jobs, stats, records))
+            save_cache(cache_path_for(label_dir), entries, nc)
+
+    report['seconds'] = time.time() - start
+    report['ok'] = not report['config_errors'] and all(s['ok'] for s in report['splits'].values())
+    return report
+
+
+def print_report(report, max_files=20):
+    print("Dataset: {}".format(report['data']))
+    for _, _, message in report['config_errors']:
+        print("[ERROR] {}".format(message))
+    for split, section in report['splits'].items():
+        print("\n{} set:".format(split))
+        if 'missing_dirs' in section:
+            level = "[WARNING]" if split == 'test' else "[ERROR]"
+            for path in section['missing_dirs']:
+                print("  {} Directory not found: {}".format(level, path))
+            continue
+        print("  Images: {}, labels: {}, boxes: {} ({} unchanged since last run)".format(
+            section['images'], section['labels'], section['boxes'], section['cached']))
+        if section['too_few_images']:
+            print("  [ERROR] At least {} images required".format(MIN_IMAGES))
+        if section['orphan_labels']:
+            print("  [WARNING] {} label files without an image".format(len(section['orphan_labels'])))
+        for code, count in section['issue_counts'].items():
+            if count:
+                print("  [ERROR] {}: {}".format(code, count))
+        for record in section['problem_files'][:max_files]:
+            for line, code, message in record['issues']:
+                where = "{}:{}".format(os.path.basename(record['label']), line) if line else \
+                    os.path.basename(record['image'] if code.startswith('image') else record['label'])
+                print("    {} [{}] {}".format(where, code, message))
+        if len(section['problem_files']) > max_files:
+            print("    ... {} more files".format(len(section['problem_files']) - max_files))
+        if section['ok']:
+            print("  [OK] No issues found")
+    print("\nChecked in {:.2f}s".format(report['seconds']))
+    print("Dataset is valid." if report['ok'] else "Issues were found in the dataset.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate all dataset splits in one pass")
+    parser.add_argument('--data', default='data.yaml')
+    parser.add_argument('--workers', type=int, default=None, help="process pool size, 0 to run in-process")
+    parser.add_argument('--json', default=None, help="write the full report to this file")
+    parser.add_argument('--max-files', type=int, default=20, help="problem files to list per split")
+    parser.add_argument('--no-cache', action='store_true', help="revalidate every file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print("[ERROR] {} not found".format(args.data))
+        sys.exit(2)
+    report = validate_dataset(args.data, args.workers, use_cache=not args.no_cache)
+    print_report(report, args.max_files)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print("Report saved to {}".format(args.json))
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,62 +1,41 @@
-import os
-import glob
+import numpy as np
+from label_index import box_text, load_label_index
 
 def check_and_fix_labels(label_dir):
     """Check and fix label files in the given directory"""
-    total_fixed = 0
+    index = load_label_index(label_dir)
+    labels = index.labels
     
-    # Get all .txt files in the directory
-    label_files = glob.glob(os.path.join(label_dir, '*.txt'))
+    # Lines with the wrong number of values or unparsable values are dropped
+    bad_lines = index.bad_lines_by_image()
+    for i, entries in bad_lines.items():
+        for _, _, text, code, message in entries:
+            if code == 'bad_field_count':
+                print("Warning: Invalid format in {}.txt: {}".format(index.stems[i], text))
+            else:
+                print("Error parsing line in {}.txt: {} - {}".format(index.stems[i], text, message))
     
-    for label_file in label_files:
-        fixed_lines = []
-        needs_fix = False
-        
-        # Read the label file
-        with open(label_file, 'r') as f:
-            lines = f.readlines()
-        
-        # Check each line for issues
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            parts = line.split()
-            if len(parts) != 5:  # Should be: class x y w h
-                print("Warning: Invalid format in {}: {}".format(os.path.basename(label_file), line))
-                needs_fix = True
-                continue
-                
-            try:
-                class_id = int(float(parts[0]))  # Handle potential float strings
-                x, y, w, h = map(float, parts[1:])
-                
-                # Check for negative class ID
-                if class_id < 0:
-                    print("Found negative class ID in {}: {}".format(os.path.basename(label_file), class_id))
-                    class_id = 0  # Set to first class (0-indexed)
-                    needs_fix = True
-                
-                # Check bounding box coordinates
-                if not (0 <= x <= 1 and 0 <= y <= 1 and 0 < w <= 1 and 0 < h <= 1):
-                    print("Warning: Invalid bbox in {}: x={}, y={}, w={}, h={}".format(os.path.basename(label_file), x, y, w, h))
-                    needs_fix = True
-                
-                fixed_lines.append("{} {} {} {} {}\n".format(class_id, x, y, w, h))
-                
-            except ValueError as e:
-                print("Error parsing line in {}: {} - {}".format(os.path.basename(label_file), line, str(e)))
-                needs_fix = True
-        
-        # Write fixed file if needed
-        if needs_fix:
-            with open(label_file, 'w') as f:
-                f.writelines(fixed_lines)
-            total_fixed += 1
-            print("Fixed: {}".format(os.path.basename(label_file)))
+    # Check for negative class IDs; set them to the first class (0-indexed)
+    negative = labels['cls'] < 0
+    for row in labels[negative]:
+        print("Found negative class ID in {}.txt: {}".format(index.stems[row['image_idx']], row['cls']))
     
-    return total_fixed
+    # Check bounding box coordinates
+    invalid = index.invalid_rows() & ~negative
+    for row in labels[invalid]:
+        print("Warning: Invalid bbox in {}.txt: {}".format(index.stems[row['image_idx']], box_text(row)))
+    
+    fixed = np.array(labels)
+    fixed['cls'][negative] = 0
+    
+    # Write fixed file if needed
+    to_fix = set(index.images_with(negative | invalid).tolist()) | set(bad_lines)
+    for i in sorted(to_fix):
+        rows = slice(index.offsets[i], index.offsets[i + 1])
+        index.write_label(i, fixed[rows], changed=negative[rows])
+        print("Fixed: {}.txt".format(index.stems[i]))
+    
+    return len(to_fix)
 
 def main():
     # Check and fix training labels
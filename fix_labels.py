@@ -1,68 +1,6 @@
 import os
-import glob
-
-def fix_label_file(filepath):
-    """Fix a single label file"""
-    try:
-        with open(filepath, 'r') as f:
-            content = f.read().strip()
-        
-        if not content:
-            print(f"[EMPTY] {os.path.basename(filepath)}")
-            return False
-            
-        lines = content.split('\n')
-        fixed_lines = []
-        needs_fix = False
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            parts = line.split()
-            if len(parts) != 5:
-                print(f"[INVALID FORMAT] {os.path.basename(filepath)}: {line}")
-                needs_fix = True
-                continue
-                
-            try:
-                # Parse values
-                class_id = int(float(parts[0]))
-                x, y, w, h = map(float, parts[1:])
-                
-                # Validate values
-                if class_id < 0:
-                    print(f"[NEGATIVE CLASS] {os.path.basename(filepath)}: {class_id}")
-                    class_id = 0  # Fix negative class ID
-                    needs_fix = True
-                
-                # Clamp values to valid range
-                x = max(0.0, min(1.0, x))
-                y = max(0.0, min(1.0, y))
-                w = max(0.0001, min(1.0, w))
-                h = max(0.0001, min(1.0, h))
-                
-                # Format the fixed line
-                fixed_line = f"{class_id} {x:.6f} {y:.6f} {w:.6f} {h:.6f}"
-                fixed_lines.append(fixed_line)
-                
-            except ValueError as e:
-                print(f"[PARSING ERROR] {os.path.basename(filepath)}: {line} - {str(e)}")
-                needs_fix = True
-                continue
-        
-        # Write fixed content back to file if needed
-        if needs_fix or len(fixed_lines) != len(lines):
-            with open(filepath, 'w') as f:
-                f.write('\n'.join(fixed_lines) + '\n')
-            return True
-            
-        return False
-        
-    except Exception as e:
-        print(f"[ERROR] {os.path.basename(filepath)}: {str(e)}")
-        return False
+import numpy as np
+from label_index import load_label_index
 
 def fix_all_labels(directory):
     """Fix all label files in a directory"""
@@ -70,20 +8,46 @@ def fix_all_labels(directory):
         print(f"Directory not found: {directory}")
         return 0
         
-    txt_files = glob.glob(os.path.join(directory, '*.txt'))
-    if not txt_files:
+    index = load_label_index(directory)
+    if len(index) == 0:
         print(f"No .txt files found in {directory}")
         return 0
     
     print(f"\nFixing label files in {directory}...")
-    fixed_count = 0
+    labels = index.labels
+    
+    for i in np.flatnonzero(index.empty()):
+        print(f"[EMPTY] {index.stems[i]}.txt")
+    
+    # Lines that could not be parsed are dropped
+    bad_lines = index.bad_lines_by_image()
+    for i, entries in bad_lines.items():
+        for _, _, text, code, message in entries:
+            if code == 'bad_field_count':
+                print(f"[INVALID FORMAT] {index.stems[i]}.txt: {text}")
+            else:
+                print(f"[PARSING ERROR] {index.stems[i]}.txt: {text} - {message}")
+    
+    # Fix negative class IDs and clamp values to the valid range, all boxes at once
+    negative = labels['cls'] < 0
+    for row in labels[negative]:
+        print(f"[NEGATIVE CLASS] {index.stems[row['image_idx']]}.txt: {row['cls']}")
+    fixed = np.array(labels)
+    fixed['cls'][negative] = 0
+    fixed['cx'] = np.clip(fixed['cx'], 0.0, 1.0)
+    fixed['cy'] = np.clip(fixed['cy'], 0.0, 1.0)
+    fixed['w'] = np.clip(fixed['w'], 0.0001, 1.0)
+    fixed['h'] = np.clip(fixed['h'], 0.0001, 1.0)
+    changed = fixed != labels
     
-    for filepath in txt_files:
-        if fix_label_file(filepath):
-            fixed_count += 1
+    # Write fixed content back only to the files that need it
+    to_fix = set(index.images_with(changed).tolist()) | set(bad_lines)
+    for i in sorted(to_fix):
+        rows = slice(index.offsets[i], index.offsets[i + 1])
+        index.write_label(i, fixed[rows], changed=changed[rows])
     
-    print(f"\nFixed {fixed_count} out of {len(txt_files)} files in {directory}")
-    return fixed_count
+    print(f"\nFixed {len(to_fix)} out of {len(index)} files in {directory}")
+    return len(to_fix)
 
 if __name__ == "__main__":
     # Fix training labels
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+检测间隔内的光流传播
+
+每N帧做一次YOLO检测, 中间帧只在目标附近的小窗口内用稀疏光流
+(Lucas-Kanade)推算目标框的位移; N根据测得的运动速度自适应,
+光流质量下降时立即回到检测。
+"""
+import cv2
+import numpy as np
+
+
+class FlowPropagator(object):
+    """
+    基于稀疏光流的目标框传播器
+    参数:
+        min_interval: 最小检测间隔(帧)
+        max_interval: 最大检测间隔(帧)
+        margin: 光流窗口相对目标框四周的扩展比例
+        max_corners: 每个目标最多跟踪的特征点数
+        min_points: 有效特征点少于该数量时视为跟踪失败
+        min_quality: 有效特征点比例低于该值时视为跟踪失败
+        min_conf: 传播后的置信度(检测置信度逐帧乘以光流质量)低于该值时重新检测
+        slow_motion: 低于该速度(像素/帧)时使用最大检测间隔
+        fast_motion: 高于该速度(像素/帧)时使用最小检测间隔
+    """
+
+    def __init__(self, min_interval=1, max_interval=8, margin=0.5, max_corners=40,
+                 min_points=6, min_quality=0.5, min_conf=0.25, slow_motion=2.0, fast_motion=20.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.margin = margin
+        self.max_corners = max_corners
+        self.min_points = min_points
+        self.min_quality = min_quality
+        self.min_conf = min_conf
+        self.slow_motion = slow_motion
+        self.fast_motion = fast_motion
+        self.interval = min_interval
+        self.motion = 0.0
+        self.stats = {'detections': 0, 'propagations': 0, 'failures': 0}
+        self._lk_params = dict(winSize=(15, 15), maxLevel=2,
+                               criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+        self.clear()
+
+    def clear(self):
+        """丢弃当前目标, 下一帧必须做检测"""
+        self._prev = None
+        self._points = None
+        self._window = None
+        self._box = None
+        self._conf = 0.0
+        self._since_detect = 0
+
+    def need_detection(self):
+        """当前帧是否需要运行检测器"""
+        return (self._prev is None or self._since_detect >= self.interval
+                or self._conf < self.min_conf)
+
+    def _window_for(self, box, bgra, offset):
+        """目标框外扩margin后的窗口(全屏坐标), 裁剪到当前帧范围内"""
+        x1, y1, x2, y2 = box
+        mx, my = (x2 - x1) * self.margin, (y2 - y1) * self.margin
+        ox, oy = offset
+        h, w = bgra.shape[:2]
+        wx1 = int(max(ox, x1 - mx))
+        wy1 = int(max(oy, y1 - my))
+        wx2 = int(min(ox + w, x2 + mx))
+        wy2 = int(min(oy + h, y2 + my))
+        if wx2 - wx1 < 8 or wy2 - wy1 < 8:
+            return None
+        return wx1, wy1, wx2, wy2
+
+    def _crop_gray(self, bgra, offset, window):
+        """从帧中取出窗口区域的灰度图, 窗口超出帧范围时返回None"""
+        ox, oy = offset
+        h, w = bgra.shape[:2]
+        x1, y1, x2, y2 = window[0] - ox, window[1] - oy, window[2] - ox, window[3] - oy
+        if x1 < 0 or y1 < 0 or x2 > w or y2 > h:
+            return None
+        return cv2.cvtColor(bgra[y1:y2, x1:x2], cv2.COLOR_BGRA2GRAY)
+
+    def _anchor(self, bgra, offset, box, points=None):
+        """以box为中心重新截取窗口; points为全屏坐标的已有特征点"""
+        window = self._window_for(box, bgra, offset)
+        gray = None if window is None else self._crop_gray(bgra, offset, window)
+        if gray is None:
+            self.clear()
+            return False
+
+        origin = np.array([window[0], window[1]], dtype=np.float32)
+        if points is not None:
+            points = points - origin
+            h, w = gray.shape
+            inside = ((points[:, 0] >= 0) & (points[:, 0] < w) & (points[:, 1] >= 0) & (points[:, 1] < h))
+            points = points[inside]
+        if points is None or len(points) < self.min_points:
+            # 只在目标框内部找角点
+            mask = np.zeros_like(gray)
+            bx1, by1 = int(box[0] - window[0]), int(box[1] - window[1])
+            bx2, by2 = int(box[2] - window[0]), int(box[3] - window[1])
+            mask[max(0, by1):max(0, by2), max(0, bx1):max(0, bx2)] = 255
+            corners = cv2.goodFeaturesToTrack(gray, self.max_corners, 0.01, 3, mask=mask)
+            points = None if corners is None else corners.reshape(-1, 2)
+
+        if points is None or len(points) < self.min_points:
+            self.clear()
+            return False
+
+        self._prev = gray
+        self._points = points.reshape(-1, 1, 2).astype(np.float32)
+        self._window = window
+        self._box = np.asarray(box, dtype=np.float32)
+        return True
+
+    def reset(self, bgra, offset, box, conf=1.0):
+        """
+        用一次检测结果重新初始化
+        参数:
+            bgra: 当前帧 (H, W, 4)
+            offset: 当前帧左上角在全屏中的坐标
+            box: 检测框 (x1, y1, x2, y2), 全屏坐标
+            conf: 检测置信度
+        """
+        self.stats['detections'] += 1
+        if self._anchor(bgra, offset, box):
+            self._conf = conf
+            self._since_detect = 0
+
+    def propagate(self, bgra, offset):
+        """
+        把上一帧的目标框传播到当前帧
+        返回:
+            (box, conf), 跟踪失败时返回None(调用方应改为运行检测)
+        """
+        if self._prev is None:
+            return None
+        gray = self._crop_gray(bgra, offset, self._window)
+        if gray is None:
+            return self._fail()
+
+        pts = self._points
+        nxt, status, _ = cv2.calcOpticalFlowPyrLK(self._prev, gray, pts, None, **self._lk_params)
+        if nxt is None:
+            return self._fail()
+        # 前后向一致性检查, 剔除错误匹配
+        back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev, nxt, None, **self._lk_params)
+        fb_error = np.linalg.norm((pts - back).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < 1.0)
+        quality = good.mean() if len(good) else 0.0
+        if good.sum() < self.min_points or quality < self.min_quality:
+            return self._fail()
+
+        shift = np.median((nxt - pts).reshape(-1, 2)[good], axis=0)
+        box = self._box + np.array([shift[0], shift[1], shift[0], shift[1]], dtype=np.float32)
+
+        # 运动速度的滑动平均决定下一次检测间隔
+        self.motion = 0.7 * self.motion + 0.3 * float(np.hypot(shift[0], shift[1]))
+        ratio = (self.motion - self.slow_motion) / float(self.fast_motion - self.slow_motion)
+        ratio = min(1.0, max(0.0, ratio))
+        self.interval = int(round(self.max_interval - ratio * (self.max_interval - self.min_interval)))
+
+        origin = np.array([self._window[0], self._window[1]], dtype=np.float32)
+        points = nxt.reshape(-1, 2)[good] + origin
+        since_detect = self._since_detect
+        conf = self._conf * quality
+        if not self._anchor(bgra, offset, box, points):
+            return self._fail()
+        self._since_detect = since_detect + 1
+        self._conf = conf
+        self.stats['propagations'] += 1
+        return tuple(float(v) for v in box), conf
+
+    def _fail(self):
+        self.stats['failures'] += 1
+        self.clear()
+        return None
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+零拷贝截屏与模型输入缓冲区
+
+mss返回的BGRA数据直接用np.frombuffer包装成视图, 不再复制;
+去掉alpha通道和letterbox缩放写入一个常驻的模型输入缓冲区,
+稳定追踪时每帧不再分配新的图像内存。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+def bgra_view(screenshot):
+    """把mss截图的原始缓冲区包装成 (H, W, 4) 的uint8视图, 不复制数据"""
+    return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+        screenshot.height, screenshot.width, 4)
+
+
+class FrameGrabber(object):
+    """
+    mss截屏的薄封装, 返回BGRA零拷贝视图
+    参数:
+        sct: mss实例, 需在调用grab的线程中创建
+    """
+
+    def __init__(self, sct):
+        self.sct = sct
+        self.frames = 0
+        self.bytes = 0
+
+    def grab(self, region):
+        screenshot = self.sct.grab(region)
+        self.frames += 1
+        self.bytes += len(screenshot.raw)
+        return bgra_view(screenshot)
+
+
+class RegionGrabber(object):
+    """
+    并行截取多个区域(全局桌面坐标)
+    每个截屏线程持有自己的mss实例; 只有一个区域时直接在调用线程中截取
+    参数:
+        regions: 区域字典列表
+        roi_states: 与区域一一对应的RoiState, 可选
+    """
+
+    def __init__(self, regions, roi_states=None):
+        self.regions = regions
+        self.roi_states = roi_states
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=len(regions)) if len(regions) > 1 else None
+
+    def _grab_part(self, index, now):
+        import mss
+        # mss实例不能跨线程共享
+        if not hasattr(self._local, 'grabber'):
+            self._local.grabber = FrameGrabber(mss.mss())
+        if self.roi_states is not None:
+            region, offset, is_roi = self.roi_states[index].next_region(now)
+        else:
+            region = self.regions[index]
+            offset, is_roi = (region['left'], region['top']), False
+        img = self._local.grabber.grab(region)  # BGRA零拷贝视图
+        return {'img': img, 'offset': offset, 'region': index, 'roi': is_roi}
+
+    def grab(self, now):
+        """截取所有区域, 返回 [{'img', 'offset', 'region', 'roi'}]"""
+        if self._pool is None:
+            return [self._grab_part(0, now)]
+        count = len(self.regions)
+        return list(self._pool.map(self._grab_part, range(count), [now] * count))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+
+class InputBuffer(object):
+    """
+    常驻的模型输入缓冲区
+
+    把任意尺寸的BGRA帧按比例缩放、去掉alpha通道后居中写入
+    imgsz x imgsz 的BGR画布(letterbox), 中间缓冲区按最大尺寸一次性分配,
+    不同尺寸的帧只取其连续视图; 切换输入边长时每种边长的画布只分配一次。
+    参数:
+        imgsz: 模型输入边长
+        pad_value: 填充颜色, 与Ultralytics的letterbox一致
+        spans: SpanRecorder, 可选; 记录'preprocess'(整个prepare)和其中的'convert'(去alpha通道)
+    """
+
+    def __init__(self, imgsz=640, pad_value=114, spans=None):
+        self.pad_value = pad_value
+        self.spans = spans
+        self.frames = 0
+        self.allocations = 0
+        self.last_frame_allocations = 0
+        self._layout = None
+        self._canvases = {}
+        self._resized4 = np.empty(0, dtype=np.uint8)
+        self._resized3 = np.empty(0, dtype=np.uint8)
+        self._allocate(imgsz)
+
+    def _allocate(self, imgsz):
+        self.imgsz = imgsz
+        if imgsz not in self._canvases:
+            self._canvases[imgsz] = np.full((imgsz, imgsz, 3), self.pad_value, dtype=np.uint8)
+            self.allocations += 1
+        self.canvas = self._canvases[imgsz]
+        if self._resized4.size < imgsz * imgsz * 4:
+            self._resized4 = np.empty(imgsz * imgsz * 4, dtype=np.uint8)
+            self._resized3 = np.empty(imgsz * imgsz * 3, dtype=np.uint8)
+            self.allocations += 2
+        self._layout = None
+
+    def prepare(self, bgra, imgsz=None):
+        """
+        把BGRA帧写入模型输入画布
+        参数:
+            bgra: (H, W, 4) 的uint8数组
+            imgsz: 改变输入边长, 新边长第一次出现时分配画布
+        返回:
+            (canvas, meta), meta = (scale, pad_left, pad_top), 用于把检测框映射回原图
+        """
+        start = time.time() if self.spans is not None else None
+        allocations = self.allocations
+        if imgsz is not None and imgsz != self.imgsz:
+            self._allocate(imgsz)
+
+        h, w = bgra.shape[:2]
+        scale = min(self.imgsz / float(h), self.imgsz / float(w))
+        nw = max(1, min(self.imgsz, int(round(w * scale))))
+        nh = max(1, min(self.imgsz, int(round(h * scale))))
+        left = (self.imgsz - nw) // 2
+        top = (self.imgsz - nh) // 2
+
+        resized4 = self._resized4[:nh * nw * 4].reshape(nh, nw, 4)
+        resized3 = self._resized3[:nh * nw * 3].reshape(nh, nw, 3)
+        if (nh, nw) != (h, w):
+            cv2.resize(bgra, (nw, nh), dst=resized4, interpolation=cv2.INTER_LINEAR)
+            bgra = resized4
+        convert_start = time.time() if start is not None else None
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=resized3)
+        if start is not None:
+            self.spans.record('convert', convert_start, time.time())
+
+        # 布局变化时才重新填充边框
+        layout = (nh, nw, top, left)
+        if layout != self._layout:
+            self.canvas.fill(self.pad_value)
+            self._layout = layout
+        np.copyto(self.canvas[top:top + nh, left:left + nw], resized3)
+
+        self.frames += 1
+        self.last_frame_allocations = self.allocations - allocations
+        if start is not None:
+            self.spans.record('preprocess', start, time.time())
+        return self.canvas, (scale, left, top)
+
+    def stats(self):
+        """返回缓冲区分配统计"""
+        return {
+            'frames': self.frames,
+            'allocations': self.allocations,
+            'last_frame_allocations': self.last_frame_allocations,
+            'allocations_per_frame': self.allocations / float(max(1, self.frames)),
+        }
+
+
+def to_source_coords(xyxy, meta):
+    """把模型输入画布上的检测框坐标原地映射回原始帧坐标"""
+    scale, left, top = meta
+    xyxy[:, [0, 2]] -= left
+    xyxy[:, [1, 3]] -= top
+    xyxy /= scale
+    return xyxy
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+自适应帧率调度
+
+按目标帧周期安排每一帧的截止时间, 睡眠时间扣除本帧已经花掉的时间;
+画面静止或长时间没有目标时逐步降低帧率, 出现目标时立即恢复。
+"""
+import threading
+import time
+import zlib
+
+
+def frame_signature(img, step=16):
+    """对帧做稀疏采样后计算CRC32, 用于廉价地判断两帧是否相同"""
+    return zlib.crc32(img[::step, ::step].tobytes())
+
+
+class FramePacer(object):
+    """
+    帧率调度器
+    参数:
+        target_period: 有目标时的目标帧周期(秒)
+        idle_period: 退避后的最长帧周期(秒)
+        backoff: 每次退避时帧周期乘以的倍数
+        static_frames: 连续多少帧画面不变时开始退避
+        idle_after: 多长时间(秒)没有看到目标时开始退避
+    """
+
+    def __init__(self, target_period=0.02, idle_period=0.25, backoff=1.5,
+                 static_frames=5, idle_after=2.0):
+        self.target_period = target_period
+        self.idle_period = max(idle_period, target_period)
+        self.backoff = backoff
+        self.static_frames = static_frames
+        self.idle_after = idle_after
+        self.period = target_period
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._deadline = None
+        self._last_signature = None
+        self._same_frames = 0
+        self._last_target_time = time.time()
+        self._window_start = time.time()
+        self._window_frames = 0
+        self.achieved_fps = 0.0
+
+    def notify_target(self, seen, now=None):
+        """推理阶段调用, 报告本帧是否看到了目标"""
+        if not seen:
+            return
+        with self._lock:
+            self._last_target_time = time.time() if now is None else now
+            if self.period > self.target_period:
+                # 从退避状态恢复, 立即唤醒正在等待的采集线程
+                self.period = self.target_period
+                self._deadline = None
+                self._wake.set()
+
+    def frame_done(self, signature=None, now=None):
+        """
+        一帧处理结束, 计算距离下一帧截止时间还需等待多久
+        参数:
+            signature: 本帧的frame_signature, 用于判断画面是否静止
+        返回:
+            需要睡眠的秒数
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if signature is not None:
+                if signature == self._last_signature:
+                    self._same_frames += 1
+                else:
+                    self._same_frames = 0
+                self._last_signature = signature
+
+            static = self._same_frames >= self.static_frames
+            idle = now - self._last_target_time >= self.idle_after
+            if static or idle:
+                self.period = min(self.idle_period, self.period * self.backoff)
+            else:
+                self.period = self.target_period
+
+            # 实际帧率统计
+            self._window_frames += 1
+            elapsed = now - self._window_start
+            if elapsed >= 1.0:
+                self.achieved_fps = self._window_frames / elapsed
+                self._window_frames = 0
+                self._window_start = now
+
+            # 按截止时间调度, 落后时不追帧, 周期缩短时不等旧的截止时间
+            if self._deadline is None or abs(now - self._deadline) > self.period:
+                self._deadline = now
+            self._deadline += self.period
+            return max(0.0, self._deadline - now)
+
+    def wait(self, signature=None):
+        """结束一帧并睡眠到下一帧的截止时间"""
+        delay = self.frame_done(signature)
+        if delay > 0:
+            self._wake.wait(delay)
+        self._wake.clear()
+        return delay
+
+    def stats(self):
+        """返回目标帧率与实际帧率"""
+        with self._lock:
+            return {
+                'target_fps': 1.0 / self.target_period if self.target_period > 0 else 0.0,
+                'current_fps': 1.0 / self.period if self.period > 0 else 0.0,
+                'achieved_fps': self.achieved_fps,
+                'static_frames': self._same_frames,
+            }
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+推理阶段的逐帧处理
+
+一帧由一个或多个区域(显示器或屏幕区域)的截图组成, 所有区域需要
+推理的部分合并为一次批量模型调用, 结果统一映射到全局桌面坐标。
+处理顺序: 光流传播 / 缓存复用 / 局部推理 / 整帧推理 -> 目标选择 -> 跟踪
+"""
+import time
+
+import numpy as np
+
+from box_select import filter_boxes, select_index
+from change_detector import ChangeDetector, merge_detections, STATIC, PARTIAL
+from frame_grabber import InputBuffer, to_source_coords
+
+
+def part_bounds(part):
+    """帧中一个区域截图在全局坐标下的范围 (x1, y1, x2, y2)"""
+    ox, oy = part['offset']
+    h, w = part['img'].shape[:2]
+    return ox, oy, ox + w, oy + h
+
+
+def find_part(parts, point):
+    """找出包含point(全局坐标)的区域截图"""
+    x, y = point
+    for part in parts:
+        x1, y1, x2, y2 = part_bounds(part)
+        if x1 <= x < x2 and y1 <= y < y2:
+            return part
+    return None
+
+
+class FrameProcessor(object):
+    """
+    逐帧检测与目标选择
+    参数:
+        engine: 推理后端(见 inference_backends.py)
+        class_id: 目标类别ID
+        confidence: 置信度阈值
+        imgsz: 模型输入边长
+        select_policy: 目标选择策略
+        crosshair: 准星位置(全局坐标), 供'crosshair'策略使用
+        tracker: TargetTracker, 可选
+        flow: FlowPropagator, 可选
+        sizer: DynamicImgsz, 可选
+        skip_static: 每个区域做帧差检测, 复用或局部更新检测结果
+        region_count: 区域数量
+        spans: SpanRecorder, 可选; 记录preprocess/convert/inference/postprocess/select各阶段耗时
+    """
+
+    def __init__(self, engine, class_id, confidence=0.4, imgsz=640, select_policy='largest',
+                 crosshair=None, tracker=None, flow=None, sizer=None, skip_static=True, region_count=1,
+                 spans=None):
+        self.engine = engine
+        self.class_id = class_id
+        self.confidence = confidence
+        self.imgsz = imgsz
+        self.select_policy = select_policy
+        self.crosshair = crosshair
+        self.tracker = tracker
+        self.flow = flow
+        self.sizer = sizer
+        self.spans = spans
+        self.buffers = [InputBuffer(imgsz, spans=spans) for _ in range(region_count)]
+        self.change_detectors = [ChangeDetector() for _ in range(region_count)] if skip_static else None
+        self.caches = [None] * region_count
+        self.flow_region = None
+        self.last_target = None
+        self.batches = 0
+        self.batch_images = 0
+
+    def detect_batch(self, jobs):
+        """
+        对多个图像做一次批量检测
+        参数:
+            jobs: [(region_index, bgra, offset)], offset为图像左上角的全局坐标
+        返回:
+            与jobs对应的 [(xyxy, confs)], 全局坐标
+        """
+        if not jobs:
+            return []
+        size = self.sizer.current if self.sizer is not None else self.imgsz
+        imgs, metas = [], []
+        for index, bgra, _ in jobs:
+            # 去alpha通道并letterbox到该区域的常驻输入缓冲区
+            img, meta = self.buffers[index].prepare(bgra, size)
+            imgs.append(img)
+            metas.append(meta)
+
+        start = time.time()
+        batch = self.engine.infer_batch(imgs, conf=self.confidence, imgsz=size)
+        end = time.time()
+        self.batches += 1
+        self.batch_images += len(imgs)
+        if self.spans is not None:
+            self.spans.record('inference', start, end)
+
+        results = []
+        for (_, _, offset), meta, boxes in zip(jobs, metas, batch):
+            # 批量过滤, 转换到全局坐标
+            xyxy, confs = filter_boxes(*boxes, class_id=self.class_id, confidence=self.confidence)
+            to_source_coords(xyxy, meta)
+            xyxy[:, [0, 2]] += offset[0]
+            xyxy[:, [1, 3]] += offset[1]
+            results.append((xyxy, confs))
+        if self.spans is not None:
+            self.spans.record('postprocess', end, time.time())
+        return results
+
+    def _detect_parts(self, parts):
+        """检测所有区域, 静止区域复用缓存, 局部变化区域只检测变化部分"""
+        found = []
+        jobs, pending = [], []
+        for part in parts:
+            index = part['region']
+            ox, oy = part['offset']
+            change, area = None, None
+            if self.change_detectors is not None and self.caches[index] is not None:
+                change, area = self.change_detectors[index].check(part['img'], part['offset'])
+
+            if change == STATIC:
+                # 画面未变化, 复用上次的检测结果
+                xyxy, confs = self.caches[index]
+                found.append((xyxy.copy(), confs.copy()))
+            elif change == PARTIAL:
+                # 只对变化区域推理, 区域外沿用缓存的检测框
+                x1, y1, x2, y2 = area
+                jobs.append((index, part['img'][y1:y2, x1:x2], (ox + x1, oy + y1)))
+                pending.append((part, (ox + x1, oy + y1, ox + x2, oy + y2)))
+            else:
+                jobs.append((index, part['img'], part['offset']))
+                pending.append((part, None))
+
+        for (part, area), (xyxy, confs) in zip(pending, self.detect_batch(jobs)):
+            index = part['region']
+            if area is not None:
+                cached_xyxy, cached_confs = self.caches[index]
+                xyxy, confs = merge_detections(cached_xyxy, cached_confs, xyxy, confs, area)
+            if self.change_detectors is not None:
+                self.caches[index] = (xyxy.copy(), confs.copy())
+                self.change_detectors[index].commit(part['img'], part['offset'])
+            found.append((xyxy, confs))
+
+        if not found:
+            return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32)
+        return (np.concatenate([f[0] for f in found]).astype(np.float32),
+                np.concatenate([f[1] for f in found]).astype(np.float32))
+
+    def process(self, frame):
+        """
+        处理一帧
+        参数:
+            frame: {'seq', 'time', 'parts': [{'img', 'offset', 'region', 'roi'}]}
+        返回:
+            {'xyxy', 'confs', 'best', 'box', 'conf', 'track_id', 'part', 'propagated'}
+            box为选中目标的整数xyxy(全局坐标), 没有目标时为None
+        """
+        parts = frame['parts']
+        propagated = None
+        if self.flow is not None and self.flow_region is not None and not self.flow.need_detection():
+            # 两次检测之间用光流传播目标框
+            part = next((p for p in parts if p['region'] == self.flow_region), None)
+            if part is not None:
+                propagated = self.flow.propagate(part['img'], part['offset'])
+
+        if propagated is not None:
+            xyxy = np.array([propagated[0]], dtype=np.float32)
+            confs = np.array([propagated[1]], dtype=np.float32)
+        else:
+            xyxy, confs = self._detect_parts(parts)
+
+        # 按策略选择目标
+        select_start = time.time()
+        best = select_index(xyxy, confs, self.select_policy,
+                            crosshair=self.crosshair, previous=self.last_target)
+        track_ids = self.tracker.update(xyxy, frame['time'], confs) if self.tracker is not None else None
+
+        result = {'xyxy': xyxy, 'confs': confs, 'best': best, 'box': None, 'conf': 0.0,
+                  'track_id': None, 'part': None, 'propagated': propagated is not None}
+        if best is not None:
+            x1, y1, x2, y2 = [int(v) for v in xyxy[best]]
+            center = ((x1 + x2) / 2.0, (y1 + y2) / 2.0)
+            result.update(box=(x1, y1, x2, y2), conf=float(confs[best]), part=find_part(parts, center),
+                          track_id=track_ids[best] if track_ids is not None else None)
+            self.last_target = center
+        if self.spans is not None:
+            self.spans.record('select', select_start, time.time(), frame['seq'])
+
+        part = result['part']
+        if self.sizer is not None:
+            if part is not None:
+                self.sizer.update(y2 - y1, max(part['img'].shape[:2]))
+            else:
+                self.sizer.update(None, None)
+        if self.flow is not None and propagated is None:
+            if part is not None:
+                self.flow.reset(part['img'], part['offset'], xyxy[best], float(confs[best]))
+                self.flow_region = part['region']
+            else:
+                self.flow.clear()
+                self.flow_region = None
+        return result
+
+    def stats(self):
+        """返回处理统计"""
+        info = {
+            'batches': self.batches,
+            'batch_size': self.batch_images / float(max(1, self.batches)),
+            'buffers': [b.stats() for b in self.buffers],
+        }
+        if self.tracker is not None:
+            info['tracker'] = {'tracks': len(self.tracker.tracks), 'latency': self.tracker.latency}
+        if self.sizer is not None:
+            info['imgsz'] = {'current': self.sizer.current, 'switches': self.sizer.switches}
+        if self.change_detectors is not None:
+            change = {}
+            for detector in self.change_detectors:
+                for key, value in detector.stats.items():
+                    change[key] = change.get(key, 0) + value
+            info['change'] = change
+        if self.flow is not None:
+            info['flow'] = dict(self.flow.stats, interval=self.flow.interval, motion=self.flow.motion)
+        return info
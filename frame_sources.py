@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+帧来源
+
+追踪流水线从帧来源读取帧, 实时截屏和离线回放使用同一套接口:
+    source.regions        区域字典列表(全局坐标)
+    source.read(now)      返回 {'time', 'parts', 'labels', 'name'}, 没有更多帧时返回None
+    source.close()
+parts 与采集阶段的格式相同: [{'img': BGRA, 'offset', 'region', 'roi'}];
+labels 为该帧真值框的xyxy数组(全局坐标), 没有标签时为None。
+
+    LiveSource      mss实时截屏(可配合ROI)
+    VideoSource     视频文件
+    ImageDirSource  图像目录, labels目录存在时读取YOLO格式真值
+    SyntheticSource 合成画面: 固定噪声背景上一个匀速移动的目标, 自带真值
+
+离线来源的'time'为按帧率推算的模拟时间, 回放速度快于实时时跟踪器的速度估计仍然正确。
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+
+
+def _full_region(width, height):
+    return {'left': 0, 'top': 0, 'width': int(width), 'height': int(height)}
+
+
+def _single_part(bgra):
+    return [{'img': bgra, 'offset': (0, 0), 'region': 0, 'roi': False}]
+
+
+class LiveSource(object):
+    """
+    实时截屏
+    参数:
+        regions: 区域字典列表(全局桌面坐标)
+        roi_states: 与区域一一对应的RoiState, 可选
+    """
+    live = True
+    fps = None
+
+    def __init__(self, regions, roi_states=None):
+        from frame_grabber import RegionGrabber
+        self.regions = regions
+        self._grabber = RegionGrabber(regions, roi_states)
+
+    def read(self, now=None):
+        now = time.time() if now is None else now
+        return {'time': now, 'parts': self._grabber.grab(now), 'labels': None, 'name': None}
+
+    def close(self):
+        self._grabber.close()
+
+
+class VideoSource(object):
+    """
+    视频文件
+    参数:
+        path: 视频路径
+        limit: 最多读取的帧数
+    """
+    live = False
+
+    def __init__(self, path, limit=None):
+        self.path = path
+        self.limit = limit
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise IOError("无法打开视频: {}".format(path))
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+        width = self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        self.regions = [_full_region(width, height)]
+        self._index = 0
+
+    def read(self, now=None):
+        if self.limit is not None and self._index >= self.limit:
+            return None
+        ok, img = self._capture.read()
+        if not ok:
+            return None
+        name = "{}#{}".format(os.path.basename(self.path), self._index)
+        frame = {'time': self._index / self.fps, 'parts': _single_part(cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)),
+                 'labels': None, 'name': name}
+        self._index += 1
+        return frame
+
+    def close(self):
+        self._capture.release()
+
+
+class ImageDirSource(object):
+    """
+    图像目录, 按文件名排序作为帧序列
+    参数:
+        image_dir: 图像目录, 如 valid/images
+        class_id: 只读取该类别的真值框, None表示全部
+        label_dir: 标签目录, 默认与image_dir同级的labels
+        fps: 推算模拟时间使用的帧率
+        limit: 最多读取的帧数
+    """
+    live = False
+
+    def __init__(self, image_dir, class_id=None, label_dir=None, fps=30.0, limit=None):
+        self.image_dir = image_dir
+        self.class_id = class_id
+        self.label_dir = label_dir or os.path.join(os.path.dirname(os.path.normpath(image_dir)), 'labels')
+        self.fps = fps
+        self.names = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTS))[:limit]
+        if not self.names:
+            raise IOError("目录中没有图像: {}".format(image_dir))
+        from image_meta import image_size
+        self.regions = [_full_region(*image_size(os.path.join(image_dir, self.names[0])))]
+        self._index = 0
+
+    def read(self, now=None):
+        from imgsz_tune import load_label_boxes
+        while self._index < len(self.names):
+            name = self.names[self._index]
+            index = self._index
+            self._index += 1
+            img = cv2.imread(os.path.join(self.image_dir, name))
+            if img is None:
+                continue
+            label_path = os.path.join(self.label_dir, os.path.splitext(name)[0] + '.txt')
+            labels = load_label_boxes(label_path, img.shape[1], img.shape[0], self.class_id)
+            return {'time': index / self.fps, 'parts': _single_part(cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)),
+                    'labels': labels, 'name': name}
+        return None
+
+    def close(self):
+        pass
+
+
+class SyntheticSource(object):
+    """
+    合成画面: 固定的噪声背景上一个匀速移动、碰到边缘反弹的深色矩形
+    参数:
+        width, height: 画面尺寸
+        count: 帧数
+        box_size: 目标宽高
+        velocity: 目标速度(像素/秒)
+        fps: 帧率
+        seed: 随机种子
+    """
+    live = False
+
+    def __init__(self, width=1280, height=720, count=300, box_size=(64, 40), velocity=(240.0, 90.0),
+                 fps=30.0, seed=0):
+        self.regions = [_full_region(width, height)]
+        self.count = count
+        self.box_size = box_size
+        self.velocity = velocity
+        self.fps = fps
+        rng = np.random.RandomState(seed)
+        self._background = np.empty((height, width, 4), dtype=np.uint8)
+        self._background[..., :3] = rng.randint(96, 192, size=(height, width, 3))
+        self._background[..., 3] = 255
+        self._position = (width / 3.0, height / 3.0)
+        self._index = 0
+
+    def _step(self, dt):
+        width, height = self.regions[0]['width'], self.regions[0]['height']
+        bw, bh = self.box_size
+        x, y = self._position
+        vx, vy = self.velocity
+        x, y = x + vx * dt, y + vy * dt
+        if x < 0 or x + bw > width:
+            vx = -vx
+            x = min(max(x, 0), width - bw)
+        if y < 0 or y + bh > height:
+            vy = -vy
+            y = min(max(y, 0), height - bh)
+        self._position = (x, y)
+        self.velocity = (vx, vy)
+
+    def read(self, now=None):
+        if self._index >= self.count:
+            return None
+        if self._index:
+            self._step(1.0 / self.fps)
+        x, y = [int(round(v)) for v in self._position]
+        bw, bh = self.box_size
+        img = self._background.copy()
+        img[y:y + bh, x:x + bw, :3] = 24
+        frame = {'time': self._index / self.fps, 'parts': _single_part(img),
+                 'labels': np.array([[x, y, x + bw, y + bh]], dtype=np.float32),
+                 'name': "synthetic#{}".format(self._index)}
+        self._index += 1
+        return frame
+
+    def close(self):
+        pass
+
+
+def open_source(spec, class_id=None, limit=None, monitor=1):
+    """
+    按描述创建帧来源
+    参数:
+        spec: 'screen'(实时截屏), 'synthetic', 图像目录, 或视频文件路径
+    """
+    if spec == 'screen':
+        import mss
+        with mss.mss() as sct:
+            area = sct.monitors[monitor]
+        return LiveSource([{'left': area['left'], 'top': area['top'],
+                            'width': area['width'], 'height': area['height']}])
+    if spec == 'synthetic':
+        return SyntheticSource(count=limit or 300)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, class_id=class_id, limit=limit)
+    if os.path.isfile(spec):
+        return VideoSource(spec, limit=limit)
+    raise ValueError("无法识别的帧来源: {}".format(spec))
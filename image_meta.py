@@ -0,0 +1,139 @@
+"""
+Header-only image dimension reader.
+
+Validators only need an image's width and height to bounds-check labels.
+Instead of decoding the whole image, this reads the PNG IHDR chunk or walks
+the JPEG marker segments up to the first SOF frame header, seeking over
+everything else, so only a few KB of each file are touched. The EXIF
+orientation tag is honoured so sizes match what cv2.imread returns.
+Files whose header can't be parsed fall back to a full decode.
+
+Usage:
+    from image_meta import image_size
+    width, height = image_size('train/images/xxx.jpg')
+"""
+import os
+import struct
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# SOF0-SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xD8)) | {0x01, 0xD8}
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+class ImageHeaderError(ValueError):
+    """The file is not a PNG/JPEG or its header is malformed"""
+
+
+def _read_exact(f, count):
+    data = f.read(count)
+    if len(data) != count:
+        raise ImageHeaderError("Unexpected end of file")
+    return data
+
+
+def png_size(f):
+    """(width, height) from the IHDR chunk; f is positioned after the signature"""
+    length, chunk_type = struct.unpack('>I4s', _read_exact(f, 8))
+    if chunk_type != b'IHDR' or length < 8:
+        raise ImageHeaderError("PNG does not start with IHDR")
+    return struct.unpack('>II', _read_exact(f, 8))
+
+
+def exif_orientation(segment):
+    """Orientation (1-8) from an APP1 Exif segment, 1 if absent"""
+    if not segment.startswith(b'Exif\x00\x00') or len(segment) < 14:
+        return 1
+    tiff = segment[6:]
+    endian = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if endian is None:
+        return 1
+    ifd = struct.unpack(endian + 'I', tiff[4:8])[0]
+    if ifd + 2 > len(tiff):
+        return 1
+    count = struct.unpack(endian + 'H', tiff[ifd:ifd + 2])[0]
+    for i in range(count):
+        entry = ifd + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, _, _ = struct.unpack(endian + 'HHI', tiff[entry:entry + 8])
+        if tag == EXIF_ORIENTATION_TAG:
+            return struct.unpack(endian + 'H', tiff[entry + 8:entry + 10])[0]
+    return 1
+
+
+def jpeg_size(f):
+    """
+    (width, height) from the first SOF segment; f is positioned after SOI.
+    Segments before SOF are skipped with seek, except APP1 which is read for
+    the EXIF orientation.
+    """
+    orientation = 1
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b'\xff':
+            raise ImageHeaderError("Expected JPEG marker")
+        marker = byte[0]
+        while marker == 0xFF:  # fill bytes
+            marker = _read_exact(f, 1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / SOS before any frame header
+            raise ImageHeaderError("No SOF segment before scan data")
+        length = struct.unpack('>H', _read_exact(f, 2))[0]
+        if length < 2:
+            raise ImageHeaderError("Invalid JPEG segment length")
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack('>BHH', _read_exact(f, 5))
+            if width == 0 or height == 0:
+                raise ImageHeaderError("JPEG frame has zero size")
+            if orientation in (5, 6, 7, 8):  # rotated by 90 degrees
+                return height, width
+            return width, height
+        if marker == 0xE1:
+            orientation = exif_orientation(_read_exact(f, length - 2))
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def header_size(path):
+    """(width, height) from the file header; raises ImageHeaderError if it can't be parsed"""
+    with open(path, 'rb') as f:
+        head = f.read(8)
+        if head == PNG_SIGNATURE:
+            return png_size(f)
+        if head[:2] == b'\xff\xd8':
+            f.seek(2)
+            return jpeg_size(f)
+    raise ImageHeaderError("Not a PNG or JPEG file")
+
+
+def decode_size(path):
+    """(width, height) by fully decoding the image"""
+    import cv2
+    img = cv2.imread(path)
+    if img is None:
+        raise IOError("Failed to load image")
+    if img.size == 0:
+        raise IOError("Empty image")
+    return img.shape[1], img.shape[0]
+
+
+def image_size(path, fallback=True):
+    """
+    Image (width, height), reading only the header.
+
+    Args:
+        path: PNG or JPEG file
+        fallback: fully decode the image when the header can't be parsed
+    Raises:
+        IOError if the image can't be read at all
+    """
+    try:
+        return header_size(path)
+    except ImageHeaderError:
+        if not fallback:
+            raise
+    return decode_size(path)
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+模型输入尺寸自动调优
+
+离线: 在保存的帧序列上扫描候选输入边长(320-1280), 测量延迟和目标召回率,
+      选出满足召回率要求的最小边长。
+在线: DynamicImgsz 根据上一个目标框的大小动态切换输入边长,
+      远处的小目标用大尺寸, 近处的大目标用小尺寸。
+
+用法:
+    python imgsz_tune.py --model best.pt --source valid/images --recall 0.9
+    python imgsz_tune.py --record clips/session1 --count 200   # 从屏幕录制帧序列
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from box_select import resolve_class_id
+
+CANDIDATE_SIZES = (320, 416, 512, 640, 768, 960, 1280)
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+
+# 按目标框高度(原图像素)划分的尺寸区间
+SIZE_BUCKETS = (('small', 0, 32), ('medium', 32, 96), ('large', 96, float('inf')))
+
+
+def load_label_boxes(label_path, img_w, img_h, class_id=None):
+    """读取YOLO格式标签, 返回像素坐标的xyxy数组; 标签不存在时返回None"""
+    if not os.path.exists(label_path):
+        return None
+    boxes = []
+    with open(label_path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            cls, cx, cy, w, h = int(float(parts[0])), float(parts[1]), float(parts[2]), float(parts[3]), float(parts[4])
+            if class_id is not None and cls != class_id:
+                continue
+            boxes.append(((cx - w / 2) * img_w, (cy - h / 2) * img_h, (cx + w / 2) * img_w, (cy + h / 2) * img_h))
+    return np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def load_clip(source, class_id=None, limit=None):
+    """
+    读取帧序列目录; images/xxx.jpg 对应的 labels/xxx.txt 存在时作为真值
+    返回:
+        [(path, img, gt_boxes 或 None)]
+    """
+    import cv2
+    label_dir = os.path.join(os.path.dirname(os.path.normpath(source)), 'labels')
+    names = sorted(f for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTS))
+    clip = []
+    for name in names[:limit]:
+        img = cv2.imread(os.path.join(source, name))
+        if img is None:
+            continue
+        label_path = os.path.join(label_dir, os.path.splitext(name)[0] + '.txt')
+        gt = load_label_boxes(label_path, img.shape[1], img.shape[0], class_id)
+        clip.append((name, img, gt))
+    return clip
+
+
+def match_boxes(gt, det, iou_threshold=0.5):
+    """返回每个真值框是否被检测到(IoU >= 阈值)"""
+    from target_tracker import iou_matrix
+    if len(gt) == 0:
+        return np.zeros((0,), dtype=bool)
+    if len(det) == 0:
+        return np.zeros((len(gt),), dtype=bool)
+    return iou_matrix(gt, det).max(axis=1) >= iou_threshold
+
+
+def sweep_sizes(engine, clip, class_id, sizes=CANDIDATE_SIZES, conf=0.25, iou_threshold=0.5, warmup=2):
+    """
+    在帧序列上扫描各输入边长
+    没有标签的帧以最大边长的检测结果作为参考真值
+    返回:
+        {imgsz: {'mean_ms', 'p95_ms', 'recall', 'recall_by_size': {...}}}
+    """
+    sizes = sorted(sizes)
+    reference = {}
+    for name, img, gt in clip:
+        if gt is None:
+            xyxy, _, cls = engine.infer(img, conf=conf, imgsz=sizes[-1])
+            reference[name] = xyxy[cls == class_id]
+        else:
+            reference[name] = gt
+
+    report = {}
+    for imgsz in sizes:
+        for _, img, _ in clip[:warmup]:
+            engine.infer(img, conf=conf, imgsz=imgsz)
+        times = []
+        hits = dict((bucket, [0, 0]) for bucket, _, _ in SIZE_BUCKETS)
+        for name, img, _ in clip:
+            start = time.perf_counter()
+            xyxy, _, cls = engine.infer(img, conf=conf, imgsz=imgsz)
+            times.append(time.perf_counter() - start)
+            gt = reference[name]
+            found = match_boxes(gt, xyxy[cls == class_id], iou_threshold)
+            heights = gt[:, 3] - gt[:, 1]
+            for bucket, low, high in SIZE_BUCKETS:
+                in_bucket = (heights >= low) & (heights < high)
+                hits[bucket][0] += int(found[in_bucket].sum())
+                hits[bucket][1] += int(in_bucket.sum())
+
+        times = np.array(times) * 1000.0
+        found_total = sum(h[0] for h in hits.values())
+        gt_total = sum(h[1] for h in hits.values())
+        report[imgsz] = {
+            'mean_ms': float(times.mean()),
+            'p95_ms': float(np.percentile(times, 95)),
+            'recall': found_total / float(gt_total) if gt_total else 1.0,
+            'recall_by_size': dict((bucket, h[0] / float(h[1]) if h[1] else None) for bucket, h in hits.items()),
+            'targets': gt_total,
+        }
+    return report
+
+
+def pick_imgsz(report, recall_target=0.9):
+    """选出召回率达标的最小输入边长, 都不达标时返回召回率最高的边长"""
+    for imgsz in sorted(report):
+        if report[imgsz]['recall'] >= recall_target:
+            return imgsz
+    return max(report, key=lambda s: report[s]['recall'])
+
+
+class DynamicImgsz(object):
+    """
+    根据上一个目标框大小选择输入边长
+    参数:
+        sizes: 可选的输入边长
+        default: 没有目标时使用的边长(全屏搜索小目标)
+        min_box_px: 目标在模型输入中的最小高度(像素), 小于该值时换更大的边长
+        hysteresis: 换更小边长时要求目标高度至少为 min_box_px 的倍数, 避免来回切换
+    """
+
+    def __init__(self, sizes=CANDIDATE_SIZES, default=640, min_box_px=32, hysteresis=1.5):
+        self.sizes = sorted(sizes)
+        self.default = default
+        self.min_box_px = min_box_px
+        self.hysteresis = hysteresis
+        self.current = default
+        self.switches = 0
+
+    def update(self, box_height, frame_long_side):
+        """
+        根据目标框高度(帧像素)和帧的长边更新输入边长
+        box_height为None表示没有目标, 回到默认边长
+        """
+        if box_height is None or box_height <= 0:
+            chosen = self.default
+        else:
+            # 目标在模型输入中的高度 = box_height * imgsz / frame_long_side
+            def smallest(min_px):
+                for imgsz in self.sizes:
+                    if box_height * imgsz / float(frame_long_side) >= min_px:
+                        return imgsz
+                return self.sizes[-1]
+            chosen = smallest(self.min_box_px)
+            if chosen < self.current:
+                chosen = max(chosen, min(self.current, smallest(self.min_box_px * self.hysteresis)))
+        if chosen != self.current:
+            self.current = chosen
+            self.switches += 1
+        return self.current
+
+
+def record_clip(out_dir, count=200, interval=0.1, monitor_index=1):
+    """从屏幕录制一段帧序列, 保存为 out_dir/images/frame_xxxxxx.jpg"""
+    import cv2
+    import mss
+    image_dir = os.path.join(out_dir, 'images')
+    if not os.path.exists(image_dir):
+        os.makedirs(image_dir)
+    with mss.mss() as sct:
+        monitor = sct.monitors[monitor_index]
+        for i in range(count):
+            img = np.array(sct.grab(monitor))[:, :, :3]
+            cv2.imwrite(os.path.join(image_dir, 'frame_{:06d}.jpg'.format(i)), img)
+            time.sleep(interval)
+    print("已保存 {} 帧到 {}".format(count, image_dir))
+    return image_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="扫描模型输入边长, 选出满足召回率的最小尺寸")
+    parser.add_argument('--model', default='best.pt')
+    parser.add_argument('--source', default='valid/images', help="帧序列目录")
+    parser.add_argument('--target-class', default='tank')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(CANDIDATE_SIZES))
+    parser.add_argument('--recall', type=float, default=0.9, help="要求的召回率")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--limit', type=int, default=None, help="最多使用的帧数")
+    parser.add_argument('--report', default=None, help="把结果写入JSON文件")
+    parser.add_argument('--record', default=None, help="录制帧序列到该目录后退出")
+    parser.add_argument('--count', type=int, default=200, help="录制的帧数")
+    args = parser.parse_args()
+
+    if args.record:
+        record_clip(args.record, args.count)
+        return
+
+    from inference_backends import TorchEngine
+    engine = TorchEngine(args.model)
+    class_id = resolve_class_id(engine.names, args.target_class)
+    if class_id is None:
+        print("[ERROR] 模型中没有类别: {}".format(args.target_class))
+        return
+
+    clip = load_clip(args.source, class_id, args.limit)
+    if not clip:
+        print("[ERROR] 没有可用的帧: {}".format(args.source))
+        return
+    print("使用 {} 帧, 其中 {} 帧有标签".format(len(clip), sum(1 for c in clip if c[2] is not None)))
+
+    report = sweep_sizes(engine, clip, class_id, args.sizes, args.conf)
+    print("\n{:>6} {:>10} {:>10} {:>8} {:>8} {:>8} {:>8}".format(
+        'imgsz', 'mean(ms)', 'p95(ms)', 'recall', 'small', 'medium', 'large'))
+    for imgsz in sorted(report):
+        r = report[imgsz]
+        by_size = ["{:>8}".format('-' if r['recall_by_size'][b] is None else "{:.3f}".format(r['recall_by_size'][b]))
+                   for b, _, _ in SIZE_BUCKETS]
+        print("{:>6} {:>10.2f} {:>10.2f} {:>8.3f} {}".format(imgsz, r['mean_ms'], r['p95_ms'], r['recall'], " ".join(by_size)))
+
+    best = pick_imgsz(report, args.recall)
+    print("\n推荐输入边长: {} (召回率 {:.3f}, 目标 {:.3f})".format(best, report[best]['recall'], args.recall))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'recommended': best, 'recall_target': args.recall,
+                       'sizes': dict((str(k), v) for k, v in report.items())}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+可插拔的推理后端
+
+所有后端提供相同的接口:
+    engine.names                         类别字典 {id: name}
+    engine.infer(img, conf, iou, imgsz)  输入BGR图像, 返回 (xyxy, conf, cls) NumPy数组, 坐标为输入图像坐标
+    engine.infer_batch(imgs, conf, ...)  一次调用处理多张图像, 返回每张图像的 (xyxy, conf, cls)
+    engine.dynamic_imgsz                 是否支持每次调用改变输入边长(imgsz参数)
+
+    torch     Ultralytics/PyTorch, 直接加载 .pt
+    onnx      ONNX Runtime CPU, 自带letterbox预处理和NumPy NMS
+    openvino  OpenVINO CPU, 预处理和后处理与onnx后端相同
+
+用法:
+    python inference_backends.py --model best.pt --source valid/images --backends torch onnx openvino
+"""
+import abc
+import argparse
+import ast
+import glob
+import os
+import time
+
+import numpy as np
+
+
+def letterbox(img, imgsz, pad_value=114):
+    """
+    等比缩放并居中填充到 imgsz x imgsz
+    返回:
+        (canvas, (scale, pad_left, pad_top))
+    """
+    import cv2
+    h, w = img.shape[:2]
+    if (h, w) == (imgsz, imgsz):
+        return img, (1.0, 0, 0)
+    scale = min(imgsz / float(h), imgsz / float(w))
+    nw, nh = int(round(w * scale)), int(round(h * scale))
+    left, top = (imgsz - nw) // 2, (imgsz - nh) // 2
+    canvas = np.full((imgsz, imgsz, 3), pad_value, dtype=np.uint8)
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return canvas, (scale, left, top)
+
+
+def nms(boxes, scores, iou_threshold):
+    """NumPy实现的贪心NMS, 返回保留的下标(按分数降序)"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_yolov8(output, conf_threshold, iou_threshold, max_det=300):
+    """
+    解码YOLOv8导出模型的原始输出 (1, 4 + nc, N)
+    返回:
+        (xyxy, conf, cls), 坐标为模型输入画布坐标
+    """
+    preds = output[0].T  # (N, 4 + nc)
+    scores = preds[:, 4:]
+    cls = scores.argmax(axis=1)
+    conf = scores[np.arange(len(scores)), cls]
+    mask = conf > conf_threshold
+    preds, conf, cls = preds[mask], conf[mask], cls[mask]
+    if len(preds) == 0:
+        return (np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32),
+                np.zeros((0,), dtype=np.float32))
+
+    cx, cy, w, h = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+    xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    # 按类别偏移坐标, 一次NMS实现分类别抑制
+    offsets = cls[:, None].astype(np.float32) * 7680.0
+    keep = nms(xyxy + offsets, conf, iou_threshold)[:max_det]
+    return (xyxy[keep].astype(np.float32), conf[keep].astype(np.float32),
+            cls[keep].astype(np.float32))
+
+
+def parse_names(value, nc=None):
+    """解析导出模型元数据中的类别名称"""
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            value = None
+    if isinstance(value, dict):
+        return dict((int(k), v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return dict(enumerate(value))
+    return dict((i, str(i)) for i in range(nc or 0))
+
+
+class TorchEngine(object):
+    """Ultralytics PyTorch后端"""
+    name = 'torch'
+    dynamic_imgsz = True
+
+    def __init__(self, model_path, imgsz=640, device=None):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.device = device
+        self.names = self.model.names
+
+    def infer(self, img, conf=0.25, iou=0.45, imgsz=None):
+        from box_select import boxes_to_numpy
+        results = self.model(img, conf=conf, iou=iou, imgsz=imgsz or self.imgsz, device=self.device, verbose=False)
+        return boxes_to_numpy(results[0].boxes)
+
+    def infer_batch(self, imgs, conf=0.25, iou=0.45, imgsz=None):
+        from box_select import boxes_to_numpy
+        results = self.model(list(imgs), conf=conf, iou=iou, imgsz=imgsz or self.imgsz,
+                             device=self.device, verbose=False)
+        return [boxes_to_numpy(r.boxes) for r in results]
+
+
+class _NumpyEngine(abc.ABC):
+    """ONNX/OpenVINO后端的公共部分: letterbox预处理和NumPy后处理, 子类实现 _run"""
+    name = None
+    dynamic_imgsz = False  # 导出模型的输入尺寸固定
+
+    def __init__(self, model_path, imgsz=640):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self._blob = np.empty((1, 3, imgsz, imgsz), dtype=np.float32)
+
+    @abc.abstractmethod
+    def _run(self, blob):
+        """对 (1, 3, imgsz, imgsz) 输入执行一次推理, 返回原始输出数组"""
+
+    def infer(self, img, conf=0.25, iou=0.45, imgsz=None):
+        canvas, (scale, left, top) = letterbox(img, self.imgsz)
+        # BGR HWC uint8 -> RGB CHW float32, 写入常驻输入张量
+        self._blob[0] = canvas.transpose(2, 0, 1)[::-1]
+        self._blob *= 1.0 / 255.0
+        xyxy, confs, cls = decode_yolov8(self._run(self._blob), conf, iou)
+        xyxy[:, [0, 2]] -= left
+        xyxy[:, [1, 3]] -= top
+        xyxy /= scale
+        return xyxy, confs, cls
+
+    def infer_batch(self, imgs, conf=0.25, iou=0.45, imgsz=None):
+        # 导出模型的batch维固定为1, 逐张推理
+        return [self.infer(img, conf, iou) for img in imgs]
+
+
+class OnnxEngine(_NumpyEngine):
+    """ONNX Runtime CPU后端"""
+    name = 'onnx'
+
+    def __init__(self, model_path, imgsz=640, threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("使用onnx后端需要安装onnxruntime: pip install onnxruntime")
+        model_path = resolve_model_path(model_path, 'onnx', imgsz)
+        super(OnnxEngine, self).__init__(model_path, imgsz)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        meta = self.session.get_modelmeta().custom_metadata_map
+        nc = self.session.get_outputs()[0].shape[1]
+        self.names = parse_names(meta.get('names'), nc - 4 if isinstance(nc, int) else None)
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoEngine(_NumpyEngine):
+    """OpenVINO CPU后端"""
+    name = 'openvino'
+
+    def __init__(self, model_path, imgsz=640, threads=None):
+        try:
+            import openvino as ov
+        except ImportError:
+            raise ImportError("使用openvino后端需要安装openvino: pip install openvino")
+        model_path = resolve_model_path(model_path, 'openvino', imgsz)
+        super(OpenVinoEngine, self).__init__(model_path, imgsz)
+        core = ov.Core()
+        model = core.read_model(model_path)
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if threads:
+            config['INFERENCE_NUM_THREADS'] = threads
+        self.compiled = core.compile_model(model, 'CPU', config)
+        self.request = self.compiled.create_infer_request()
+        # Ultralytics导出时会在同目录写metadata.yaml
+        names = None
+        meta_path = os.path.join(os.path.dirname(model_path), 'metadata.yaml')
+        if os.path.exists(meta_path):
+            import yaml
+            with open(meta_path, 'r') as f:
+                names = yaml.safe_load(f).get('names')
+        self.names = parse_names(names, self.compiled.output(0).get_partial_shape()[1].get_length() - 4)
+
+    def _run(self, blob):
+        return self.request.infer({0: blob})[self.compiled.output(0)]
+
+
+def resolve_model_path(model_path, backend, imgsz=640):
+    """
+    根据后端找到对应格式的模型文件
+    .pt 权重会优先使用同名的已导出文件, 不存在或比 .pt 旧时用Ultralytics重新导出
+    """
+    if not model_path.endswith('.pt'):
+        return model_path
+    base = os.path.splitext(model_path)[0]
+    if backend == 'onnx':
+        target = base + '.onnx'
+    elif backend == 'openvino':
+        target = os.path.join(base + '_openvino_model', os.path.basename(base) + '.xml')
+    else:
+        return model_path
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(model_path):
+        from ultralytics import YOLO
+        print("正在导出{}模型: {}".format(backend, model_path))
+        exported = YOLO(model_path).export(format=backend, imgsz=imgsz)
+        if backend == 'openvino' and os.path.isdir(exported):
+            target = glob.glob(os.path.join(exported, '*.xml'))[0]
+        else:
+            target = exported
+    return target
+
+
+BACKENDS = {
+    'torch': TorchEngine,
+    'onnx': OnnxEngine,
+    'openvino': OpenVinoEngine,
+}
+
+
+def load_engine(backend='torch', model_path='yolov8s.pt', imgsz=640, **kwargs):
+    """按名称创建推理后端"""
+    if backend not in BACKENDS:
+        raise ValueError("未知的推理后端: {} (可选: {})".format(backend, ", ".join(sorted(BACKENDS))))
+    return BACKENDS[backend](model_path, imgsz=imgsz, **kwargs)
+
+
+def load_frames(source, limit=50):
+    """读取用于基准测试的帧: 图像目录或单张图像"""
+    import cv2
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, '*'))
+                       if p.lower().endswith(('.jpg', '.jpeg', '.png')))
+    else:
+        paths = [source]
+    frames = [cv2.imread(p) for p in paths[:limit]]
+    return [f for f in frames if f is not None]
+
+
+def benchmark_engines(engines, frames, conf=0.25, warmup=3, repeats=1):
+    """
+    在同一组帧上比较多个后端
+    返回:
+        {后端名: {'mean_ms', 'p50_ms', 'p95_ms', 'fps', 'detections'}}
+    """
+    report = {}
+    for engine in engines:
+        for frame in frames[:warmup]:
+            engine.infer(frame, conf=conf)
+        times = []
+        detections = 0
+        for _ in range(repeats):
+            for frame in frames:
+                start = time.perf_counter()
+                xyxy, _, _ = engine.infer(frame, conf=conf)
+                times.append(time.perf_counter() - start)
+                detections += len(xyxy)
+        times = np.array(times) * 1000.0
+        report[engine.name] = {
+            'mean_ms': float(times.mean()),
+            'p50_ms': float(np.percentile(times, 50)),
+            'p95_ms': float(np.percentile(times, 95)),
+            'fps': float(1000.0 / times.mean()),
+            'detections': detections // repeats,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在相同的帧上比较各推理后端的速度")
+    parser.add_argument('--model', default='best.pt', help="模型权重路径")
+    parser.add_argument('--source', default='valid/images', help="图像目录或单张图像")
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--limit', type=int, default=50, help="最多使用的帧数")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.limit)
+    if not frames:
+        print("[ERROR] 没有可用的帧: {}".format(args.source))
+        return
+    print("使用 {} 帧进行基准测试".format(len(frames)))
+
+    engines = []
+    for backend in args.backends:
+        try:
+            engines.append(load_engine(backend, args.model, args.imgsz))
+        except Exception as e:
+            print("[WARNING] 跳过后端 {}: {}".format(backend, e))
+
+    report = benchmark_engines(engines, frames, repeats=args.repeats)
+    print("\n{:<10} {:>10} {:>10} {:>10} {:>8} {:>8}".format('后端', 'mean(ms)', 'p50(ms)', 'p95(ms)', 'FPS', '检测数'))
+    for name, r in report.items():
+        print("{:<10} {:>10.2f} {:>10.2f} {:>10.2f} {:>8.1f} {:>8}".format(
+            name, r['mean_ms'], r['p50_ms'], r['p95_ms'], r['fps'], r['detections']))
+
+
+if __name__ == '__main__':
+    main()
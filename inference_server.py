@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+本机批量推理服务
+
+模型只在服务进程中加载一次, 多个追踪进程(屏幕或视频)作为客户端通过本地
+socket发送图像; 服务在很短的等待窗口内把各客户端的请求合并为一次批量推理,
+再把检测结果分发回去。客户端 RemoteEngine 与 inference_backends.py 中的
+后端接口相同, 可以直接替换本地模型。
+
+用法:
+    python inference_server.py --model best.pt --port 6000 --max-batch 8 --max-wait 5
+    python inference_server.py --connect 127.0.0.1:6000 --source clip.mp4   # 视频客户端
+    yolo.py 中 start_yolo_follow_optimized(..., server='127.0.0.1:6000')
+
+认证密钥:
+    multiprocessing.connection 用 pickle 传输消息, 知道密钥的一方可以在另一方执行
+    任意代码, 所以密钥不能写死在代码里。密钥取自环境变量 YOLO_SERVER_AUTHKEY,
+    否则取自 ~/.yolo_server_key (权限必须为 0600), 服务第一次启动时随机生成该文件,
+    同一用户的客户端读取同一文件。服务默认只允许监听本机回环地址。
+"""
+import argparse
+import binascii
+import ipaddress
+import os
+import queue
+import socket
+import stat
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+DEFAULT_ADDRESS = ('127.0.0.1', 6000)
+AUTHKEY_ENV = 'YOLO_SERVER_AUTHKEY'
+AUTHKEY_FILE = os.path.join(os.path.expanduser('~'), '.yolo_server_key')
+
+
+def parse_address(address):
+    """'host:port' 或 (host, port) -> (host, port)"""
+    if isinstance(address, (tuple, list)):
+        return address[0], int(address[1])
+    host, _, port = str(address).rpartition(':')
+    return host or DEFAULT_ADDRESS[0], int(port)
+
+
+def load_authkey(path=AUTHKEY_FILE, create=False):
+    """
+    读取连接认证密钥: 环境变量 YOLO_SERVER_AUTHKEY 优先, 否则读取密钥文件
+    参数:
+        path: 密钥文件, 必须只有所有者可读写
+        create: 文件不存在时随机生成(服务端)
+    返回:
+        bytes 密钥
+    """
+    key = os.environ.get(AUTHKEY_ENV)
+    if key:
+        return key.encode('utf-8')
+    if create and not os.path.exists(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(binascii.hexlify(os.urandom(32)).decode('ascii'))
+        print("已生成推理服务密钥: {}".format(path))
+    if not os.path.exists(path):
+        raise IOError("找不到推理服务密钥 {}, 请先启动服务或设置环境变量 {}".format(path, AUTHKEY_ENV))
+    if os.name == 'posix' and os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise IOError("推理服务密钥 {} 可被其他用户访问, 请执行 chmod 600".format(path))
+    with open(path, 'r') as f:
+        key = f.read().strip()
+    if not key:
+        raise IOError("推理服务密钥 {} 为空".format(path))
+    return key.encode('utf-8')
+
+
+def is_loopback(host):
+    """host 是否只解析到本机回环地址"""
+    try:
+        addresses = set(info[4][0] for info in socket.getaddrinfo(host, None))
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(a.split('%')[0]).is_loopback for a in addresses)
+
+
+class _Request(object):
+    """一个客户端请求, 由批处理线程填入结果后唤醒连接线程"""
+
+    def __init__(self, imgs, conf, iou, imgsz):
+        self.imgs = imgs
+        self.conf = conf
+        self.iou = iou
+        self.imgsz = imgsz
+        self.arrival = time.time()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceServer(object):
+    """
+    动态批处理推理服务
+    参数:
+        engine: 推理后端(见 inference_backends.py)
+        address: 监听地址 (host, port)
+        authkey: 连接认证密钥, 默认见 load_authkey
+        max_batch: 每批最多图像数
+        max_wait: 收到第一个请求后最多等待多久凑批(秒)
+        allow_remote: 允许监听非回环地址(任何拿到密钥的主机都能在服务进程中执行代码)
+    """
+
+    def __init__(self, engine, address=DEFAULT_ADDRESS, authkey=None, max_batch=8, max_wait=0.005,
+                 allow_remote=False):
+        self.engine = engine
+        self.address = parse_address(address)
+        if not is_loopback(self.address[0]):
+            if not allow_remote:
+                raise ValueError("拒绝监听非回环地址 {}: 连接使用 pickle, 如确需远程访问请使用 allow_remote".format(
+                    self.address[0]))
+            print("[WARNING] 推理服务监听非回环地址 {}, 任何拿到密钥的主机都能在本机执行代码".format(self.address[0]))
+        self.authkey = authkey if authkey is not None else load_authkey(create=True)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = {'clients': 0, 'requests': 0, 'images': 0, 'batches': 0, 'wait': 0.0, 'infer': 0.0}
+        # 连接线程与批处理线程都会更新 stats
+        self._stats_lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._stop = threading.Event()
+        self._listener = None
+
+    def info(self):
+        """客户端连接时获取的模型信息"""
+        return {
+            'names': self.engine.names,
+            'model_path': self.engine.model_path,
+            'imgsz': self.engine.imgsz,
+            'backend': self.engine.name,
+            'dynamic_imgsz': self.engine.dynamic_imgsz,
+        }
+
+    def _collect(self):
+        """取出一批请求: 第一个请求到达后最多等待max_wait, 或凑满max_batch张图像"""
+        try:
+            first = self._requests.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch, count = [first], len(first.imgs)
+        deadline = first.arrival + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request.imgs)
+        return batch
+
+    def _run_batch(self, batch):
+        """按(imgsz, iou)分组做批量推理, 以组内最低置信度推理后再按各请求的阈值过滤"""
+        groups = {}
+        for request in batch:
+            imgsz = request.imgsz if self.engine.dynamic_imgsz else None
+            groups.setdefault((imgsz, request.iou), []).append(request)
+
+        for (imgsz, iou), requests in groups.items():
+            imgs = [img for request in requests for img in request.imgs]
+            conf = min(request.conf for request in requests)
+            start = time.time()
+            try:
+                results = self.engine.infer_batch(imgs, conf=conf, iou=iou, imgsz=imgsz)
+            except Exception as e:
+                for request in requests:
+                    request.error = str(e)
+                    request.done.set()
+                continue
+            with self._stats_lock:
+                self.stats['infer'] += time.time() - start
+                self.stats['batches'] += 1
+                self.stats['images'] += len(imgs)
+
+            i = 0
+            for request in requests:
+                out = []
+                for xyxy, confs, cls in results[i:i + len(request.imgs)]:
+                    keep = confs >= request.conf
+                    out.append((xyxy[keep], confs[keep], cls[keep]))
+                i += len(request.imgs)
+                with self._stats_lock:
+                    self.stats['wait'] += start - request.arrival
+                request.result = out
+                request.done.set()
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._run_batch(batch)
+
+    def _client_loop(self, conn):
+        """一个客户端连接: 请求-应答, 每个连接同时只有一个未完成的请求"""
+        with self._stats_lock:
+            self.stats['clients'] += 1
+        try:
+            while not self._stop.is_set():
+                message = conn.recv()
+                if message[0] == 'info':
+                    conn.send(('info', self.info()))
+                elif message[0] == 'infer':
+                    _, imgs, conf, iou, imgsz = message
+                    request = _Request(imgs, conf, iou, imgsz)
+                    with self._stats_lock:
+                        self.stats['requests'] += 1
+                    self._requests.put(request)
+                    request.done.wait()
+                    if request.error is not None:
+                        conn.send(('error', request.error))
+                    else:
+                        conn.send(('result', request.result))
+                else:
+                    conn.send(('error', "未知请求: {}".format(message[0])))
+        except (EOFError, IOError):
+            pass
+        finally:
+            with self._stats_lock:
+                self.stats['clients'] -= 1
+            conn.close()
+
+    def _snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _report_loop(self, interval):
+        last = self._snapshot()
+        while not self._stop.wait(interval):
+            now = self._snapshot()
+            batches = now['batches'] - last['batches']
+            images = now['images'] - last['images']
+            requests = now['requests'] - last['requests']
+            if batches:
+                print("客户端: {}, 吞吐: {:.1f} 张/秒, 平均批量: {:.2f}, 平均排队: {:.1f} ms, 平均推理: {:.1f} ms".format(
+                    now['clients'], images / float(interval), images / float(batches),
+                    (now['wait'] - last['wait']) * 1000.0 / max(1, requests),
+                    (now['infer'] - last['infer']) * 1000.0 / batches))
+            last = now
+
+    def serve_forever(self, report_interval=5.0):
+        """接受客户端连接直到 stop() 或 Ctrl+C"""
+        self._listener = Listener(self.address, authkey=self.authkey)
+        print("推理服务已启动: {}:{} (模型: {}, 后端: {}, 最大批量: {}, 最长等待: {:.1f} ms)".format(
+            self.address[0], self.address[1], self.engine.model_path, self.engine.name,
+            self.max_batch, self.max_wait * 1000.0))
+        for loop, args in ((self._batch_loop, ()), (self._report_loop, (report_interval,))):
+            thread = threading.Thread(target=loop, args=args)
+            thread.daemon = True
+            thread.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn = self._listener.accept()
+                except AuthenticationError:
+                    print("[WARNING] 拒绝了一个密钥错误的连接")
+                    continue
+                thread = threading.Thread(target=self._client_loop, args=(conn,))
+                thread.daemon = True
+                thread.start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+
+class RemoteEngine(object):
+    """
+    推理服务的客户端, 接口与 inference_backends.py 中的后端相同
+    连接断开后下一次调用会自动重连
+    """
+    name = 'remote'
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.address = parse_address(address)
+        self.authkey = authkey if authkey is not None else load_authkey()
+        self._conn = None
+        self._lock = threading.Lock()
+        info = self._call(('info',))
+        self.names = info['names']
+        self.model_path = "{}:{}/{}".format(self.address[0], self.address[1], info['model_path'])
+        self.imgsz = info['imgsz']
+        self.dynamic_imgsz = info['dynamic_imgsz']
+
+    def _call(self, message):
+        with self._lock:
+            if self._conn is None:
+                self._conn = Client(self.address, authkey=self.authkey)
+            try:
+                self._conn.send(message)
+                kind, payload = self._conn.recv()
+            except (EOFError, IOError):
+                self._conn.close()
+                self._conn = None
+                raise
+        if kind == 'error':
+            raise RuntimeError("推理服务出错: {}".format(payload))
+        return payload
+
+    def infer(self, img, conf=0.25, iou=0.45, imgsz=None):
+        return self.infer_batch([img], conf, iou, imgsz)[0]
+
+    def infer_batch(self, imgs, conf=0.25, iou=0.45, imgsz=None):
+        return self._call(('infer', [np.ascontiguousarray(img) for img in imgs], conf, iou, imgsz))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def run_video_client(address, source, conf=0.25, imgsz=None, limit=None):
+    """把视频文件(或摄像头序号)逐帧发送给推理服务, 打印吞吐"""
+    import cv2
+    engine = RemoteEngine(address)
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    frames, detections = 0, 0
+    start = time.time()
+    while limit is None or frames < limit:
+        ok, img = capture.read()
+        if not ok:
+            break
+        xyxy, _, _ = engine.infer(img, conf=conf, imgsz=imgsz)
+        frames += 1
+        detections += len(xyxy)
+        if frames % 100 == 0:
+            print("已处理 {} 帧, {:.1f} FPS".format(frames, frames / (time.time() - start)))
+    capture.release()
+    engine.close()
+    elapsed = time.time() - start
+    print("共 {} 帧, 检测 {} 个目标, 平均 {:.1f} FPS".format(frames, detections, frames / max(elapsed, 1e-6)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本机批量推理服务, 多个追踪进程共享一个模型")
+    parser.add_argument('--model', default='best.pt', help="模型权重路径")
+    parser.add_argument('--backend', default='torch', help="推理后端: torch / onnx / openvino")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--host', default=DEFAULT_ADDRESS[0])
+    parser.add_argument('--port', type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument('--allow-remote', action='store_true',
+                        help="允许监听非回环地址(危险: 拿到密钥的主机可以在本机执行任意代码)")
+    parser.add_argument('--max-batch', type=int, default=8, help="每批最多图像数")
+    parser.add_argument('--max-wait', type=float, default=5.0, help="凑批最长等待(毫秒)")
+    parser.add_argument('--watch', action='store_true', help="监视权重文件, 变化后热更新模型")
+    parser.add_argument('--connect', default=None, help="作为客户端连接到 host:port")
+    parser.add_argument('--source', default=None, help="客户端模式下发送的视频文件或摄像头序号")
+    parser.add_argument('--limit', type=int, default=None, help="客户端模式下最多发送的帧数")
+    args = parser.parse_args()
+
+    if args.connect:
+        if args.source is None:
+            print("[ERROR] 客户端模式需要 --source")
+            return
+        run_video_client(args.connect, args.source, limit=args.limit)
+        return
+
+    if not args.allow_remote and not is_loopback(args.host):
+        print("[ERROR] 拒绝监听非回环地址 {}, 如确需远程访问请加 --allow-remote".format(args.host))
+        return
+
+    from inference_backends import load_engine
+    engine = load_engine(args.backend, args.model, args.imgsz)
+    if args.watch:
+        from model_reload import HotSwapEngine
+        engine = HotSwapEngine(lambda path: load_engine(args.backend, path, args.imgsz), args.model,
+                               engine=engine, imgsz=args.imgsz).start()
+    print("正在预热模型...")
+    engine.infer_batch([np.zeros((args.imgsz, args.imgsz, 3), dtype=np.uint8)] * args.max_batch)
+    server = InferenceServer(engine, (args.host, args.port), max_batch=args.max_batch,
+                             max_wait=args.max_wait / 1000.0, allow_remote=args.allow_remote)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 import os
 import yaml
-import cv2
+from image_meta import image_size
 import numpy as np
 from tqdm import tqdm
 
@@ -10,10 +10,9 @@ def load_yaml(file_path):
 
 def check_image_file(img_path):
     try:
-        img = cv2.imread(img_path)
-        if img is None:
-            return False, "Failed to load image"
-        if img.size == 0:
+        # Only the header is read; corrupt headers fall back to a full decode
+        width, height = image_size(img_path)
+        if width == 0 or height == 0:
             return False, "Empty image"
         return True, "OK"
     except Exception as e:
@@ -115,9 +114,8 @@ def check_dataset_split(split_name, data_dir, img_dir_name='images', label_dir_n
             all_ok = False
             continue
             
-        # Get image shape for label validation
-        img = cv2.imread(img_path)
-        img_shape = img.shape
+        # Get image shape for label validation from the header, no second decode
+        img_shape = image_size(img_path)[::-1]
         
         # Check label
         label_ok, label_msg = check_label_file(label_path, img_shape)
@@ -0,0 +1,400 @@
+"""
+Columnar index of all YOLO labels in a split.
+
+Every label file of a split is parsed once into one contiguous NumPy
+structured array with columns image_idx, cls, cx, cy, w, h, plus an offsets
+array so the boxes of image i are labels[offsets[i]:offsets[i + 1]].
+Files where every line has five finite numbers (the common case) are
+converted in a single vectorized call; only files that fail are reparsed line
+by line to locate the bad lines. Lines are rejected and numbered (counting
+blank lines) exactly as dataset_validator.py does, so both tools agree.
+
+The index is cached next to the labels directory (train/labels.index.npy,
+train/labels.offsets.npy, train/labels.index.lines.npy and
+train/labels.index.json, alongside the labels.cache written by Ultralytics)
+and reused while no label file has changed. The .npy files can be
+memory-mapped by other tools.
+
+Usage:
+    from label_index import load_label_index
+    index = load_label_index('train/labels', 'train/images')
+    bad = index.invalid_rows(nc=1)
+    python label_index.py train/labels valid/labels
+    python label_index.py --self-check
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+LABEL_DTYPE = np.dtype([('image_idx', '<i4'), ('cls', '<i4'),
+                        ('cx', '<f4'), ('cy', '<f4'), ('w', '<f4'), ('h', '<f4')])
+IMG_EXTS = ('.jpg', '.jpeg', '.png')
+INDEX_VERSION = 3
+
+
+def _content_lines(content):
+    """[(line_number, line)] of the non-blank lines, numbered like dataset_validator (blank lines count)"""
+    return [(number, line) for number, line in enumerate(content.splitlines(), 1) if line.strip()]
+
+
+def _read_lines(path):
+    with open(path, 'r') as f:
+        return _content_lines(f.read())
+
+
+def _parse_lines(lines):
+    """
+    Slow path for one file: split numbered lines into parsed rows and bad lines.
+
+    Returns:
+        (rows [(line_number, cls, cx, cy, w, h)], bad [(line_number, text, issue_code, message)])
+    """
+    rows, bad = [], []
+    for number, line in lines:
+        parts = line.split()
+        if len(parts) != 5:
+            bad.append((number, line.strip(), 'bad_field_count', "Expected 5 values, got {}".format(len(parts))))
+            continue
+        try:
+            values = [float(p) for p in parts]
+        except ValueError as e:
+            bad.append((number, line.strip(), 'parse_error', str(e)))
+            continue
+        if not np.isfinite(values).all():
+            bad.append((number, line.strip(), 'parse_error', "Non-finite value in: {}".format(line.strip())))
+            continue
+        rows.append([number] + values)
+    return rows, bad
+
+
+class LabelIndex(object):
+    """
+    All labels of one split.
+
+    Attributes:
+        label_dir: directory of the .txt label files
+        stems: file name stems, one per image (or per label file without image_dir)
+        labels: LABEL_DTYPE structured array of every box
+        offsets: int64 array, boxes of image i are labels[offsets[i]:offsets[i + 1]]
+        line_numbers: 1-based line number of each box in its label file (blank lines count)
+        missing: bool array, True where the image has no label file
+        bad_lines: [(image_idx, line_number, text, issue_code, message)] lines that could not be parsed
+    """
+
+    def __init__(self, label_dir, stems, labels, offsets, line_numbers, missing, bad_lines):
+        self.label_dir = label_dir
+        self.stems = stems
+        self.labels = labels
+        self.offsets = offsets
+        self.line_numbers = line_numbers
+        self.missing = missing
+        self.bad_lines = bad_lines
+
+    def __len__(self):
+        return len(self.stems)
+
+    def label_path(self, i):
+        return os.path.join(self.label_dir, self.stems[i] + '.txt')
+
+    def boxes(self, i):
+        """Boxes of image i, a view into the index"""
+        return self.labels[self.offsets[i]:self.offsets[i + 1]]
+
+    def counts(self):
+        """Number of boxes per image"""
+        return np.diff(self.offsets)
+
+    def empty(self):
+        """Images with a label file but no parsable boxes and no bad lines"""
+        empty = (self.counts() == 0) & ~self.missing
+        if self.bad_lines:
+            empty[[entry[0] for entry in self.bad_lines]] = False
+        return empty
+
+    def invalid_rows(self, nc=None):
+        """Per-box mask of negative or out-of-range class IDs and boxes outside [0, 1]"""
+        labels = self.labels
+        bad = labels['cls'] < 0
+        if nc is not None:
+            bad |= labels['cls'] >= nc
+        for column in ('cx', 'cy'):
+            bad |= ~((labels[column] >= 0) & (labels[column] <= 1))
+        for column in ('w', 'h'):
+            bad |= ~((labels[column] > 0) & (labels[column] <= 1))
+        return bad
+
+    def images_with(self, row_mask):
+        """Sorted indices of images that have at least one box in row_mask"""
+        return np.unique(self.labels['image_idx'][row_mask])
+
+    def bad_lines_by_image(self):
+        grouped = {}
+        for entry in self.bad_lines:
+            grouped.setdefault(entry[0], []).append(entry)
+        return grouped
+
+    def write_label(self, i, rows, changed=None):
+        """
+        Rewrite the label file of image i with the given boxes (unparsable lines are dropped).
+        Rows not marked in changed keep their original text, so untouched boxes
+        keep their full precision instead of the float32 values in the index.
+        """
+        path = self.label_path(i)
+        with open(path, 'r') as f:
+            original = f.read().splitlines()
+        line_numbers = self.line_numbers[self.offsets[i]:self.offsets[i + 1]]
+        if changed is None:
+            changed = np.ones(len(rows), dtype=bool)
+        lines = []
+        for row, line_number, is_changed in zip(rows, line_numbers, changed):
+            if is_changed:
+                lines.extend(format_rows([row]))
+            else:
+                lines.append(original[line_number - 1].strip() + '\n')
+        with open(path, 'w') as f:
+            f.writelines(lines)
+
+
+def box_text(row):
+    """'x=.., y=.., w=.., h=..' for messages, with the shortest float32 representation"""
+    return "x={}, y={}, w={}, h={}".format(*(str(row[column]) for column in ('cx', 'cy', 'w', 'h')))
+
+
+def format_rows(rows):
+    return ["{} {:.6f} {:.6f} {:.6f} {:.6f}\n".format(int(r['cls']), r['cx'], r['cy'], r['w'], r['h'])
+            for r in rows]
+
+
+def list_stems(label_dir, image_dir=None):
+    """Sorted stems of the images in image_dir, or of the label files in label_dir"""
+    if image_dir is not None:
+        names = [f for f in os.listdir(image_dir) if f.lower().endswith(IMG_EXTS)]
+    else:
+        names = [f for f in os.listdir(label_dir) if f.endswith('.txt')]
+    return sorted(os.path.splitext(f)[0] for f in names)
+
+
+def file_signatures(label_dir, stems):
+    """[mtime_ns, size] of every label file, None where missing"""
+    signatures = []
+    for stem in stems:
+        try:
+            stat = os.stat(os.path.join(label_dir, stem + '.txt'))
+            signatures.append([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            signatures.append(None)
+    return signatures
+
+
+def build_label_index(label_dir, stems):
+    """Read and parse every label file of a split"""
+    missing = np.zeros(len(stems), dtype=bool)
+    tokens, token_images, token_lines = [], [], []
+    slow_files = []
+    for i, stem in enumerate(stems):
+        try:
+            with open(os.path.join(label_dir, stem + '.txt'), 'r') as f:
+                content = f.read()
+        except (IOError, OSError):
+            missing[i] = True
+            continue
+        lines = _content_lines(content)
+        if not lines:
+            continue
+        # Every line must have five fields; a file-wide token count would let
+        # a 4-field and a 6-field line pass and reshape into made-up boxes
+        if any(len(line.split()) != 5 for _, line in lines):
+            slow_files.append((i, lines))
+            continue
+        tokens.append(content.split())
+        token_images.append(i)
+        token_lines.append([number for number, _ in lines])
+
+    # Fast path: convert all well-formed files at once; if a token is not a number,
+    # convert file by file and send only the failing files to the slow path
+    try:
+        values = np.array([t for file_tokens in tokens for t in file_tokens], dtype=np.float64).reshape(-1, 5)
+    except ValueError:
+        converted = []
+        for file_tokens, i, numbers in zip(tokens, token_images, token_lines):
+            try:
+                converted.append((np.array(file_tokens, dtype=np.float64).reshape(-1, 5), i, numbers))
+            except ValueError:
+                slow_files.append((i, _read_lines(os.path.join(label_dir, stems[i] + '.txt'))))
+        values = np.concatenate([c[0] for c in converted]) if converted else np.zeros((0, 5))
+        token_images = [c[1] for c in converted]
+        token_lines = [c[2] for c in converted]
+    image_idx = np.repeat(np.array(token_images, dtype=np.int64), [len(n) for n in token_lines])
+    line_numbers = np.array([n for numbers in token_lines for n in numbers], dtype=np.int64)
+
+    # nan/inf parse as floats but are not valid boxes: send those files to the slow path too
+    finite = np.isfinite(values).all(axis=1)
+    if not finite.all():
+        nonfinite = np.unique(image_idx[~finite])
+        keep = ~np.isin(image_idx, nonfinite)
+        values, image_idx, line_numbers = values[keep], image_idx[keep], line_numbers[keep]
+        for i in nonfinite.tolist():
+            slow_files.append((i, _read_lines(os.path.join(label_dir, stems[i] + '.txt'))))
+
+    bad_lines = []
+    slow_values, slow_images, slow_lines = [], [], []
+    for i, lines in slow_files:
+        rows, bad = _parse_lines(lines)
+        bad_lines.extend((i,) + entry for entry in bad)
+        for row in rows:
+            slow_lines.append(row[0])
+            slow_values.append(row[1:])
+            slow_images.append(i)
+    if slow_values:
+        values = np.concatenate([values, np.array(slow_values, dtype=np.float64)])
+        image_idx = np.concatenate([image_idx, np.array(slow_images, dtype=np.int64)])
+        line_numbers = np.concatenate([line_numbers, np.array(slow_lines, dtype=np.int64)])
+
+    # Group boxes by image, keeping file order within an image
+    order = np.lexsort((line_numbers, image_idx))
+    labels = np.empty(len(order), dtype=LABEL_DTYPE)
+    labels['image_idx'] = image_idx[order]
+    # int(float(x)), as the old scripts did; huge class IDs saturate instead of wrapping
+    info = np.iinfo(np.int32)
+    labels['cls'] = np.clip(np.trunc(values[order, 0]), info.min, info.max).astype(np.int32)
+    for column, name in enumerate(('cx', 'cy', 'w', 'h'), 1):
+        labels[name] = values[order, column]
+    offsets = np.zeros(len(stems) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels['image_idx'], minlength=len(stems)), out=offsets[1:])
+    bad_lines.sort()
+    return LabelIndex(label_dir, stems, labels, offsets, line_numbers[order].astype(np.int32), missing, bad_lines)
+
+
+def cache_prefix(label_dir):
+    """train/labels -> train/labels.index"""
+    return os.path.normpath(label_dir) + '.index'
+
+
+def save_label_index(index, signatures):
+    prefix = cache_prefix(index.label_dir)
+    np.save(prefix + '.npy', index.labels)
+    np.save(os.path.normpath(index.label_dir) + '.offsets.npy', index.offsets)
+    np.save(prefix + '.lines.npy', index.line_numbers)
+    meta = {'version': INDEX_VERSION, 'stems': index.stems, 'signatures': signatures,
+            'missing': index.missing.tolist(), 'bad_lines': index.bad_lines}
+    tmp_path = prefix + '.json.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, prefix + '.json')  # written last: marks the cache complete
+
+
+def load_cached_index(label_dir, stems, signatures, mmap_mode='r'):
+    """The cached index if it was built from exactly these label files, else None"""
+    prefix = cache_prefix(label_dir)
+    try:
+        with open(prefix + '.json', 'r') as f:
+            meta = json.load(f)
+        if meta['version'] != INDEX_VERSION or meta['stems'] != stems or meta['signatures'] != signatures:
+            return None
+        labels = np.load(prefix + '.npy', mmap_mode=mmap_mode)
+        offsets = np.load(os.path.normpath(label_dir) + '.offsets.npy', mmap_mode=mmap_mode)
+        line_numbers = np.load(prefix + '.lines.npy', mmap_mode=mmap_mode)
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+    bad_lines = [tuple(entry) for entry in meta['bad_lines']]
+    return LabelIndex(label_dir, stems, labels, offsets, line_numbers, np.array(meta['missing'], dtype=bool),
+                      bad_lines)
+
+
+def load_label_index(label_dir, image_dir=None, use_cache=True):
+    """
+    Label index of one split, from the cache when no label file changed.
+
+    Args:
+        label_dir: directory of the .txt label files
+        image_dir: if given, the index has one entry per image (missing labels flagged);
+                   otherwise one entry per label file
+        use_cache: read and write the on-disk cache
+    """
+    stems = list_stems(label_dir, image_dir)
+    signatures = file_signatures(label_dir, stems)
+    if use_cache:
+        index = load_cached_index(label_dir, stems, signatures)
+        if index is not None:
+            return index
+    index = build_label_index(label_dir, stems)
+    if use_cache:
+        try:
+            save_label_index(index, signatures)
+        except (IOError, OSError) as e:
+            print("[WARNING] Could not write label index cache for {}: {}".format(label_dir, e))
+    return index
+
+
+def self_check():
+    """Parse a few malformed label files and check the index against the expected result"""
+    label_dir = tempfile.mkdtemp()
+    try:
+        files = {
+            'good': "0 0.5 0.5 0.1 0.1\n\n1 0.123456789 0.25 0.2 0.2\n",
+            'mixed': "0 0.5 0.5 0.1\n0 0.5 0.5 0.1 0.2 0.3\n",
+            'text': "0 a 0.5 0.1 0.1\n0 0.3 0.3 0.1 0.1\n",
+            'empty': "",
+            'nonfinite': "\ninf 0.5 0.5 0.1 0.1\n0 nan 0.5 0.1 0.1\n0 0.2 0.2 0.1 0.1\n",
+        }
+        for stem, content in files.items():
+            with open(os.path.join(label_dir, stem + '.txt'), 'w') as f:
+                f.write(content)
+        index = build_label_index(label_dir, sorted(files))
+        positions = dict((stem, i) for i, stem in enumerate(index.stems))
+        assert index.counts().tolist() == [0, 2, 0, 1, 1], index.counts()
+        bad = sorted((index.stems[i], line, code) for i, line, _, code, _ in index.bad_lines)
+        assert bad == [('mixed', 1, 'bad_field_count'), ('mixed', 2, 'bad_field_count'),
+                       ('nonfinite', 2, 'parse_error'), ('nonfinite', 3, 'parse_error'),
+                       ('text', 1, 'parse_error')], bad
+        assert index.empty().tolist() == [True, False, False, False, False]
+        # Line numbers count blank lines, as dataset_validator reports them
+        assert index.line_numbers[index.offsets[positions['good']]:index.offsets[positions['good'] + 1]].tolist() == \
+            [1, 3]
+        assert index.line_numbers[index.offsets[positions['nonfinite']]].tolist() == 4
+
+        # Both tools must agree on which lines are bad
+        from dataset_validator import check_label_lines
+        for stem, content in files.items():
+            _, issues = check_label_lines(content)
+            reported = sorted((line, code) for line, code, _ in issues if code in ('bad_field_count', 'parse_error'))
+            indexed = sorted((line, code) for i, line, _, code, _ in index.bad_lines if index.stems[i] == stem)
+            assert reported == indexed, (stem, reported, indexed)
+
+        # Only the changed row is reformatted; the other keeps its original text
+        good = positions['good']
+        rows = np.array(index.boxes(good))
+        rows['cls'][0] = 1
+        index.write_label(good, rows, changed=np.array([True, False]))
+        with open(index.label_path(good)) as f:
+            assert f.read() == "1 0.500000 0.500000 0.100000 0.100000\n1 0.123456789 0.25 0.2 0.2\n"
+    finally:
+        shutil.rmtree(label_dir)
+    print("[OK] label index self-check passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the label index cache of one or more splits")
+    parser.add_argument('label_dirs', nargs='*', help="label directories, e.g. train/labels valid/labels")
+    parser.add_argument('--no-cache', action='store_true', help="rebuild without reading or writing the cache")
+    parser.add_argument('--self-check', action='store_true', help="check parsing of malformed label files")
+    args = parser.parse_args()
+
+    if args.self_check:
+        self_check()
+
+    for label_dir in args.label_dirs:
+        image_dir = os.path.join(os.path.dirname(os.path.normpath(label_dir)), 'images')
+        index = load_label_index(label_dir, image_dir if os.path.isdir(image_dir) else None,
+                                 use_cache=not args.no_cache)
+        print("{}: {} files, {} boxes, {} missing, {} empty, {} unparsable lines, {} invalid boxes".format(
+            label_dir, len(index), len(index.labels), int(index.missing.sum()), int(index.empty().sum()),
+            len(index.bad_lines), int(index.invalid_rows().sum())))
+
+
+if __name__ == '__main__':
+    main()
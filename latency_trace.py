@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+逐帧延迟打点
+
+每个阶段(截屏、颜色转换、预处理、推理、后处理、目标选择、鼠标执行)记录一个
+时间段, 耗时写入固定大小的滚动缓冲区, 随时可以计算p50/p95/p99;
+可选保留最近的时间段, 导出为Chrome trace / Perfetto可以打开的JSON文件
+(chrome://tracing 或 https://ui.perfetto.dev)。
+
+缓冲区只由写入线程追加(先写数据再推进计数), 读取方只读计数之前的数据,
+不需要加锁。时间统一使用time.time(), 跨进程的时间戳可以直接比较。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 追踪循环的标准阶段, 按处理顺序
+STAGES = ('grab', 'queue', 'convert', 'preprocess', 'inference', 'postprocess', 'select', 'actuate',
+          'capture_to_action')
+
+
+class RollingHistogram(object):
+    """
+    固定容量的耗时滚动缓冲区(毫秒)
+    参数:
+        size: 保留最近多少个样本
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.count = 0
+        self._values = np.zeros(size, dtype=np.float64)
+
+    def record(self, value):
+        self._values[self.count % self.size] = value
+        self.count += 1
+
+    def values(self):
+        """返回当前窗口内样本的副本"""
+        count = self.count
+        return self._values[:min(count, self.size)].copy()
+
+    def summary(self, percentiles=(50, 95, 99)):
+        values = self.values()
+        if len(values) == 0:
+            return {'count': 0}
+        info = {'count': self.count, 'mean': float(values.mean()), 'max': float(values.max())}
+        for p, v in zip(percentiles, np.percentile(values, percentiles)):
+            info['p{}'.format(p)] = float(v)
+        return info
+
+
+class _Span(object):
+    """span()返回的上下文管理器"""
+
+    def __init__(self, recorder, name, frame):
+        self.recorder = recorder
+        self.name = name
+        self.frame = frame
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.record(self.name, self.start, time.time(), self.frame)
+        return False
+
+
+class SpanRecorder(object):
+    """
+    各阶段耗时的记录器
+    参数:
+        size: 每个阶段滚动缓冲区的容量
+        trace_events: 保留最近多少个时间段用于导出trace, 0表示不保留
+    """
+
+    def __init__(self, size=1024, trace_events=0):
+        self.size = size
+        self.histograms = {}
+        self._events = deque(maxlen=trace_events) if trace_events else None
+        self._pid = os.getpid()
+
+    def span(self, name, frame=None):
+        """
+        用法:
+            with spans.span('inference', frame=seq):
+                ...
+        """
+        return _Span(self, name, frame)
+
+    def record(self, name, start, end, frame=None):
+        """记录一个时间段, start/end为time.time()时间戳"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, RollingHistogram(self.size))
+        histogram.record((end - start) * 1000.0)
+        if self._events is not None:
+            self._events.append((name, start, end, threading.current_thread().name, frame))
+
+    def summary(self):
+        """返回 {阶段: {'count', 'mean', 'max', 'p50', 'p95', 'p99'}}, 按标准阶段顺序"""
+        names = [n for n in STAGES if n in self.histograms]
+        names += sorted(n for n in list(self.histograms) if n not in STAGES)
+        return dict((name, self.histograms[name].summary()) for name in names)
+
+    def format_summary(self, names=None):
+        """格式化为一行 '阶段 p50/p95/p99' 文本"""
+        parts = []
+        for name, info in self.summary().items():
+            if names is not None and name not in names or not info['count']:
+                continue
+            parts.append("{} {:.1f}/{:.1f}/{:.1f}".format(name, info['p50'], info['p95'], info['p99']))
+        return ", ".join(parts)
+
+    def chrome_trace(self):
+        """返回Chrome trace格式的字典"""
+        if self._events is None:
+            return {'traceEvents': []}
+        events = []
+        threads = {}
+        for name, start, end, thread, frame in list(self._events):
+            tid = threads.setdefault(thread, len(threads) + 1)
+            event = {'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6,
+                     'pid': self._pid, 'tid': tid}
+            if frame is not None:
+                event['args'] = {'frame': frame}
+            events.append(event)
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+                           'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        """把保留的时间段写入JSON文件"""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
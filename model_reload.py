@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+模型权重热更新
+
+HotSwapEngine 包装一个推理后端并监视权重文件; 文件变化且写入稳定后,
+在后台线程中加载新模型、用生产输入尺寸预热、并在最近的真实输入上做一次
+快速检查, 通过后在两帧之间原子地替换引擎引用, 推理线程不等待、不丢帧。
+检查只在后台线程运行新模型, 与推理线程记录下的当前模型输出对比, 不会在
+两个线程中同时调用当前引擎。
+加载、预热或检查失败时保留旧模型; 替换后新模型的前若干次推理出错时
+自动回滚到旧模型并用旧模型重做该次推理。
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def file_signature(path):
+    """(mtime, size), 文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+class HotSwapEngine(object):
+    """
+    可热更新的推理后端, 接口与 inference_backends.py 中的后端相同
+    参数:
+        loader: loader(path) 返回新的推理后端
+        model_path: 监视的权重文件
+        engine: 当前已加载的后端, 为None时立即用loader加载
+        poll_interval: 检查文件变化的间隔(秒)
+        settle: 文件停止变化多久后才加载(秒), 避免读到训练中途写了一半的文件
+        imgsz: 预热使用的输入边长
+        grace_calls: 替换后的前多少次推理出错时回滚
+        min_agreement: 检查时当前模型检测到目标的参考帧中, 新模型至少也要检测到目标的比例
+    """
+
+    def __init__(self, loader, model_path, engine=None, poll_interval=2.0, settle=1.0, imgsz=640,
+                 grace_calls=100, min_agreement=0.5):
+        self.loader = loader
+        self.watch_path = model_path
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.imgsz = imgsz
+        self.grace_calls = grace_calls
+        self.min_agreement = min_agreement
+        self.stats = {'reloads': 0, 'rejected': 0, 'rollbacks': 0, 'last_error': None, 'last_reload': None}
+        self._engine = engine if engine is not None else loader(model_path)
+        self._previous = None
+        self._calls_since_swap = 0
+        self._signature = file_signature(model_path)
+        self._rejected_signature = None
+        self._references = []
+        self._last_reference = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- 推理接口, 委托给当前引擎 ----
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def names(self):
+        return self._engine.names
+
+    @property
+    def name(self):
+        return self._engine.name
+
+    @property
+    def model_path(self):
+        return self._engine.model_path
+
+    @property
+    def dynamic_imgsz(self):
+        return self._engine.dynamic_imgsz
+
+    def infer(self, img, conf=0.25, iou=0.45, imgsz=None):
+        return self.infer_batch([img], conf, iou, imgsz)[0]
+
+    def infer_batch(self, imgs, conf=0.25, iou=0.45, imgsz=None):
+        engine = self._engine  # 取一次引用, 本次调用不受并发替换影响
+        try:
+            results = engine.infer_batch(imgs, conf=conf, iou=iou, imgsz=imgsz)
+        except Exception as e:
+            previous = self._rollback(engine, e)
+            if previous is None:
+                raise
+            return previous.infer_batch(imgs, conf=conf, iou=iou, imgsz=imgsz)
+        self._keep_reference(imgs[0], results[0], conf, iou, imgsz)
+        if self._previous is not None:
+            self._calls_since_swap += 1
+            if self._calls_since_swap >= self.grace_calls:
+                self._previous = None  # 新模型已稳定, 释放旧模型
+        return results
+
+    def _keep_reference(self, img, result, conf, iou, imgsz):
+        """每秒保存一张最近的真实输入及当前模型在其上是否检测到目标, 用于检查新模型"""
+        now = time.time()
+        if now - self._last_reference < 1.0:
+            return
+        self._last_reference = now
+        reference = (np.array(img, copy=True), len(result[0]) > 0, conf, iou, imgsz)
+        with self._lock:
+            self._references.append(reference)
+            del self._references[:-4]
+
+    def _rollback(self, failed, error):
+        with self._lock:
+            previous = self._previous
+            if previous is None or self._engine is not failed:
+                return None
+            self._engine = previous
+            self._previous = None
+            self.stats['rollbacks'] += 1
+            self.stats['last_error'] = str(error)
+        print("新模型推理出错, 已回滚到旧模型: {}".format(error))
+        return previous
+
+    # ---- 加载与检查 ----
+
+    def _check(self, candidate):
+        """
+        预热并与推理线程记录的当前模型输出对比, 不通过时抛出异常
+        只调用新模型; 当前模型同时只由推理线程使用
+        """
+        current = self._engine
+        if dict(candidate.names) != dict(current.names):
+            raise ValueError("类别与当前模型不一致: {} -> {}".format(current.names, candidate.names))
+        candidate.infer_batch([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])  # 生产尺寸预热
+        with self._lock:
+            references = list(self._references)
+        if not references:
+            return
+        new = [candidate.infer_batch([img], conf=conf, iou=iou, imgsz=imgsz)[0]
+               for img, _, conf, iou, imgsz in references]
+        for xyxy, confs, _ in new:
+            if not (np.isfinite(xyxy).all() and np.isfinite(confs).all()):
+                raise ValueError("新模型输出包含NaN/Inf")
+        expected = [detected for _, detected, _, _, _ in references]
+        if any(expected):
+            agreed = sum(1 for e, n in zip(expected, new) if e and len(n[0]) > 0)
+            if agreed < self.min_agreement * sum(expected):
+                raise ValueError("新模型在 {} 张参考帧中只检测到 {} 张有目标".format(sum(expected), agreed))
+
+    def reload(self):
+        """立即加载并检查新权重, 成功后替换; 返回是否替换"""
+        start = time.time()
+        try:
+            candidate = self.loader(self.watch_path)
+            self._check(candidate)
+        except Exception as e:
+            self.stats['rejected'] += 1
+            self.stats['last_error'] = str(e)
+            print("新模型未通过检查, 继续使用旧模型: {}".format(e))
+            return False
+        with self._lock:
+            self._previous = self._engine
+            self._calls_since_swap = 0
+            self._engine = candidate
+            self.stats['reloads'] += 1
+            self.stats['last_reload'] = time.time()
+        print("模型已热更新: {} (加载+预热+检查 {:.1f} 秒)".format(candidate.model_path, time.time() - start))
+        return True
+
+    def _watch_loop(self):
+        pending, changed_at = None, None
+        while not self._stop.wait(self.poll_interval):
+            signature = file_signature(self.watch_path)
+            if signature is None or signature == self._signature or signature == self._rejected_signature:
+                pending = None
+                continue
+            if signature != pending:
+                # 文件仍在变化, 等写入稳定
+                pending, changed_at = signature, time.time()
+                continue
+            if time.time() - changed_at < self.settle:
+                continue
+            print("检测到新权重: {}".format(self.watch_path))
+            if self.reload():
+                self._signature = signature
+            else:
+                self._rejected_signature = signature
+            pending = None
+
+    def start(self):
+        """启动后台监视线程"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch_loop, name='model-watch')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+非阻塞的鼠标执行器
+
+执行器运行在自己的线程中, 以固定频率(默认240Hz)把光标向最新的目标点插值移动;
+推理或执行阶段只需调用 set_target() 更新目标点, 不会被鼠标移动阻塞。
+光标速度为目标速度(前馈)加上按 move_duration 时间常数逼近目标的速度, 并受最大速度和最大加速度限制,
+靠近目标时按加速度上限提前减速, 避免越过目标。
+
+后端:
+    PyAutoGuiBackend  通过pyautogui移动真实光标(关闭pyautogui每次调用后的暂停)
+    FakeBackend       不移动光标, 记录输出的光标轨迹, 用于无界面测试
+"""
+import math
+import threading
+import time
+
+
+class PyAutoGuiBackend(object):
+    """pyautogui光标后端"""
+    name = 'pyautogui'
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def position(self):
+        x, y = self._pyautogui.position()
+        return float(x), float(y)
+
+    def move_to(self, x, y):
+        # _pause=False: 跳过pyautogui.PAUSE(默认0.1秒)的调用后暂停
+        self._pyautogui.moveTo(x, y, _pause=False)
+
+
+class FakeBackend(object):
+    """
+    记录轨迹的假后端
+    参数:
+        start: 初始光标位置
+    """
+    name = 'fake'
+
+    def __init__(self, start=(0, 0)):
+        self._position = (float(start[0]), float(start[1]))
+        self.trajectory = []  # [(time, x, y)]
+        self._lock = threading.Lock()
+
+    def position(self):
+        with self._lock:
+            return self._position
+
+    def move_to(self, x, y):
+        with self._lock:
+            self._position = (float(x), float(y))
+            self.trajectory.append((time.time(), x, y))
+
+
+class MouseActuator(object):
+    """
+    固定频率的光标插值执行器
+    参数:
+        backend: 光标后端
+        rate: 控制频率(Hz)
+        move_duration: 逼近目标的时间常数(秒), 期望速度 = 距离 / move_duration
+        max_speed: 最大速度(像素/秒)
+        max_accel: 最大加速度(像素/秒^2)
+        max_extrapolation: 目标点按速度外推的最长时间(秒), 超过后停在外推终点
+        spans: SpanRecorder, 可选; 记录'capture_to_action'(截屏到该目标第一次移动光标)和'actuate'
+    """
+
+    def __init__(self, backend, rate=240.0, move_duration=0.1, max_speed=8000.0, max_accel=60000.0,
+                 max_extrapolation=0.2, spans=None):
+        self.backend = backend
+        self.rate = rate
+        self.move_duration = max(move_duration, 1.0 / rate)
+        self.max_speed = max_speed
+        self.max_accel = max_accel
+        self.max_extrapolation = max_extrapolation
+        self.spans = spans
+        self.stats = {'ticks': 0, 'moves': 0, 'late_ticks': 0, 'setpoints': 0, 'achieved_rate': 0.0}
+        self._lock = threading.Lock()
+        self._setpoint = None   # (x, y, vx, vy, t, capture_time, frame)
+        self._pending = None    # 尚未产生移动的目标点 (capture_time, frame)
+        self._position = None
+        self._velocity = (0.0, 0.0)
+        self._last_emit = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def set_target(self, x, y, velocity=(0.0, 0.0), capture_time=None, frame=None, now=None):
+        """
+        更新目标点(全局桌面坐标), 立即返回
+        参数:
+            velocity: 目标速度(像素/秒), 执行器按该速度外推目标点
+            capture_time: 目标所在帧的截屏时间, 用于统计截屏到执行的延迟
+            now: 目标点对应的时刻, 默认当前时间; 离线回放时传入模拟时间并手动调用step()
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._setpoint = (float(x), float(y), float(velocity[0]), float(velocity[1]), now, capture_time, frame)
+            self._pending = (capture_time, frame)
+            self.stats['setpoints'] += 1
+
+    def clear(self):
+        """放弃当前目标, 光标停在原地"""
+        with self._lock:
+            self._setpoint = None
+            self._pending = None
+            self._position = None
+            self._velocity = (0.0, 0.0)
+
+    def step(self, now, dt):
+        """推进一个控制周期, 返回本周期输出的光标位置(没有移动时为None)"""
+        with self._lock:
+            setpoint = self._setpoint
+        if setpoint is None:
+            return None
+
+        if self._position is None:
+            # 开始追踪时从真实光标位置出发, 不与用户的手动移动冲突
+            self._position = self.backend.position()
+            self._velocity = (0.0, 0.0)
+            self._last_emit = None
+
+        x, y, vx, vy, t, _, frame = setpoint
+        ahead = min(max(now - t, 0.0), self.max_extrapolation)
+        tx, ty = x + vx * ahead, y + vy * ahead
+        px, py = self._position
+        dx, dy = tx - px, ty - py
+        dist = math.hypot(dx, dy)
+
+        # 期望速度: 目标自身速度(前馈) + 按时间常数逼近的速度, 后者受"能及时刹住"的速度限制
+        speed = min(dist / self.move_duration, math.sqrt(2.0 * self.max_accel * dist))
+        want = (dx / dist * speed, dy / dist * speed) if dist > 0 else (0.0, 0.0)
+        if now - t < self.max_extrapolation:
+            want = (want[0] + vx, want[1] + vy)
+        norm = math.hypot(want[0], want[1])
+        if norm > self.max_speed:
+            want = (want[0] * self.max_speed / norm, want[1] * self.max_speed / norm)
+        cvx, cvy = self._velocity
+        ax, ay = (want[0] - cvx) / dt, (want[1] - cvy) / dt
+        accel = math.hypot(ax, ay)
+        if accel > self.max_accel:
+            ax, ay = ax * self.max_accel / accel, ay * self.max_accel / accel
+        cvx, cvy = cvx + ax * dt, cvy + ay * dt
+        px, py = px + cvx * dt, py + cvy * dt
+        self._velocity = (cvx, cvy)
+        self._position = (px, py)
+
+        point = (int(round(px)), int(round(py)))
+        if point == self._last_emit:
+            return None
+        start = time.time()
+        self.backend.move_to(point[0], point[1])
+        self._last_emit = point
+        self.stats['moves'] += 1
+        if self.spans is not None:
+            self.spans.record('actuate', start, time.time(), frame)
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if pending is not None and pending[0] is not None:
+                # 该目标点第一次移动光标
+                self.spans.record('capture_to_action', pending[0], start, pending[1])
+        return point
+
+    def _loop(self):
+        period = 1.0 / self.rate
+        deadline = time.time()
+        last = deadline
+        window_start, window_ticks = deadline, 0
+        while not self._stop.is_set():
+            now = time.time()
+            try:
+                self.step(now, max(now - last, 1e-4))
+            except Exception as e:
+                print("移动鼠标时出错: {}".format(str(e)))
+                self.clear()
+                time.sleep(1)  # 出错时暂停1秒
+            last = now
+            self.stats['ticks'] += 1
+            window_ticks += 1
+            if now - window_start >= 1.0:
+                self.stats['achieved_rate'] = window_ticks / (now - window_start)
+                window_start, window_ticks = now, 0
+
+            deadline += period
+            delay = deadline - time.time()
+            if delay < -period:
+                # 落后超过一个周期, 重新对齐, 不补发错过的周期
+                self.stats['late_ticks'] += 1
+                deadline = time.time()
+            elif delay > 0:
+                self._stop.wait(delay)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='actuator')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+追踪流水线基础组件
+
+采集 -> 推理 -> 执行 三个阶段各自运行在独立线程中, 阶段之间用
+LatestQueue 连接: 队列有界, 满时丢弃最旧的元素, 下游永远处理最新的帧。
+"""
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue(object):
+    """
+    有界的"最新帧优先"队列
+    参数:
+        maxsize: 队列容量, 超出时丢弃最旧的元素
+    """
+
+    def __init__(self, maxsize=1):
+        self.maxsize = max(1, int(maxsize))
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """放入元素, 队列已满时丢弃最旧的元素"""
+        with self._cond:
+            while len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出最旧的元素, 超时返回None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                return None
+            return self._items.popleft()
+
+    def get_latest(self, timeout=None):
+        """取出最新的元素并丢弃其余积压元素, 超时返回None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats(object):
+    """
+    单个流水线阶段的吞吐统计
+    参数:
+        name: 阶段名称
+        queue: 该阶段的输入队列 (可选), 用于报告队列深度和丢帧数
+        window: 吞吐量统计窗口(秒)
+    """
+
+    def __init__(self, name, queue=None, window=1.0):
+        self.name = name
+        self.queue = queue
+        self.window = window
+        self.total = 0
+        self.fps = 0.0
+        self._count = 0
+        self._start = time.time()
+        self._lock = threading.Lock()
+
+    def tick(self, n=1):
+        """记录处理完成的元素数, 窗口结束时返回True"""
+        with self._lock:
+            self.total += n
+            self._count += n
+            now = time.time()
+            elapsed = now - self._start
+            if elapsed >= self.window:
+                self.fps = self._count / elapsed
+                self._count = 0
+                self._start = now
+                return True
+            return False
+
+    def snapshot(self):
+        """返回当前统计信息的字典"""
+        with self._lock:
+            info = {'fps': self.fps, 'total': self.total}
+        if self.queue is not None:
+            info['queue_depth'] = self.queue.qsize()
+            info['dropped'] = self.queue.dropped
+        return info
+
+
+def format_stage_stats(stages):
+    """把各阶段统计格式化为一行文本"""
+    parts = []
+    for name, info in stages.items():
+        text = "{}: {:.1f}/s".format(name, info['fps'])
+        if 'queue_depth' in info:
+            text += " (队列 {}, 丢弃 {})".format(info['queue_depth'], info['dropped'])
+        parts.append(text)
+    return " | ".join(parts)
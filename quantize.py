@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+INT8训练后量化
+
+流程:
+    1. 把训练好的 best.pt 导出为FP32 ONNX
+    2. 按data.yaml从train/valid图像中抽取代表性样本做静态量化校准
+    3. 用val.py的评估流程比较量化前后两个ONNX模型的mAP和各类别AP
+    4. 在相同的帧上测量量化前后的CPU延迟
+    5. 目标类别AP下降超过容差时以非零状态退出
+
+用法:
+    python quantize.py --model runs/train/weights/best.pt --data data.yaml --tolerance 0.02
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+import numpy as np
+import yaml
+
+from box_select import resolve_class_id
+from inference_backends import OnnxEngine, TorchEngine, benchmark_engines, letterbox, load_frames, resolve_model_path
+from val import class_ap50, validate_model
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+
+
+def split_image_dirs(data_yaml, splits=('train', 'val')):
+    """按data.yaml解析各分割集的图像目录(相对路径相对于data.yaml所在目录)"""
+    with open(data_yaml, 'r') as f:
+        config = yaml.safe_load(f)
+    base = config.get('path') or os.path.dirname(os.path.abspath(data_yaml))
+    dirs = []
+    for split in splits:
+        if split not in config:
+            continue
+        path = config[split]
+        if not os.path.isabs(path):
+            path = os.path.normpath(os.path.join(base, path))
+        dirs.append(path)
+    return dirs, config
+
+
+def sample_calibration_images(image_dirs, count=200, seed=0):
+    """从各目录中均匀随机抽取校准图像"""
+    paths = []
+    for image_dir in image_dirs:
+        if not os.path.isdir(image_dir):
+            print("[WARNING] 图像目录不存在: {}".format(image_dir))
+            continue
+        paths.extend(sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir)
+                            if f.lower().endswith(IMAGE_EXTS)))
+    random.Random(seed).shuffle(paths)
+    return paths[:count]
+
+
+def make_calibration_reader(image_paths, input_name, imgsz=640):
+    """创建onnxruntime静态量化使用的校准数据读取器, 预处理与OnnxEngine一致"""
+    import cv2
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class TankCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self._paths:
+                img = cv2.imread(path)
+                if img is None:
+                    continue
+                canvas, _ = letterbox(img, imgsz)
+                blob = canvas.transpose(2, 0, 1)[::-1][None].astype(np.float32) / 255.0
+                return {input_name: np.ascontiguousarray(blob)}
+            return None
+
+    return TankCalibrationReader()
+
+
+def quantize_onnx(fp32_path, int8_path, calibration_paths, imgsz=640, per_channel=True):
+    """用QDQ格式做静态INT8量化, 激活uint8、权重int8"""
+    try:
+        import onnxruntime as ort
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    except ImportError:
+        raise ImportError("量化需要安装onnxruntime: pip install onnxruntime")
+
+    input_name = ort.InferenceSession(fp32_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = make_calibration_reader(calibration_paths, input_name, imgsz)
+    quantize_static(
+        fp32_path, int8_path, reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    return int8_path
+
+
+def quantize_model(model_path, data_yaml='data.yaml', output=None, calib_count=200, imgsz=640,
+                   split='val', target_class='tank', tolerance=0.02, bench_frames=50, seed=0):
+    """
+    量化并评估模型
+    返回:
+        报告字典, 其中 'passed' 表示目标类别AP下降在容差以内
+    """
+    image_dirs, config = split_image_dirs(data_yaml)
+    names = config['names']
+    names = dict(enumerate(names)) if isinstance(names, list) else names
+    # 先确定目标类别, 否则两边AP都按0计算, 精度检查会误报通过
+    class_id = resolve_class_id(names, target_class)
+    if class_id is None:
+        raise ValueError("数据集中没有与 '{}' 匹配的类别: {}".format(target_class, list(names.values())))
+    target_class = names[class_id]
+
+    calibration = sample_calibration_images(image_dirs, calib_count, seed)
+    if not calibration:
+        raise ValueError("没有找到校准图像, 请检查 {}".format(data_yaml))
+    print("校准图像: {} 张 (来自 {})".format(len(calibration), ", ".join(image_dirs)))
+
+    fp32_path = resolve_model_path(model_path, 'onnx', imgsz)
+    int8_path = output or os.path.splitext(fp32_path)[0] + '_int8.onnx'
+    print("正在量化: {} -> {}".format(fp32_path, int8_path))
+    quantize_onnx(fp32_path, int8_path, calibration, imgsz)
+
+    # 精度: 基线为被量化的FP32 ONNX, 下降只反映量化本身; 两者使用同一套val.py评估
+    print("\n=== FP32 基线评估 ===")
+    fp32_results = validate_model(fp32_path, data=data_yaml, split=split, imgsz=imgsz, batch=1,
+                                  name='quant_fp32', plots=False)
+    print("\n=== INT8 评估 ===")
+    int8_results = validate_model(int8_path, data=data_yaml, split=split, imgsz=imgsz, batch=1,
+                                  name='quant_int8', plots=False)
+    fp32_ap = class_ap50(fp32_results, names)
+    int8_ap = class_ap50(int8_results, names)
+
+    # 延迟: 在相同的帧上比较
+    frames = []
+    for image_dir in image_dirs:
+        frames.extend(load_frames(image_dir, bench_frames - len(frames)))
+    engines = [TorchEngine(model_path, imgsz), OnnxEngine(fp32_path, imgsz), OnnxEngine(int8_path, imgsz)]
+    engines[1].name = 'onnx-fp32'
+    engines[2].name = 'onnx-int8'
+    latency = benchmark_engines(engines, frames, repeats=3)
+
+    ap_drop = fp32_ap.get(target_class, 0.0) - int8_ap.get(target_class, 0.0)
+    report = {
+        'model': model_path,
+        'fp32_onnx': fp32_path,
+        'int8_onnx': int8_path,
+        'calibration_images': len(calibration),
+        'split': split,
+        'fp32': {'map50': float(fp32_results.box.map50), 'map': float(fp32_results.box.map), 'ap50': fp32_ap},
+        'int8': {'map50': float(int8_results.box.map50), 'map': float(int8_results.box.map), 'ap50': int8_ap},
+        'latency': latency,
+        'speedup': latency['onnx-fp32']['mean_ms'] / latency['onnx-int8']['mean_ms'],
+        'target_class': target_class,
+        'ap50_drop': ap_drop,
+        'tolerance': tolerance,
+        'passed': ap_drop <= tolerance,
+    }
+    return report
+
+
+def print_report(report):
+    print("\n=== 量化报告 ===")
+    print("{:<10} {:>8} {:>12}".format('', 'mAP@0.5', 'mAP@0.5:0.95'))
+    for key in ('fp32', 'int8'):
+        print("{:<10} {:>8.3f} {:>12.3f}".format(key.upper(), report[key]['map50'], report[key]['map']))
+    print("\n各类别AP@0.5 (FP32 -> INT8):")
+    for name, ap in report['fp32']['ap50'].items():
+        print("  {}: {:.3f} -> {:.3f}".format(name, ap, report['int8']['ap50'].get(name, 0.0)))
+    print("\nCPU延迟:")
+    for name, r in report['latency'].items():
+        print("  {:<10} {:>8.2f} ms (p95 {:.2f} ms)".format(name, r['mean_ms'], r['p95_ms']))
+    print("  INT8加速比: {:.2f}x".format(report['speedup']))
+    status = "通过" if report['passed'] else "失败"
+    print("\n{} AP@0.5 下降 {:.3f} (容差 {:.3f}): {}".format(
+        report['target_class'], report['ap50_drop'], report['tolerance'], status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8训练后量化并与FP32对比精度和延迟")
+    parser.add_argument('--model', default='runs/train/weights/best.pt', help="训练好的 .pt 权重")
+    parser.add_argument('--data', default='data.yaml')
+    parser.add_argument('--output', default=None, help="INT8模型输出路径")
+    parser.add_argument('--calib-count', type=int, default=200, help="校准图像数量")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--split', default='val', help="评估使用的分割集")
+    parser.add_argument('--target-class', default='tank')
+    parser.add_argument('--tolerance', type=float, default=0.02, help="目标类别AP@0.5允许的最大下降")
+    parser.add_argument('--report', default=None, help="把报告写入JSON文件")
+    args = parser.parse_args()
+
+    report = quantize_model(args.model, args.data, args.output, args.calib_count, args.imgsz,
+                            args.split, args.target_class, args.tolerance)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print("报告已保存: {}".format(args.report))
+    sys.exit(0 if report['passed'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+离线回放: 在录制的帧序列上无界面运行完整的追踪流水线
+
+帧来源可以是图像目录(如 valid/images, 自带YOLO标签)、视频文件或合成画面。
+每一帧依次经过 检测 -> 目标选择 -> 跟踪 -> 鼠标执行器(假后端, 按模拟时间推进),
+不做帧率等待, 以最快速度处理; 结束后报告吞吐量、各阶段延迟, 以及瞄准点和
+光标位置相对真值框的误差。不需要显示器, 可在CI中检测性能回归。
+
+用法:
+    python replay.py --model best.pt --source valid/images --target-class tank
+    python replay.py --model best.pt --source clip.mp4 --backend onnx --report replay.json
+    python replay.py --model best.pt --source synthetic --trace replay_trace.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from box_select import resolve_class_id
+from frame_processor import FrameProcessor
+from frame_sources import open_source
+from latency_trace import RollingHistogram, SpanRecorder
+from mouse_actuator import FakeBackend, MouseActuator
+from target_tracker import TargetTracker
+
+
+def _nearest_center_distance(point, labels):
+    centers = np.stack([(labels[:, 0] + labels[:, 2]) / 2.0, (labels[:, 1] + labels[:, 3]) / 2.0], axis=1)
+    return float(np.hypot(centers[:, 0] - point[0], centers[:, 1] - point[1]).min())
+
+
+def _inside_any(point, labels):
+    x, y = point
+    return bool(((labels[:, 0] <= x) & (x <= labels[:, 2]) & (labels[:, 1] <= y) & (y <= labels[:, 3])).any())
+
+
+def _summary(values):
+    if not values:
+        return None
+    values = np.array(values)
+    return {'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+
+
+def replay(engine, source, class_id, confidence=0.4, imgsz=640, select_policy='largest', use_tracker=True,
+           flow_mode=False, skip_static=True, dynamic_imgsz=False, actuation_rate=240.0, move_duration=0.1,
+           spans=None):
+    """
+    在帧来源上运行追踪流水线
+    返回:
+        报告字典: 吞吐量、延迟分位数、瞄准误差和光标误差
+    """
+    from flow_tracker import FlowPropagator
+    from imgsz_tune import DynamicImgsz
+
+    spans = spans or SpanRecorder()
+    tracker = TargetTracker() if use_tracker else None
+    flow = FlowPropagator() if flow_mode else None
+    sizer = DynamicImgsz(default=imgsz) if dynamic_imgsz and engine.dynamic_imgsz else None
+    first = source.regions[0]
+    crosshair = (first['left'] + first['width'] / 2.0, first['top'] + first['height'] / 2.0)
+    processor = FrameProcessor(engine, class_id, confidence, imgsz, select_policy, crosshair,
+                               tracker=tracker, flow=flow, sizer=sizer, skip_static=skip_static,
+                               region_count=len(source.regions), spans=spans)
+    # 光标从准星出发, 执行器按模拟时间推进
+    backend = FakeBackend(start=crosshair)
+    actuator = MouseActuator(backend, rate=actuation_rate, move_duration=move_duration)
+    tick = 1.0 / actuation_rate
+
+    frame_ms = RollingHistogram(size=100000)
+    counts = {'frames': 0, 'labeled': 0, 'targets': 0, 'aimed': 0, 'hits': 0, 'misses': 0, 'false_aims': 0}
+    aim_errors, cursor_errors = [], []
+    sim_time = None
+    wall_start = time.time()
+    seq = 0
+    while True:
+        grab_start = time.time()
+        frame = source.read()
+        if frame is None:
+            break
+        seq += 1
+        frame['seq'] = seq
+        start = time.time()
+        spans.record('grab', grab_start, start, seq)
+
+        # 光标按模拟时间推进到本帧时刻
+        if sim_time is not None:
+            while sim_time + tick <= frame['time']:
+                sim_time += tick
+                actuator.step(sim_time, tick)
+        sim_time = frame['time']
+
+        result = processor.process(frame)
+        aim = None
+        if result['box'] is not None:
+            x1, y1, x2, y2 = result['box']
+            aim = ((x1 + x2) / 2.0, (y1 + y2) / 2.0)
+            velocity = (0.0, 0.0)
+            if tracker is not None and result['track_id'] is not None:
+                predicted = tracker.predict_position(result['track_id'], frame['time'])
+                ahead = tracker.predict_position(result['track_id'], frame['time'] + 0.05)
+                if predicted is not None and ahead is not None:
+                    aim = predicted
+                    velocity = ((ahead[0] - aim[0]) / 0.05, (ahead[1] - aim[1]) / 0.05)
+            actuator.set_target(aim[0], aim[1], velocity, now=frame['time'])
+        end = time.time()
+        spans.record('frame', start, end, seq)
+        frame_ms.record((end - start) * 1000.0)
+
+        counts['frames'] += 1
+        counts['aimed'] += aim is not None
+        labels = frame['labels']
+        if labels is None:
+            continue
+        counts['labeled'] += 1
+        if len(labels) == 0:
+            counts['false_aims'] += aim is not None
+            continue
+        counts['targets'] += 1
+        if aim is None:
+            counts['misses'] += 1
+        else:
+            aim_errors.append(_nearest_center_distance(aim, labels))
+            counts['hits'] += _inside_any(aim, labels)
+        if actuator.stats['moves']:
+            cursor_errors.append(_nearest_center_distance(backend.position(), labels))
+
+    elapsed = time.time() - wall_start
+    return {
+        'frames': counts['frames'],
+        'seconds': elapsed,
+        'fps': counts['frames'] / elapsed if elapsed > 0 else 0.0,
+        'frame_ms': frame_ms.summary(),
+        'stages': spans.summary(),
+        'counts': counts,
+        'hit_rate': counts['hits'] / float(counts['targets']) if counts['targets'] else None,
+        'aim_error_px': _summary(aim_errors),
+        'cursor_error_px': _summary(cursor_errors),
+        'processor': dict((k, v) for k, v in processor.stats().items() if k != 'buffers'),
+    }
+
+
+def print_report(report):
+    print("\n=== 回放报告 ===")
+    print("帧数: {}, 耗时: {:.2f} 秒, 吞吐: {:.1f} FPS".format(report['frames'], report['seconds'], report['fps']))
+    print("\n{:<18} {:>8} {:>8} {:>8} {:>8}".format('阶段', 'p50(ms)', 'p95(ms)', 'p99(ms)', 'mean'))
+    for name, info in report['stages'].items():
+        if info['count']:
+            print("{:<18} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}".format(
+                name, info['p50'], info['p95'], info['p99'], info['mean']))
+    counts = report['counts']
+    print("\n有标签帧: {}, 含目标帧: {}, 瞄准帧: {}, 漏检: {}, 误瞄: {}".format(
+        counts['labeled'], counts['targets'], counts['aimed'], counts['misses'], counts['false_aims']))
+    if report['hit_rate'] is not None:
+        print("瞄准点落在真值框内的比例: {:.3f}".format(report['hit_rate']))
+    for key, title in (('aim_error_px', '瞄准误差'), ('cursor_error_px', '光标误差')):
+        if report[key] is not None:
+            print("{}(像素): mean {:.1f}, p50 {:.1f}, p95 {:.1f}, max {:.1f}".format(
+                title, report[key]['mean'], report[key]['p50'], report[key]['p95'], report[key]['max']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在录制的帧序列上无界面回放追踪流水线")
+    parser.add_argument('--model', default='best.pt')
+    parser.add_argument('--backend', default='torch', help="推理后端: torch / onnx / openvino")
+    parser.add_argument('--server', default=None, help="使用推理服务 host:port 代替本地模型")
+    parser.add_argument('--source', default='valid/images', help="图像目录、视频文件或 synthetic")
+    parser.add_argument('--target-class', default='tank')
+    parser.add_argument('--conf', type=float, default=0.4)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--policy', default='largest', help="目标选择策略")
+    parser.add_argument('--limit', type=int, default=None, help="最多回放的帧数")
+    parser.add_argument('--no-tracker', action='store_true')
+    parser.add_argument('--flow', action='store_true', help="启用光流传播")
+    parser.add_argument('--no-skip-static', action='store_true')
+    parser.add_argument('--dynamic-imgsz', action='store_true')
+    parser.add_argument('--report', default=None, help="把报告写入JSON文件")
+    parser.add_argument('--trace', default=None, help="导出Chrome trace JSON文件")
+    args = parser.parse_args()
+
+    if args.server:
+        from inference_server import RemoteEngine
+        engine = RemoteEngine(args.server)
+    else:
+        from inference_backends import load_engine
+        engine = load_engine(args.backend, args.model, args.imgsz)
+    class_id = resolve_class_id(engine.names, args.target_class)
+    if class_id is None:
+        print("[ERROR] 模型中没有类别: {}".format(args.target_class))
+        return
+
+    source = open_source(args.source, class_id=class_id, limit=args.limit)
+    spans = SpanRecorder(size=100000, trace_events=100000 if args.trace else 0)
+    try:
+        report = replay(engine, source, class_id, args.conf, args.imgsz, args.policy,
+                        use_tracker=not args.no_tracker, flow_mode=args.flow,
+                        skip_static=not args.no_skip_static, dynamic_imgsz=args.dynamic_imgsz, spans=spans)
+    finally:
+        source.close()
+    report.update(source=args.source, model=engine.model_path, backend=engine.name, imgsz=args.imgsz)
+
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print("报告已保存: {}".format(args.report))
+    if args.trace:
+        spans.export_chrome_trace(args.trace)
+        print("trace已保存: {}".format(args.trace))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+感兴趣区域(ROI)追踪
+
+锁定目标后只截取预测位置附近的区域送入模型, 每隔N帧或目标丢失时
+再做一次全屏扫描重新捕获目标。
+"""
+import threading
+import time
+
+
+def clamp_region(cx, cy, width, height, bounds):
+    """
+    以(cx, cy)为中心生成一个宽高为width x height的区域, 并限制在bounds内
+    参数:
+        cx, cy: 区域中心, 全局桌面坐标
+        width, height: 区域尺寸
+        bounds: 全屏区域字典 {'left', 'top', 'width', 'height'}
+    返回:
+        mss可直接使用的区域字典, 以及区域左上角的全局坐标(ox, oy)
+    """
+    width = int(min(max(width, 1), bounds['width']))
+    height = int(min(max(height, 1), bounds['height']))
+    ox = int(min(max(cx - bounds['left'] - width // 2, 0), bounds['width'] - width))
+    oy = int(min(max(cy - bounds['top'] - height // 2, 0), bounds['height'] - height))
+    region = {
+        'left': bounds['left'] + ox,
+        'top': bounds['top'] + oy,
+        'width': width,
+        'height': height
+    }
+    return region, (region['left'], region['top'])
+
+
+class RoiState(object):
+    """
+    ROI追踪状态, 由推理阶段更新、采集阶段读取
+    参数:
+        bounds: 全屏区域字典
+        rescan_interval: 每隔多少帧强制做一次全屏扫描
+        scale: ROI边长相对目标框边长的倍数
+        min_size: ROI最小边长(像素)
+        lost_frames: ROI内连续多少帧没有检测到目标视为丢失
+    """
+
+    def __init__(self, bounds, rescan_interval=30, scale=3.0, min_size=320, lost_frames=1):
+        self.bounds = bounds
+        self.rescan_interval = rescan_interval
+        self.scale = scale
+        self.min_size = min_size
+        self.lost_frames = lost_frames
+        self.stats = {'roi_frames': 0, 'full_frames': 0, 'roi_pixels': 0, 'full_pixels': 0}
+        self._lock = threading.Lock()
+        self._target = None
+        self._velocity = (0.0, 0.0)
+        self._misses = 0
+        self._since_scan = 0
+
+    def next_region(self, now=None):
+        """
+        返回下一帧要截取的区域
+        返回:
+            (region, offset, is_roi), offset为区域左上角的全局坐标
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            use_roi = (self._target is not None
+                       and self._misses < self.lost_frames
+                       and self._since_scan < self.rescan_interval)
+            if not use_roi:
+                self._since_scan = 0
+                self.stats['full_frames'] += 1
+                self.stats['full_pixels'] += self.bounds['width'] * self.bounds['height']
+                full = dict(self.bounds)
+                return full, (full['left'], full['top']), False
+
+            cx, cy, w, h, t = self._target
+            vx, vy = self._velocity
+            dt = now - t
+            px, py = cx + vx * dt, cy + vy * dt
+            size_w = max(self.min_size, w * self.scale)
+            size_h = max(self.min_size, h * self.scale)
+            region, offset = clamp_region(int(px), int(py), size_w, size_h, self.bounds)
+            self._since_scan += 1
+            self.stats['roi_frames'] += 1
+            self.stats['roi_pixels'] += region['width'] * region['height']
+            return region, offset, True
+
+    def update(self, box, timestamp):
+        """
+        用检测结果更新状态
+        参数:
+            box: 目标框 (x1, y1, x2, y2), 全局坐标; 没有检测到目标时为None
+            timestamp: 该帧的采集时间
+        """
+        with self._lock:
+            if box is None:
+                self._misses += 1
+                if self._misses >= self.lost_frames:
+                    self._velocity = (0.0, 0.0)
+                return
+
+            x1, y1, x2, y2 = box
+            cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+            if self._target is not None and self._misses == 0:
+                last_cx, last_cy, _, _, last_t = self._target
+                dt = timestamp - last_t
+                if dt > 0:
+                    self._velocity = ((cx - last_cx) / dt, (cy - last_cy) / dt)
+            self._target = (cx, cy, x2 - x1, y2 - y1, timestamp)
+            self._misses = 0
+
+    def reset(self):
+        """清除锁定的目标, 下一帧做全屏扫描"""
+        with self._lock:
+            self._target = None
+            self._velocity = (0.0, 0.0)
+            self._misses = 0
+
+    def pixel_ratio(self):
+        """ROI模式下平均每帧截取像素占全屏的比例"""
+        with self._lock:
+            frames = self.stats['roi_frames'] + self.stats['full_frames']
+            if frames == 0:
+                return 1.0
+            full = self.bounds['width'] * self.bounds['height']
+            return (self.stats['roi_pixels'] + self.stats['full_pixels']) / float(frames * full)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+采集进程与推理进程之间的共享内存帧环形缓冲区
+
+整块内存由 multiprocessing.shared_memory 分配, 划分为固定大小的槽位;
+每个槽位保存一帧(可包含多个区域的截图)及其序号和时间戳, 帧数据不经过pickle。
+写端(采集进程)轮流写入未被读端占用的槽位, 读端(推理进程)总是取最新的一帧,
+中间来不及处理的帧直接被覆盖。另有一块很小的反馈区, 推理进程把目标框写回
+采集进程, 用于ROI和帧率调度。
+
+同步方式为序号锁: 写槽位前把序号置0, 写完后再写入新序号; 读端在使用前后
+各检查一次序号, 序号变化说明数据被覆盖, 结果应丢弃。只支持一个写端和一个读端。
+"""
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+
+_MAGIC = 0x46524d52  # 'FRMR'
+_ALIGN = 64
+
+
+def _layout(slots, capacity, max_parts):
+    """计算各数组在共享内存中的偏移, 返回 ([(name, dtype, shape, offset)], 总字节数)"""
+    fields = [
+        ('header', np.int64, (4,)),                      # magic, slots, capacity, max_parts
+        ('control', np.int64, (4,)),                     # 最新序号, 最新槽位, 反馈序号, 保留
+        ('slot_seq', np.int64, (slots,)),                # 槽位序号, 0表示正在写入
+        ('slot_claim', np.int64, (slots,)),              # 读端正在使用该槽位时为1
+        ('slot_time', np.float64, (slots, 2)),           # 截屏开始时间, 写入完成时间
+        ('slot_parts', np.int32, (slots,)),              # 槽位中的区域数
+        ('parts', np.int32, (slots, max_parts, 6)),      # 每个区域: h, w, ox, oy, region, roi
+        ('feedback', np.float64, (max_parts + 1, 4)),    # 每个区域的目标框(NaN表示无), 最后一行: 时间, 是否有目标
+        ('pixels', np.uint8, (slots, capacity)),
+    ]
+    layout, offset = [], 0
+    for name, dtype, shape in fields:
+        offset = (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+        layout.append((name, dtype, shape, offset))
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+class FrameRing(object):
+    """
+    共享内存帧环形缓冲区
+    参数:
+        name: 共享内存名称; create=False时按名称连接到已有缓冲区
+        slots: 槽位数, 至少3个(读端占用一个时写端仍有空闲槽位轮换)
+        capacity: 每个槽位的像素字节数, 应不小于所有区域BGRA截图之和
+        max_parts: 每帧最多的区域数
+        create: 创建新缓冲区(写端或父进程), 否则连接已有缓冲区
+    """
+
+    def __init__(self, name=None, slots=4, capacity=0, max_parts=1, create=True):
+        if create:
+            if slots < 3:
+                raise ValueError("槽位数至少为3")
+            _, size = _layout(slots, capacity, max_parts)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            header = np.ndarray((4,), dtype=np.int64, buffer=self.shm.buf)
+            if header[0] != _MAGIC:
+                raise ValueError("共享内存 {} 不是帧缓冲区".format(name))
+            slots, capacity, max_parts = int(header[1]), int(header[2]), int(header[3])
+
+        self.name = self.shm.name
+        self.slots = slots
+        self.capacity = capacity
+        self.max_parts = max_parts
+        layout, _ = _layout(slots, capacity, max_parts)
+        for field, dtype, shape, offset in layout:
+            setattr(self, '_' + field, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+        if create:
+            self._header[:] = (_MAGIC, slots, capacity, max_parts)
+            self._control[:] = 0
+            self._slot_seq[:] = 0
+            self._slot_claim[:] = 0
+            self._feedback[:] = np.nan
+
+        # 读端计数; 写入帧数取自共享的最新序号, 见 snapshot()
+        self.stats = {'read': 0, 'skipped': 0, 'stale': 0}
+        self._next_slot = 0
+        self._seq = 0
+        self._last_read = 0
+        self._last_feedback = 0
+
+    # ---- 写端 ----
+
+    def write(self, parts, timestamp):
+        """
+        写入一帧
+        参数:
+            parts: [{'img': BGRA图像, 'offset': (ox, oy), 'region': 序号, 'roi': bool}]
+            timestamp: 截屏开始时间
+        返回:
+            该帧的序号
+        """
+        if len(parts) > self.max_parts:
+            raise ValueError("区域数 {} 超过上限 {}".format(len(parts), self.max_parts))
+        # 跳过读端正在使用的槽位
+        slot = self._next_slot
+        while self._slot_claim[slot]:
+            slot = (slot + 1) % self.slots
+        self._next_slot = (slot + 1) % self.slots
+
+        self._slot_seq[slot] = 0
+        pixels = self._pixels[slot]
+        pos = 0
+        for i, part in enumerate(parts):
+            img = part['img']
+            h, w = img.shape[:2]
+            size = h * w * 4
+            if pos + size > self.capacity:
+                raise ValueError("帧大小超过槽位容量 {}".format(self.capacity))
+            pixels[pos:pos + size].reshape(h, w, 4)[...] = img
+            self._parts[slot, i] = (h, w, part['offset'][0], part['offset'][1], part['region'], int(part['roi']))
+            pos += size
+        self._slot_parts[slot] = len(parts)
+        self._slot_time[slot] = (timestamp, time.time())
+
+        self._seq += 1
+        self._slot_seq[slot] = self._seq
+        self._control[1] = slot
+        self._control[0] = self._seq
+        return self._seq
+
+    def poll_feedback(self):
+        """读取推理端写回的最新目标框, 没有新反馈时返回None"""
+        seq = int(self._control[2])
+        if seq == self._last_feedback or seq % 2:
+            return None
+        feedback = self._feedback.copy()
+        if int(self._control[2]) != seq:
+            return None  # 复制期间推理端正在写入, 下次再读
+        self._last_feedback = seq
+        boxes = [None if np.isnan(row[0]) else tuple(float(v) for v in row) for row in feedback[:-1]]
+        return boxes, float(feedback[-1, 0]), bool(feedback[-1, 1])
+
+    # ---- 读端 ----
+
+    def read_latest(self, timeout=None, poll=0.0005):
+        """
+        取最新的一帧, 图像为共享内存上的零拷贝视图; 用完后必须调用release()
+        超时返回None
+        返回:
+            {'seq', 'time', 'publish_time', 'read_time', 'slot', 'skipped',
+             'parts': [{'img', 'offset', 'region', 'roi'}]}
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            seq = int(self._control[0])
+            if seq > self._last_read:
+                slot = int(self._control[1])
+                self._slot_claim[slot] = 1
+                if int(self._slot_seq[slot]) == seq:
+                    break
+                # 占用之前槽位已被覆盖, 重新读取最新序号
+                self._slot_claim[slot] = 0
+                continue
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(poll)
+
+        skipped = seq - self._last_read - 1 if self._last_read else 0
+        self._last_read = seq
+        self.stats['read'] += 1
+        self.stats['skipped'] += skipped
+
+        parts, pos = [], 0
+        pixels = self._pixels[slot]
+        for i in range(int(self._slot_parts[slot])):
+            h, w, ox, oy, region, roi = [int(v) for v in self._parts[slot, i]]
+            size = h * w * 4
+            parts.append({'img': pixels[pos:pos + size].reshape(h, w, 4), 'offset': (ox, oy),
+                          'region': region, 'roi': bool(roi)})
+            pos += size
+        capture_time, publish_time = self._slot_time[slot]
+        return {'seq': seq, 'time': float(capture_time), 'publish_time': float(publish_time),
+                'read_time': time.time(), 'slot': slot, 'skipped': skipped, 'parts': parts}
+
+    def release(self, frame):
+        """释放read_latest占用的槽位, 返回使用期间数据是否保持完整"""
+        slot = frame['slot']
+        valid = int(self._slot_seq[slot]) == frame['seq']
+        self._slot_claim[slot] = 0
+        if not valid:
+            self.stats['stale'] += 1
+        return valid
+
+    def post_feedback(self, boxes, timestamp, seen):
+        """
+        把每个区域的目标框写回采集端
+        参数:
+            boxes: 与区域一一对应的 (x1, y1, x2, y2) 或None
+            timestamp: 对应帧的截屏时间
+            seen: 本帧是否有目标
+        """
+        self._control[2] += 1  # 奇数表示正在写入
+        for i in range(self.max_parts):
+            box = boxes[i] if i < len(boxes) else None
+            self._feedback[i] = np.nan if box is None else box
+        self._feedback[-1, :2] = (timestamp, 1.0 if seen else 0.0)
+        self._control[2] += 1
+
+    def snapshot(self):
+        """统计计数: written为写端已写入的帧数(共享内存中的最新序号), 其余为本端计数"""
+        stats = dict(self.stats)
+        stats['written'] = int(self._control[0])
+        return stats
+
+    # ---- 生命周期 ----
+
+    def close(self):
+        # 先释放numpy视图, 否则SharedMemory.close会因仍有导出的缓冲区而失败
+        for field, _, _, _ in _layout(self.slots, self.capacity, self.max_parts)[0]:
+            setattr(self, '_' + field, None)
+        self.shm.close()
+
+    def unlink(self):
+        """删除共享内存, 由创建者在所有进程关闭后调用"""
+        self.shm.unlink()
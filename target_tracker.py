@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+目标跟踪: 匀速卡尔曼滤波 + 跨帧数据关联
+
+每个目标维护位置、速度和协方差, 检测框按IoU(其次按中心距离)关联到
+已有轨迹; 执行阶段按动作发生的时刻外推目标位置, 补偿推理延迟。
+"""
+import threading
+
+import numpy as np
+
+
+def iou_matrix(a, b):
+    """计算两组xyxy框之间的IoU矩阵, 形状 (len(a), len(b))"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class KalmanTrack(object):
+    """
+    单个目标的匀速卡尔曼滤波器, 状态为 [x, y, vx, vy]
+    参数:
+        track_id: 轨迹编号
+        box: 初始检测框 (x1, y1, x2, y2)
+        timestamp: 检测框对应的采集时间
+        process_noise: 加速度噪声强度(像素/秒^2)
+        measurement_noise: 检测中心的测量噪声(像素)
+    """
+
+    def __init__(self, track_id, box, timestamp, conf=0.0, process_noise=500.0, measurement_noise=4.0):
+        x1, y1, x2, y2 = box
+        self.track_id = track_id
+        self.state = np.array([(x1 + x2) / 2.0, (y1 + y2) / 2.0, 0.0, 0.0])
+        self.cov = np.diag([measurement_noise ** 2, measurement_noise ** 2, 1e4, 1e4])
+        self.size = np.array([x2 - x1, y2 - y1], dtype=np.float64)
+        self.timestamp = timestamp
+        self.conf = conf
+        self.hits = 1
+        self.misses = 0
+        self.q = process_noise
+        self.r = measurement_noise
+
+    def _transition(self, dt):
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        # 离散白噪声加速度模型
+        dt2, dt3, dt4 = dt * dt, dt ** 3 / 2.0, dt ** 4 / 4.0
+        Q = np.array([
+            [dt4, 0, dt3, 0],
+            [0, dt4, 0, dt3],
+            [dt3, 0, dt2, 0],
+            [0, dt3, 0, dt2],
+        ]) * self.q ** 2
+        return F, Q
+
+    def predict(self, timestamp):
+        """把滤波器状态推进到timestamp"""
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return
+        F, Q = self._transition(dt)
+        self.state = F.dot(self.state)
+        self.cov = F.dot(self.cov).dot(F.T) + Q
+        self.timestamp = timestamp
+
+    def update(self, box, conf=0.0):
+        """用检测框修正状态(调用前需先predict到检测时刻)"""
+        x1, y1, x2, y2 = box
+        z = np.array([(x1 + x2) / 2.0, (y1 + y2) / 2.0])
+        H = np.zeros((2, 4))
+        H[0, 0] = H[1, 1] = 1.0
+        R = np.eye(2) * self.r ** 2
+        y = z - H.dot(self.state)
+        S = H.dot(self.cov).dot(H.T) + R
+        K = self.cov.dot(H.T).dot(np.linalg.inv(S))
+        self.state = self.state + K.dot(y)
+        self.cov = (np.eye(4) - K.dot(H)).dot(self.cov)
+        self.size = 0.7 * self.size + 0.3 * np.array([x2 - x1, y2 - y1])
+        self.conf = conf
+        self.hits += 1
+        self.misses = 0
+
+    def position_at(self, timestamp):
+        """不修改状态, 外推timestamp时刻的目标中心"""
+        dt = max(0.0, timestamp - self.timestamp)
+        return (self.state[0] + self.state[2] * dt, self.state[1] + self.state[3] * dt)
+
+    def box(self):
+        """当前状态对应的xyxy框"""
+        cx, cy = self.state[:2]
+        w, h = self.size
+        return (cx - w / 2.0, cy - h / 2.0, cx + w / 2.0, cy + h / 2.0)
+
+    def velocity(self):
+        return (self.state[2], self.state[3])
+
+
+class TargetTracker(object):
+    """
+    多目标跟踪器, 线程安全: 推理阶段调用update, 执行阶段调用predict_position
+    参数:
+        iou_threshold: IoU关联阈值
+        max_distance: IoU不满足时按中心距离关联的最大距离(像素)
+        max_age: 轨迹连续多少次更新没有关联到检测就被删除
+        process_noise, measurement_noise: 卡尔曼滤波噪声参数
+    """
+
+    def __init__(self, iou_threshold=0.3, max_distance=80.0, max_age=10,
+                 process_noise=500.0, measurement_noise=4.0):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.tracks = {}
+        self.latency = 0.0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _associate(self, tracks, boxes):
+        """贪心关联, 返回 [(track_index, box_index)]"""
+        if not tracks or len(boxes) == 0:
+            return []
+        predicted = np.array([t.box() for t in tracks])
+        ious = iou_matrix(predicted, boxes)
+        centers = (boxes[:, :2] + boxes[:, 2:4]) / 2.0
+        track_centers = np.array([t.state[:2] for t in tracks])
+        dists = np.linalg.norm(track_centers[:, None, :] - centers[None, :, :], axis=2)
+
+        # IoU优先, 距离作为次级得分(转换到IoU之下的区间)
+        score = np.where(ious >= self.iou_threshold, 1.0 + ious,
+                         np.where(dists <= self.max_distance, 1.0 - dists / (self.max_distance + 1.0), 0.0))
+        matches = []
+        while True:
+            ti, bi = np.unravel_index(np.argmax(score), score.shape)
+            if score[ti, bi] <= 0:
+                break
+            matches.append((int(ti), int(bi)))
+            score[ti, :] = 0
+            score[:, bi] = 0
+        return matches
+
+    def update(self, boxes, timestamp, confs=None):
+        """
+        用一帧的检测结果更新所有轨迹
+        参数:
+            boxes: (N, 4) xyxy检测框
+            timestamp: 该帧的采集时间
+            confs: (N,) 置信度, 可选
+        返回:
+            与boxes一一对应的轨迹编号列表
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if confs is None:
+            confs = np.zeros(len(boxes))
+        with self._lock:
+            tracks = list(self.tracks.values())
+            for track in tracks:
+                track.predict(timestamp)
+
+            ids = [None] * len(boxes)
+            matched = set()
+            for ti, bi in self._associate(tracks, boxes):
+                tracks[ti].update(boxes[bi], float(confs[bi]))
+                ids[bi] = tracks[ti].track_id
+                matched.add(ti)
+
+            for ti, track in enumerate(tracks):
+                if ti not in matched:
+                    track.misses += 1
+                    if track.misses > self.max_age:
+                        del self.tracks[track.track_id]
+
+            for bi in range(len(boxes)):
+                if ids[bi] is None:
+                    track = KalmanTrack(self._next_id, boxes[bi], timestamp, float(confs[bi]),
+                                        self.process_noise, self.measurement_noise)
+                    self.tracks[track.track_id] = track
+                    ids[bi] = track.track_id
+                    self._next_id += 1
+            return ids
+
+    def predict_position(self, track_id, timestamp):
+        """外推轨迹在timestamp时刻的中心位置, 轨迹不存在时返回None"""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is None:
+                return None
+            return track.position_at(timestamp)
+
+    def observe_latency(self, latency, alpha=0.1):
+        """记录一次采集到执行的延迟, 用指数滑动平均估计"""
+        with self._lock:
+            if self.latency == 0.0:
+                self.latency = latency
+            else:
+                self.latency = (1 - alpha) * self.latency + alpha * latency
+
+    def snapshot(self):
+        """返回所有轨迹的状态摘要"""
+        with self._lock:
+            return dict((tid, {
+                'center': (float(t.state[0]), float(t.state[1])),
+                'velocity': (float(t.state[2]), float(t.state[3])),
+                'hits': t.hits,
+                'misses': t.misses,
+            }) for tid, t in self.tracks.items())
@@ -3,132 +3,127 @@ import torch
 import numpy as np
 import os
 import yaml
-import glob
-from PIL import Image
 
 def validate_and_fix_dataset(data_yaml_path):
     """验证并修复数据集问题"""
+    from dataset_validator import validate_dataset
+    from label_index import load_label_index
     print("=== 开始数据集验证 ===")
     
-    # 读取data.yaml
-    with open(data_yaml_path, 'r') as f:
-        data_config = yaml.safe_load(f)
-    
+    # 一次遍历所有分割集: 每个标签文件只解析一次, 图像尺寸从文件头读取, 多进程并行
+    # 结果按文件缓存在 train/validation.cache 等, 自上次运行以来未变化的文件不重新检查
+    report = validate_dataset(data_yaml_path)
+    data_config = report['config']
     print(f"数据集配置: {data_config}")
     
     # 检查关键字段
-    required_fields = ['nc', 'names', 'train', 'val']
-    for field in required_fields:
-        if field not in data_config:
+    for field, code, _ in report['config_errors']:
+        if code == 'missing_field':
             raise ValueError(f"data.yaml 缺少必要字段: {field}")
     
     nc = data_config['nc']
     print(f"类别数量: {nc}")
     print(f"类别名称: {data_config['names']}")
     
-    # 验证每个分割集
-    splits = ['train', 'val', 'test']
+    # 需要改写的标签问题; 其余问题只报告
+    fixable = ('bad_field_count', 'parse_error', 'negative_class', 'class_out_of_range')
     
-    for split in splits:
-        if split not in data_config:
+    for split in ['train', 'val', 'test']:
+        if split not in report['splits']:
             print(f"⚠️ 跳过 {split} 分割集")
             continue
+        section = report['splits'][split]
             
         print(f"\n--- 验证 {split} 分割集 ---")
         
-        # 获取图像和标签目录
-        images_path = data_config[split]
-        labels_path = images_path.replace('images', 'labels')
-        
-        if not os.path.exists(images_path):
-            raise ValueError(f"图像目录不存在: {images_path}")
-        if not os.path.exists(labels_path):
-            raise ValueError(f"标签目录不存在: {labels_path}")
-        
-        # 检查图像文件
-        image_files = glob.glob(os.path.join(images_path, "*.jpg")) + \
-                     glob.glob(os.path.join(images_path, "*.png")) + \
-                     glob.glob(os.path.join(images_path, "*.jpeg"))
+        for path in section.get('missing_dirs', []):
+            if split == 'test':
+                print(f"⚠️ 目录不存在: {path}")
+            else:
+                raise ValueError(f"目录不存在: {path}")
+        if 'missing_dirs' in section:
+            continue
         
-        print(f"找到 {len(image_files)} 张图像")
+        print(f"找到 {section['images']} 张图像, {section['boxes']} 个目标框")
         
-        if len(image_files) < 2:
-            raise ValueError(f"{split} 分割集需要至少2张图像，当前只有 {len(image_files)} 张")
+        if section['too_few_images']:
+            raise ValueError(f"{split} 分割集需要至少2张图像，当前只有 {section['images']} 张")
         
-        # 检查标签文件并修复类别索引
+        # 只修复有问题的标签文件; 标签从标签索引读取, 不重新解析文本
+        index = None
         fixed_count = 0
-        for image_file in image_files:
-            base_name = os.path.splitext(os.path.basename(image_file))[0]
-            label_file = os.path.join(labels_path, base_name + ".txt")
-            
-            if not os.path.exists(label_file):
-                print(f"⚠️ 图像缺少对应标签: {base_name}")
-                continue
-            
-            # 检查并修复标签文件
-            if fix_label_file(label_file, nc):
-                fixed_count += 1
+        for record in section['problem_files']:
+            codes = set(code for _, code, _ in record['issues'])
+            if 'label_missing' in codes:
+                print(f"⚠️ 图像缺少对应标签: {os.path.splitext(os.path.basename(record['image']))[0]}")
+            if 'image_unreadable' in codes or 'image_empty' in codes:
+                print(f"❌ 图像文件损坏: {record['image']}")
+            if codes & set(fixable):
+                if index is None:
+                    index = load_label_index(section['labels_dir'], section['images_dir'])
+                    positions = dict((stem, i) for i, stem in enumerate(index.stems))
+                    bad_lines = index.bad_lines_by_image()
+                stem = os.path.splitext(os.path.basename(record['label']))[0]
+                i = positions.get(stem)
+                # 验证器报告的问题必须与标签索引一致, 否则修复会漏掉文件
+                mismatch = check_index_record(record, index, i, bad_lines.get(i, []), nc)
+                if mismatch:
+                    raise RuntimeError(f"数据集验证结果与标签索引不一致 {record['label']}: {mismatch}")
+                if fix_label_file(index, i, nc):
+                    fixed_count += 1
         
         print(f"修复了 {fixed_count} 个标签文件")
         
-        # 验证图像可读性
-        valid_images = 0
-        for image_file in image_files[:5]:  # 抽样检查前5张
-            try:
-                with Image.open(image_file) as img:
-                    img.verify()
-                valid_images += 1
-            except Exception as e:
-                print(f"❌ 图像文件损坏: {image_file} - {e}")
-        
-        print(f"图像文件检查: {valid_images}/5 张有效")
+        unreadable = section['issue_counts']['image_unreadable'] + section['issue_counts']['image_empty']
+        print(f"图像文件检查: {section['images'] - unreadable}/{section['images']} 张有效")
     
-    print("✅ 数据集验证完成")
+    print(f"✅ 数据集验证完成 ({report['seconds']:.2f} 秒)")
     return True
 
-def fix_label_file(label_file, nc):
-    """修复单个标签文件中的类别索引"""
+def check_index_record(record, index, i, bad_lines, nc):
+    """比较验证器对一个标签文件的结果与标签索引, 返回不一致的描述, 一致时返回None"""
+    if i is None:
+        return "标签索引中没有该文件"
+    reported = sorted(code for _, code, _ in record['issues'] if code in ('bad_field_count', 'parse_error'))
+    indexed = sorted(code for _, _, _, code, _ in bad_lines)
+    if reported != indexed:
+        return f"无法解析的行 验证器={reported} 索引={indexed}"
+    if record['boxes'] != index.counts()[i]:
+        return f"目标框数量 验证器={record['boxes']} 索引={index.counts()[i]}"
+    reported = sum(1 for _, code, _ in record['issues'] if code in ('negative_class', 'class_out_of_range'))
+    classes = index.boxes(i)['cls']
+    indexed = int(((classes < 0) | (classes >= nc)).sum())
+    if reported != indexed:
+        return f"无效类别索引 验证器={reported} 索引={indexed}"
+    return None
+
+def fix_label_file(index, i, nc):
+    """修复标签索引中第i个标签文件的类别索引, 丢弃无法解析的行"""
+    label_file = index.label_path(i)
     try:
-        with open(label_file, 'r') as f:
-            lines = f.readlines()
-        
-        fixed_lines = []
         needs_fix = False
+        for _, line_number, text, code, message in index.bad_lines_by_image().get(i, []):
+            if code == 'bad_field_count':
+                print(f"⚠️ {label_file} 第{line_number}行格式错误: {text}")
+            else:
+                print(f"❌ {label_file} 第{line_number}行: 无法解析 - {message}")
+            needs_fix = True
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-                
-            parts = line.split()
-            if len(parts) != 5:
-                print(f"⚠️ {label_file} 第{i+1}行格式错误: {line}")
-                needs_fix = True
-                continue
-            
-            try:
-                class_id = int(parts[0])
-                # 检查类别索引是否有效
-                if class_id < 0 or class_id >= nc:
-                    print(f"❌ {label_file} 第{i+1}行: 无效类别索引 {class_id} (有效范围: 0-{nc-1})")
-                    # 修复：限制在有效范围内
-                    fixed_class_id = max(0, min(class_id, nc-1))
-                    parts[0] = str(fixed_class_id)
-                    fixed_line = " ".join(parts)
-                    fixed_lines.append(fixed_line + "\n")
-                    needs_fix = True
-                    print(f"  修复为: {fixed_class_id}")
-                else:
-                    fixed_lines.append(line + "\n")
-                    
-            except ValueError as e:
-                print(f"❌ {label_file} 第{i+1}行: 无法解析类别索引 - {e}")
-                needs_fix = True
+        rows = np.array(index.boxes(i))
+        line_numbers = index.line_numbers[index.offsets[i]:index.offsets[i + 1]]
+        # 检查类别索引是否有效
+        invalid = (rows['cls'] < 0) | (rows['cls'] >= nc)
+        for row, line_number in zip(rows[invalid], line_numbers[invalid]):
+            # 修复：限制在有效范围内
+            fixed_class_id = max(0, min(int(row['cls']), nc-1))
+            print(f"❌ {label_file} 第{line_number}行: 无效类别索引 {row['cls']} (有效范围: 0-{nc-1})")
+            print(f"  修复为: {fixed_class_id}")
+        rows['cls'] = np.clip(rows['cls'], 0, nc - 1)
+        needs_fix = needs_fix or bool(invalid.any())
         
         # 如果需要修复，写入修正后的文件
         if needs_fix:
-            with open(label_file, 'w') as f:
-                f.writelines(fixed_lines)
+            index.write_label(i, rows, changed=invalid)
             return True
         
         return False
@@ -1,35 +1,41 @@
 from ultralytics import YOLO
 import os
 
-def validate_model():
-    # 加载最佳模型
-    model_path = 'runs/train_simple/weights/best.pt'
+def class_ap50(results, names):
+    """按类别名返回AP@0.5"""
+    return {names[int(c)]: float(ap) for c, ap in zip(results.box.ap_class_index, results.box.ap50)}
+
+def validate_model(model_path='runs/train_simple/weights/best.pt', data='data.yaml', split='test',
+                   imgsz=640, batch=4, device='cpu', name='val', plots=True):
+    # 加载最佳模型 (.pt 或导出的 .onnx 等格式均可)
     model = YOLO(model_path)
     
     # 在测试集上评估
     results = model.val(
-        data='data.yaml',
-        split='test',  # 使用测试集
-        imgsz=640,
-        batch=4,
+        data=data,
+        split=split,  # 默认使用测试集
+        imgsz=imgsz,
+        batch=batch,
         conf=0.25,  # 置信度阈值
         iou=0.6,    # IOU阈值
-        device='cpu',
+        device=device,
         save_json=True,  # 保存JSON格式的结果
         save_conf=True,  # 保存置信度分数
-        plots=True,      # 生成评估图表
-        name='val'       # 结果保存到runs/val
+        plots=plots,     # 生成评估图表
+        name=name        # 结果保存到runs/val
     )
     
     # 打印详细结果
     print("\n验证结果:")
-    print(f"mAP@0.5: {results.box.map:.3f}")
-    print(f"mAP@0.5:0.95: {results.box.map75:.3f}")
+    print(f"mAP@0.5: {results.box.map50:.3f}")
+    print(f"mAP@0.5:0.95: {results.box.map:.3f}")
     
     # 打印每个类别的AP
     print("\n各类别AP@0.5:")
-    for i, ap in enumerate(results.box.ap50):
-        print(f"  {model.names[i]}: {ap:.3f}")
+    for class_name, ap in class_ap50(results, model.names).items():
+        print(f"  {class_name}: {ap:.3f}")
+    
+    return results
 
 if __name__ == '__main__':
     validate_model()
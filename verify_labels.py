@@ -1,47 +1,6 @@
 import os
-import glob
-
-def verify_label_file(filepath):
-    """Verify the contents of a single label file"""
-    try:
-        with open(filepath, 'r') as f:
-            content = f.read().strip()
-        
-        if not content:
-            print("[EMPTY] {}".format(os.path.basename(filepath)))
-            return False
-            
-        lines = content.split('\n')
-        for i, line in enumerate(lines, 1):
-            if not line.strip():
-                continue
-                
-            parts = line.strip().split()
-            if len(parts) != 5:
-                print("[INVALID FORMAT] {} - Line {}: Expected 5 values, got {}".format(os.path.basename(filepath), i, len(parts)))
-                return False
-                
-            try:
-                class_id = int(float(parts[0]))
-                x, y, w, h = map(float, parts[1:])
-                
-                if class_id < 0:
-                    print("[NEGATIVE CLASS] {} - Line {}: Class ID is negative".format(os.path.basename(filepath), i))
-                    return False
-                    
-                if not (0 <= x <= 1 and 0 <= y <= 1 and 0 < w <= 1 and 0 < h <= 1):
-                    print("[INVALID BBOX] {} - Line {}: x={}, y={}, w={}, h={}".format(os.path.basename(filepath), i, x, y, w, h))
-                    return False
-                    
-            except ValueError as e:
-                print("[PARSING ERROR] {} - Line {}: {}".format(os.path.basename(filepath), i, str(e)))
-                return False
-                
-        return True
-        
-    except Exception as e:
-        print("[ERROR] {}: {}".format(os.path.basename(filepath), str(e)))
-        return False
+import numpy as np
+from label_index import box_text, load_label_index
 
 def verify_all_labels(directory):
     """Verify all label files in a directory"""
@@ -49,24 +8,43 @@ def verify_all_labels(directory):
         print("Directory not found: {}".format(directory))
         return
         
-    txt_files = glob.glob(os.path.join(directory, '*.txt'))
-    if not txt_files:
+    index = load_label_index(directory)
+    if len(index) == 0:
         print("No .txt files found in {}".format(directory))
         return
         
-    print("\nVerifying {} label files in {}...".format(len(txt_files), directory))
+    print("\nVerifying {} label files in {}...".format(len(index), directory))
+    
+    # First problem of each file, from the index instead of reparsing the text
+    problems = {}
+    for i in np.flatnonzero(index.empty()):
+        problems[i] = (0, "[EMPTY] {}.txt".format(index.stems[i]))
+    for i, line, text, code, message in index.bad_lines:
+        if code == 'bad_field_count':
+            problem = "[INVALID FORMAT] {}.txt - Line {}: {}".format(index.stems[i], line, message)
+        else:
+            problem = "[PARSING ERROR] {}.txt - Line {}: {}".format(index.stems[i], line, message)
+        problems[i] = min(problems.get(i, (line, problem)), (line, problem))
+    labels = index.labels
+    invalid = index.invalid_rows()
+    for row, line in zip(labels[invalid], index.line_numbers[invalid]):
+        i = int(row['image_idx'])
+        if row['cls'] < 0:
+            problem = "[NEGATIVE CLASS] {}.txt - Line {}: Class ID is negative".format(index.stems[i], line)
+        else:
+            problem = "[INVALID BBOX] {}.txt - Line {}: {}".format(index.stems[i], line, box_text(row))
+        problems[i] = min(problems.get(i, (line, problem)), (line, problem))
+    for i in sorted(problems):
+        print(problems[i][1])
     
-    valid_count = 0
-    for filepath in txt_files:
-        if verify_label_file(filepath):
-            valid_count += 1
+    valid_count = len(index) - len(problems)
     
     print("\nResults for {}:".format(directory))
-    print("- Total files: {}".format(len(txt_files)))
+    print("- Total files: {}".format(len(index)))
     print("- Valid files: {}".format(valid_count))
-    print("- Invalid files: {}".format(len(txt_files) - valid_count))
+    print("- Invalid files: {}".format(len(index) - valid_count))
     
-    return valid_count == len(txt_files)
+    return valid_count == len(index)
 
 if __name__ == "__main__":
     # Check training labels
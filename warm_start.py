@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+追踪程序的快速启动
+
+    - 启动时在后台线程中并行导入重量级模块(torch/ultralytics/cv2/mss/pyautogui),
+      与加载模型、读取显示器信息等步骤重叠
+    - 把 .pt 权重导出为已融合(Conv+BN)、已trace的TorchScript, 按权重文件的SHA-256、
+      输入边长和批量缓存到 .warm_cache/, 之后启动直接加载缓存
+    - 预热使用生产输入形状(真实截图经过InputBuffer, 批量=区域数)
+    - StartupTimer 记录各阶段耗时, 用于跟踪冷启动时间
+
+TorchScript缓存的输入尺寸固定, 需要动态输入尺寸(dynamic_imgsz)时不使用缓存。
+
+用法:
+    python warm_start.py --model best.pt --imgsz 640 --batch 1   # 预先生成缓存并比较加载时间
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from inference_backends import TorchEngine, load_engine
+
+DEFAULT_CACHE_DIR = '.warm_cache'
+HEAVY_MODULES = ('torch', 'ultralytics', 'cv2', 'mss', 'pyautogui')
+
+
+class _Phase(object):
+    """StartupTimer.phase()返回的上下文管理器"""
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.begin = None
+
+    def __enter__(self):
+        self.begin = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.phases.append((self.name, time.time() - self.begin))
+        return False
+
+
+class StartupTimer(object):
+    """按顺序记录启动各阶段的耗时"""
+
+    def __init__(self):
+        self.start = time.time()
+        self.phases = []
+
+    def phase(self, name):
+        """
+        用法:
+            with timer.phase('model_load'):
+                ...
+        """
+        return _Phase(self, name)
+
+    def mark(self, name):
+        """记录从启动到现在的总时间, 如'first_frame'"""
+        self.phases.append((name, time.time() - self.start))
+
+    def as_dict(self):
+        info = dict((name, seconds) for name, seconds in self.phases)
+        info['total'] = time.time() - self.start
+        return info
+
+    def report(self):
+        print("启动耗时:")
+        for name, seconds in self.phases:
+            print("  {:<14} {:>8.2f} 秒".format(name, seconds))
+
+
+class ModulePreloader(object):
+    """
+    后台并行导入模块; 主线程随后的import会等待同一模块导入完成, 不会重复导入
+    参数:
+        modules: 模块名列表, 导入失败的模块会被忽略(等真正使用时再报错)
+    """
+
+    def __init__(self, modules=HEAVY_MODULES):
+        self.timings = {}
+        self.errors = {}
+        self._threads = []
+        for name in modules:
+            thread = threading.Thread(target=self._load, args=(name,), name='preload-' + name)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _load(self, name):
+        start = time.time()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            self.errors[name] = str(e)
+        self.timings[name] = time.time() - start
+
+    def wait(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+        return self.timings
+
+
+def file_sha256(path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    权重文件的SHA-256; 按(路径, mtime, size)缓存在 cache_dir/index.json,
+    文件未变化时不重复读取整个文件
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    index_path = os.path.join(cache_dir, 'index.json')
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}
+    entry = index.get(key)
+    if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+        return entry[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    sha = digest.hexdigest()
+    index[key] = [stat.st_mtime, stat.st_size, sha]
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+    return sha
+
+
+def artifact_path(model_path, imgsz=640, batch=1, cache_dir=DEFAULT_CACHE_DIR):
+    """缓存的TorchScript路径, 由权重哈希、输入边长和批量决定"""
+    sha = file_sha256(model_path, cache_dir)
+    name = "{}_{}_{}x{}_b{}.torchscript".format(
+        os.path.splitext(os.path.basename(model_path))[0], sha[:16], imgsz, imgsz, batch)
+    return os.path.join(cache_dir, name)
+
+
+def build_artifact(model_path, target, imgsz=640, batch=1):
+    """导出融合并trace后的TorchScript, 原子地放入缓存目录"""
+    from ultralytics import YOLO
+    print("正在生成启动缓存: {} -> {}".format(model_path, target))
+    exported = YOLO(model_path).export(format='torchscript', imgsz=imgsz, batch=batch)
+    if not os.path.exists(os.path.dirname(target)):
+        os.makedirs(os.path.dirname(target))
+    tmp_path = target + '.tmp'
+    shutil.move(exported, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+class CachedTorchEngine(TorchEngine):
+    """
+    加载缓存的TorchScript; trace时批量和输入尺寸已固定,
+    图像数少于批量时用最后一张补齐, 多于批量时分批推理
+    """
+    dynamic_imgsz = False
+
+    def __init__(self, artifact, source_path, imgsz=640, batch=1, device=None):
+        TorchEngine.__init__(self, artifact, imgsz, device)
+        self.source_path = source_path
+        self.batch = batch
+
+    def infer(self, img, conf=0.25, iou=0.45, imgsz=None):
+        return self.infer_batch([img], conf, iou)[0]
+
+    def infer_batch(self, imgs, conf=0.25, iou=0.45, imgsz=None):
+        imgs = list(imgs)
+        results = []
+        for start in range(0, len(imgs), self.batch):
+            chunk = imgs[start:start + self.batch]
+            padded = chunk + [chunk[-1]] * (self.batch - len(chunk))
+            results.extend(TorchEngine.infer_batch(self, padded, conf, iou)[:len(chunk)])
+        return results
+
+
+def load_cached_engine(backend, model_path, imgsz=640, batch=1, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    加载推理后端; torch后端的 .pt 权重使用(必要时生成)缓存的TorchScript
+    缓存不可用时退回普通加载
+    """
+    if backend != 'torch' or not model_path.endswith('.pt'):
+        return load_engine(backend, model_path, imgsz)
+    try:
+        target = artifact_path(model_path, imgsz, batch, cache_dir)
+        if not os.path.exists(target):
+            build_artifact(model_path, target, imgsz, batch)
+        return CachedTorchEngine(target, model_path, imgsz, batch)
+    except Exception as e:
+        print("[WARNING] 启动缓存不可用, 直接加载 {}: {}".format(model_path, e))
+        return load_engine(backend, model_path, imgsz)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成启动缓存并比较模型加载时间")
+    parser.add_argument('--model', default='best.pt')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch', type=int, default=1, help="批量, 与追踪的区域数一致")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    import numpy as np
+
+    timer = StartupTimer()
+    with timer.phase('imports'):
+        ModulePreloader(('torch', 'ultralytics', 'cv2')).wait()
+    with timer.phase('pt_load'):
+        engine = TorchEngine(args.model, args.imgsz)
+    with timer.phase('pt_warmup'):
+        engine.infer_batch([np.zeros((args.imgsz, args.imgsz, 3), dtype=np.uint8)] * args.batch)
+    with timer.phase('cache_build'):
+        target = artifact_path(args.model, args.imgsz, args.batch, args.cache_dir)
+        if not os.path.exists(target):
+            build_artifact(args.model, target, args.imgsz, args.batch)
+    with timer.phase('cache_load'):
+        cached = load_cached_engine('torch', args.model, args.imgsz, args.batch, args.cache_dir)
+    with timer.phase('cache_warmup'):
+        cached.infer_batch([np.zeros((args.imgsz, args.imgsz, 3), dtype=np.uint8)] * args.batch)
+    timer.report()
+    print("缓存: {}".format(target))
+
+
+if __name__ == '__main__':
+    main()
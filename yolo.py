@@ -4,28 +4,145 @@ import threading
 from pynput import keyboard
 import threading
 from threading import Event
+from pipeline import LatestQueue, StageStats, format_stage_stats
+from roi import RoiState
+from target_tracker import TargetTracker
+from frame_pacer import FramePacer, frame_signature
+from latency_trace import SpanRecorder
+
+
+def _capture_process(ring_name, screen_regions, roi_options, check_interval, idle_interval, stop_event):
+    """
+    独立采集进程: 截屏写入共享内存环形缓冲区, 从反馈区读取目标框更新ROI和帧率
+    参数:
+        ring_name: FrameRing共享内存名称
+        screen_regions: 区域字典列表(全局桌面坐标)
+        roi_options: RoiState参数字典, None表示不使用ROI
+        check_interval, idle_interval: 帧率调度参数
+        stop_event: multiprocessing.Event, 置位后退出
+    """
+    from frame_sources import LiveSource
+    from shared_frames import FrameRing
+    
+    ring = FrameRing(ring_name, create=False)
+    roi_states = [RoiState(area, **roi_options) for area in screen_regions] if roi_options else None
+    pacer = FramePacer(target_period=check_interval, idle_period=idle_interval)
+    source = LiveSource(screen_regions, roi_states)
+    
+    def feedback_loop():
+        # 推理进程写回的目标框: 更新ROI, 看到目标时立即唤醒退避中的采集
+        while not stop_event.is_set():
+            feedback = ring.poll_feedback()
+            if feedback is None:
+                time.sleep(0.002)
+                continue
+            boxes, timestamp, seen = feedback
+            if roi_states is not None:
+                for roi_state, box in zip(roi_states, boxes):
+                    roi_state.update(box, timestamp)
+            pacer.notify_target(seen)
+    
+    feedback_thread = threading.Thread(target=feedback_loop)
+    feedback_thread.daemon = True
+    feedback_thread.start()
+    try:
+        while not stop_event.is_set():
+            try:
+                frame_start = time.time()
+                parts = source.read(frame_start)['parts']
+                ring.write(parts, frame_start)
+                pacer.wait(tuple(frame_signature(part['img']) for part in parts))
+            except Exception as e:
+                print("截屏过程中出错: {}".format(str(e)))
+                time.sleep(1)  # 出错时暂停1秒
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        feedback_thread.join()
+        source.close()
+        ring.close()
+
 
 def start_yolo_follow_optimized(target_class='truck', model_name='yolov8s.pt', 
-                             exit_key=keyboard.Key.esc, check_interval=0.05, confidence=0.4):
+                             exit_key=keyboard.Key.esc, check_interval=0.05, confidence=0.4,
+                             queue_size=1, move_duration=0.1,
+                             roi_mode=False, roi_rescan_interval=30, roi_scale=3.0,
+                             select_policy='largest', imgsz=640, use_tracker=True,
+                             flow_mode=False, max_detect_interval=8, idle_interval=0.25,
+                             skip_static=True, backend='torch', dynamic_imgsz=False, regions=None,
+                             server=None, capture_process=False, trace_file=None,
+                             actuation_rate=240.0, max_mouse_speed=8000.0, max_mouse_accel=60000.0,
+                             mouse_backend=None, frame_source=None, watch_model=False,
+                             startup_cache='.warm_cache'):
     """
     坦克识别与追踪系统
     参数:
         target_class: 要检测的目标类别，默认为'truck'
-        model_name: YOLO模型路径，默认为'yolov8s.pt'
+        model_name: YOLO模型路径，默认为'yolov8s.pt'; onnx/openvino后端可直接给.pt, 会自动使用或导出对应格式
         exit_key: 退出按键，默认为ESC键
-        check_interval: 检测间隔(秒)
+        check_interval: 目标帧周期(秒), 已花费的处理时间会从等待时间中扣除
         confidence: 置信度阈值
+        queue_size: 阶段间队列容量, 满时丢弃最旧的帧
+        move_duration: 光标逼近目标的时间常数(秒), 鼠标由独立的执行器线程插值移动, 不阻塞检测
+        roi_mode: 锁定目标后只截取目标附近区域进行检测
+        roi_rescan_interval: ROI模式下每隔多少帧做一次全屏扫描
+        roi_scale: ROI边长相对目标框边长的倍数
+        select_policy: 目标选择策略, 'largest'(面积最大), 'confidence'(置信度最高),
+                       'crosshair'(离屏幕中心最近), 'previous'(离上一个目标最近), 或自定义打分函数
+        imgsz: 模型输入边长, 截图会按比例缩放到该尺寸的常驻缓冲区
+        use_tracker: 使用卡尔曼跟踪器, 按鼠标到位时刻的预测位置瞄准
+        flow_mode: 每隔N帧检测一次, 中间帧用光流传播目标框, N随目标运动速度自适应
+        max_detect_interval: flow_mode下的最大检测间隔(帧)
+        idle_interval: 画面静止或长时间没有目标时退避到的最长帧周期(秒)
+        skip_static: 推理前做帧差检测, 画面不变时复用上次检测结果, 局部变化时只检测变化区域
+        backend: 推理后端, 'torch'(PyTorch), 'onnx'(ONNX Runtime CPU), 'openvino'(OpenVINO CPU)
+        dynamic_imgsz: 根据上一个目标框大小在320-1280之间切换输入边长, 没有目标时使用imgsz;
+                       仅torch后端支持, 离线选择imgsz见 imgsz_tune.py
+        regions: 要截取的显示器或区域列表, 元素为mss显示器序号(int)或区域字典
+                 {'left', 'top', 'width', 'height'}, 默认[1](主显示器);
+                 多个区域并行截取并合并为一次批量推理, 坐标统一为全局桌面坐标
+        server: 推理服务地址'host:port'(见 inference_server.py), 设置后本进程不加载模型,
+                多个追踪进程共享服务中的同一个模型; backend由服务端决定
+        capture_process: 截屏放到独立进程, 通过共享内存环形缓冲区传递帧(不pickle),
+                         避免与推理的Python前后处理争抢GIL
+        trace_file: 退出时把最近的各阶段时间段导出为Chrome trace/Perfetto JSON文件;
+                    各阶段p50/p95/p99始终在返回的performance_stats['latency']中
+        actuation_rate: 鼠标执行器的控制频率(Hz)
+        max_mouse_speed: 光标最大速度(像素/秒)
+        max_mouse_accel: 光标最大加速度(像素/秒^2)
+        mouse_backend: 光标后端, 默认移动真实光标; 无界面测试可传入 mouse_actuator.FakeBackend()
+        frame_source: 帧来源(见 frame_sources.py), 默认实时截屏regions; 传入VideoSource/ImageDirSource等
+                      时在录制的帧上运行, 读完后退出. 无界面的离线回放请使用 replay.py
+        watch_model: 监视model_name权重文件, 变化后在后台加载、预热并检查新模型,
+                     通过后在两帧之间替换, 失败时继续使用旧模型(见 model_reload.py)
+        startup_cache: torch后端把 .pt 权重导出的TorchScript缓存到该目录, 之后启动直接加载,
+                       None表示不使用; dynamic_imgsz时不使用(见 warm_start.py).
+                       各启动阶段的耗时在返回的performance_stats['startup']中
     """
-    from ultralytics import YOLO
-    import cv2
+    from warm_start import ModulePreloader, StartupTimer, load_cached_engine
+    # 重量级模块在后台并行导入, 与键盘监听、读取显示器信息等步骤重叠
+    timer = StartupTimer()
+    ModulePreloader()
+    
+    import multiprocessing
     import numpy as np
     import mss
-    import pyautogui
     import time
-    import os
+    from box_select import resolve_class_id
+    from frame_processor import FrameProcessor
+    from frame_sources import LiveSource
+    from flow_tracker import FlowPropagator
+    from inference_backends import load_engine
+    from inference_server import RemoteEngine
+    from model_reload import HotSwapEngine
+    from imgsz_tune import DynamicImgsz
+    from mouse_actuator import MouseActuator, PyAutoGuiBackend
     
     stop_flag = {'stop': False}
-    performance_stats = {'fps': 0, 'detection_count': 0}
+    # 各阶段耗时: grab, queue, convert, preprocess, inference, postprocess, select, actuate, capture_to_action
+    spans = SpanRecorder(trace_events=20000 if trace_file else 0)
+    performance_stats = {'fps': 0, 'detection_count': 0, 'stages': {}, 'latency': {}, 'spans': spans}
     
     # 键盘监听回调
     def on_press(key):
@@ -41,33 +158,34 @@ def start_yolo_follow_optimized(target_class='truck', model_name='yolov8s.pt',
     def worker():
         print("正在初始化YOLO模型...")
         try:
-            # 加载模型
-            model = YOLO(model_name)
-            print("模型加载成功: {}".format(model_name))
+            # 加载模型; 固定输入尺寸时torch后端使用启动缓存, 批量与区域数一致
+            batch = len(frame_source.regions) if frame_source is not None else len(regions or [1])
+            use_cache = startup_cache is not None and not dynamic_imgsz
+            
+            def load(path):
+                if use_cache:
+                    return load_cached_engine(backend, path, imgsz, batch, startup_cache)
+                return load_engine(backend, path, imgsz)
+            
+            with timer.phase('model_load'):
+                engine = RemoteEngine(server) if server else load(model_name)
+            print("模型加载成功: {} (后端: {})".format(engine.model_path, engine.name))
+            if watch_model and server:
+                print("警告: 推理服务模式下由服务端负责热更新(inference_server.py --watch)")
+            elif watch_model:
+                engine = HotSwapEngine(load, model_name,
+                                       engine=engine, imgsz=imgsz).start()
+                performance_stats['reload'] = engine.stats
+                print("正在监视权重文件: {}".format(model_name))
             
             # 打印可用类别
-            class_names = model.names
-            print("\n模型支持的类别:")
-            for i, name in class_names.items():
-                print("  {}: {}".format(i, name))
-            
-            # 查找最匹配的类别
-            class_id = None
-            target_lower = target_class.lower()
-            
-            # 先尝试完全匹配
-            for k, v in class_names.items():
-                if v.lower() == target_lower:
-                    class_id = k
-                    break
-            
-            # 如果没有完全匹配，尝试部分匹配
-            if class_id is None:
-                for k, v in class_names.items():
-                    if target_lower in v.lower() or v.lower() in target_lower:
-                        class_id = k
-                        print("警告: 未找到完全匹配的类别，使用最接近的类别:")
-                        break
+            class_names = engine.names
+            print("模型支持的类别: {}".format(", ".join("{}: {}".format(i, name) for i, name in class_names.items())))
+            
+            # 查找最匹配的类别: 先完全匹配, 再部分匹配
+            class_id = resolve_class_id(class_names, target_class)
+            if class_id is not None and class_names[class_id].lower() != target_class.lower():
+                print("警告: 未找到完全匹配的类别，使用最接近的类别:")
             
             if class_id is None:
                 print("提示: 可以尝试使用 'truck' 或 'car' 作为目标类别")
@@ -77,84 +195,276 @@ def start_yolo_follow_optimized(target_class='truck', model_name='yolov8s.pt',
             print("\n正在启动检测...")
             print("按 ESC 键退出程序")
             
-            # 模型预热
+            # 屏幕设置: 所有区域都使用全局桌面坐标
+            screen_regions = []
+            with timer.phase('screen_setup'):
+                if frame_source is not None:
+                    screen_regions = list(frame_source.regions)
+                else:
+                    with mss.mss() as sct:
+                        monitors = sct.monitors
+                    for item in (regions or [1]):
+                        area = monitors[item] if isinstance(item, int) else item
+                        screen_regions.append({
+                            'left': area['left'],
+                            'top': area['top'],
+                            'width': area['width'],
+                            'height': area['height']
+                        })
+            for i, area in enumerate(screen_regions):
+                print("区域{}: ({}, {}) {}x{}".format(i, area['left'], area['top'], area['width'], area['height']))
+            
+            roi_options = {'rescan_interval': roi_rescan_interval, 'scale': roi_scale} if roi_mode else None
+            ring = None
+            if capture_process and frame_source is not None:
+                print("警告: 指定了帧来源, 已关闭独立采集进程")
+                roi_states = [RoiState(area, **roi_options) for area in screen_regions] if roi_mode else None
+            elif capture_process:
+                # 采集进程持有ROI状态, 推理结果经共享内存反馈区写回
+                from shared_frames import FrameRing
+                capacity = sum(area['width'] * area['height'] * 4 for area in screen_regions)
+                ring = FrameRing(slots=4, capacity=capacity, max_parts=len(screen_regions))
+                roi_states = None
+            else:
+                roi_states = [RoiState(area, **roi_options) for area in screen_regions] if roi_mode else None
+            tracker = TargetTracker() if use_tracker else None
+            flow = FlowPropagator(max_interval=max_detect_interval) if flow_mode else None
+            pacer = FramePacer(target_period=check_interval, idle_period=idle_interval)
+            sizer = None
+            if dynamic_imgsz:
+                if engine.dynamic_imgsz:
+                    sizer = DynamicImgsz(default=imgsz)
+                else:
+                    print("警告: {} 后端的输入尺寸固定, 已关闭动态输入尺寸".format(engine.name))
+            
+            # 准星位于第一个区域的中心
+            first = screen_regions[0]
+            crosshair = (first['left'] + first['width'] / 2.0, first['top'] + first['height'] / 2.0)
+            processor = FrameProcessor(engine, class_id, confidence, imgsz, select_policy, crosshair,
+                                       tracker=tracker, flow=flow, sizer=sizer, skip_static=skip_static,
+                                       region_count=len(screen_regions), spans=spans)
+            
+            # 模型预热: 使用生产输入形状, 每个区域一张真实截图经过常驻输入缓冲区, 批量=区域数
             print("正在预热模型...")
-            model(np.zeros((640, 640, 3), dtype=np.uint8))  # 预热推理
-            
-            # 屏幕设置
-            monitor = mss.mss().monitors[1]
-            screen_region = {
-                'left': monitor['left'],
-                'top': monitor['top'],
-                'width': monitor['width'],
-                'height': monitor['height']
+            with timer.phase('warmup'):
+                if frame_source is None:
+                    warmup_source = LiveSource(screen_regions)
+                    try:
+                        warmup_parts = warmup_source.read()['parts']
+                    finally:
+                        warmup_source.close()
+                else:
+                    warmup_parts = [{'img': np.zeros((area['height'], area['width'], 4), dtype=np.uint8)}
+                                    for area in screen_regions]
+                warmup_imgs = [processor.buffers[i].prepare(part['img'], imgsz)[0]
+                               for i, part in enumerate(warmup_parts)]
+                engine.infer_batch(warmup_imgs, conf=confidence, imgsz=imgsz)
+            
+            # 流水线: 采集 -> 推理 -> 执行, 阶段之间用最新帧优先的有界队列连接
+            frame_queue = LatestQueue(queue_size)
+            target_queue = LatestQueue(queue_size)
+            stages = {
+                'capture': StageStats('capture'),
+                'inference': StageStats('inference', frame_queue),
+                'actuation': StageStats('actuation', target_queue),
             }
             
-            # 性能优化
-            frame_count = 0
-            start_time = time.time()
-            last_target = None
+            def capture_loop():
+                """采集阶段: 并行截取所有区域(或读取帧来源), 合并为一帧送入帧队列"""
+                seq = 0
+                source = frame_source or LiveSource(screen_regions, roi_states)
+                try:
+                    while not stop_flag['stop']:
+                        try:
+                            frame_start = time.time()
+                            frame = source.read(frame_start)
+                            if frame is None:
+                                print("帧来源已读完")
+                                stop_flag['stop'] = True
+                                break
+                            parts = frame['parts']
+                            seq += 1
+                            publish_time = time.time()
+                            spans.record('grab', frame_start, publish_time, seq)
+                            frame_queue.put({'seq': seq, 'time': frame_start, 'publish_time': publish_time,
+                                             'parts': parts})
+                            stages['capture'].tick()
+                            
+                            # 按目标帧周期等待, 画面静止或无目标时自动退避
+                            pacer.wait(tuple(frame_signature(part['img']) for part in parts))
+                            
+                        except Exception as e:
+                            print("截屏过程中出错: {}".format(str(e)))
+                            time.sleep(1)  # 出错时暂停1秒
+                finally:
+                    source.close()
+            
+            def next_frame():
+                """取最新帧; 采集进程模式下从共享内存读取, 图像为槽位上的视图"""
+                if ring is None:
+                    frame = frame_queue.get_latest(timeout=0.1)
+                    if frame is not None:
+                        spans.record('queue', frame['publish_time'], time.time(), frame['seq'])
+                    return frame
+                frame = ring.read_latest(timeout=0.1)
+                if frame is not None:
+                    stages['capture'].tick(frame['skipped'] + 1)
+                    # 截屏在采集进程中完成, 用槽位时间戳还原
+                    spans.record('grab', frame['time'], frame['publish_time'], frame['seq'])
+                    spans.record('queue', frame['publish_time'], frame['read_time'], frame['seq'])
+                return frame
             
-            with mss.mss() as sct:
+            def inference_loop():
+                """推理阶段: 取最新帧对所有区域做一次批量YOLO检测, 把最佳目标送入执行队列"""
                 while not stop_flag['stop']:
+                    frame = next_frame()
+                    if frame is None:
+                        continue
                     
                     try:
-                        # 性能计时
-                        frame_start = time.time()
-                        
-                        # 捕获屏幕
-                        screenshot = sct.grab(screen_region)
-                        img = np.array(screenshot)[:, :, :3]
-                        
-                        # YOLO检测
-                        results = model(img, conf=confidence, verbose=False)
-                        
-                        # 处理检测结果
-                        best_target = None
-                        max_area = 0
-                        
-                        if results[0].boxes is not None:
-                            for box in results[0].boxes:
-                                if int(box.cls) == class_id and box.conf > confidence:
-                                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                                    area = (x2 - x1) * (y2 - y1)
-                                    
-                                    # 选择最大的目标
-                                    if area > max_area:
-                                        max_area = area
-                                        best_target = (x1, y1, x2, y2, box.conf)
-                        
-                        # 移动鼠标到目标中心
-                        if best_target:
-                            x1, y1, x2, y2, conf = best_target
-                            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                            pyautogui.moveTo(cx, cy, duration=0.1)
-                            print("检测到目标: 位置({}, {}), 置信度: {:.2f}".format(cx, cy, conf))
+                        try:
+                            result = processor.process(frame)
+                        finally:
+                            intact = ring.release(frame) if ring is not None else True
+                        if not intact:
+                            # 推理期间槽位被采集进程覆盖, 丢弃本帧结果
+                            continue
+                        if 'startup' not in performance_stats:
+                            timer.mark('first_frame')
+                            performance_stats['startup'] = timer.as_dict()
+                            timer.report()
+                        box = result['box']
+                        if box is not None:
+                            x1, y1, x2, y2 = box
+                            target_queue.put({
+                                'seq': frame['seq'],
+                                'time': frame['time'],
+                                'center': ((x1 + x2) // 2, (y1 + y2) // 2),
+                                'conf': result['conf'],
+                                'track_id': result['track_id'],
+                            })
                             performance_stats['detection_count'] += 1
-                            last_target = (cx, cy)
                         
-                        # 性能统计
-                        frame_count += 1
-                        if time.time() - start_time > 1.0:  # 每秒更新FPS
-                            performance_stats['fps'] = frame_count / (time.time() - start_time)
-                            print("FPS: {:.1f}, 检测次数: {}".format(performance_stats['fps'], performance_stats['detection_count']))
-                            frame_count = 0
-                            start_time = time.time()
+                        # 目标只更新所在区域的ROI状态, 其他区域视为未检测到
+                        target_region = result['part']['region'] if result['part'] is not None else None
+                        region_boxes = [box if i == target_region else None for i in range(len(screen_regions))]
+                        if ring is not None:
+                            ring.post_feedback(region_boxes, frame['time'], box is not None)
+                        else:
+                            pacer.notify_target(box is not None)
+                            if roi_states is not None:
+                                for roi_state, region_box in zip(roi_states, region_boxes):
+                                    roi_state.update(region_box, frame['time'])
                         
-                        # 控制检测频率
-                        time.sleep(check_interval)
+                        # 性能统计, 每秒更新一次
+                        if stages['inference'].tick():
+                            performance_stats['fps'] = stages['inference'].fps
+                            performance_stats['stages'] = dict(
+                                (name, stage.snapshot()) for name, stage in stages.items())
+                            print("FPS: {:.1f}, 检测次数: {}".format(performance_stats['fps'], performance_stats['detection_count']))
+                            print("  " + format_stage_stats(performance_stats['stages']))
+                            performance_stats.update(processor.stats())
+                            if ring is not None:
+                                performance_stats['ring'] = ring.snapshot()
+                            else:
+                                performance_stats['pacing'] = pacer.stats()
+                                print("  采集帧率: 目标 {:.1f}, 当前 {:.1f}, 实际 {:.1f}".format(
+                                    performance_stats['pacing']['target_fps'],
+                                    performance_stats['pacing']['current_fps'],
+                                    performance_stats['pacing']['achieved_fps']))
+                            performance_stats['latency'] = spans.summary()
+                            print("  延迟p50/p95/p99(ms): " + spans.format_summary())
+                            if len(screen_regions) > 1:
+                                print("  区域数: {}, 平均批量: {:.2f}".format(
+                                    len(screen_regions), performance_stats['batch_size']))
+                            if roi_states is not None:
+                                roi = {}
+                                for roi_state in roi_states:
+                                    for key, value in roi_state.stats.items():
+                                        roi[key] = roi.get(key, 0) + value
+                                roi['pixel_ratio'] = sum(s.pixel_ratio() for s in roi_states) / len(roi_states)
+                                performance_stats['roi'] = roi
+                                print("  ROI帧: {}, 全屏帧: {}, 平均截取像素比例: {:.2f}".format(
+                                    roi['roi_frames'], roi['full_frames'], roi['pixel_ratio']))
                         
                     except Exception as e:
                         print("检测过程中出错: {}".format(str(e)))
                         time.sleep(1)  # 出错时暂停1秒
+            
+            # 鼠标执行器在自己的线程中以固定频率插值移动光标
+            actuator = MouseActuator(mouse_backend or PyAutoGuiBackend(), rate=actuation_rate,
+                                     move_duration=move_duration, max_speed=max_mouse_speed,
+                                     max_accel=max_mouse_accel, spans=spans)
+            performance_stats['actuator'] = actuator.stats
+            
+            def actuation_loop():
+                """执行阶段: 把最新目标的中心设为执行器的目标点, 不等待鼠标移动"""
+                while not stop_flag['stop']:
+                    target = target_queue.get_latest(timeout=0.1)
+                    if target is None:
                         continue
+                    
+                    try:
+                        cx, cy = target['center']
+                        velocity = (0.0, 0.0)
+                        if tracker is not None and target['track_id'] is not None:
+                            # 延迟补偿: 目标点取当前时刻的预测位置, 并带上速度由执行器继续外推
+                            now = time.time()
+                            tracker.observe_latency(now - target['time'])
+                            predicted = tracker.predict_position(target['track_id'], now)
+                            ahead = tracker.predict_position(target['track_id'], now + 0.05)
+                            if predicted is not None and ahead is not None:
+                                cx, cy = predicted
+                                velocity = ((ahead[0] - cx) / 0.05, (ahead[1] - cy) / 0.05)
+                        # 坐标已是全局桌面坐标, 已包含各显示器的left/top偏移
+                        actuator.set_target(cx, cy, velocity, capture_time=target['time'], frame=target['seq'])
+                        print("检测到目标: 位置({}, {}), 置信度: {:.2f}".format(int(cx), int(cy), target['conf']))
+                        stages['actuation'].tick()
+                        
+                    except Exception as e:
+                        print("移动鼠标时出错: {}".format(str(e)))
+                        time.sleep(1)  # 出错时暂停1秒
+            
+            loops = [inference_loop, actuation_loop]
+            capture_proc = None
+            if ring is not None:
+                capture_stop = multiprocessing.Event()
+                capture_proc = multiprocessing.Process(
+                    target=_capture_process,
+                    args=(ring.name, screen_regions, roi_options, check_interval, idle_interval, capture_stop))
+                capture_proc.daemon = True
+                capture_proc.start()
+                print("采集进程已启动 (pid {}), 共享内存: {}".format(capture_proc.pid, ring.name))
+            else:
+                loops.insert(0, capture_loop)
+            
+            actuator.start()
+            threads = [threading.Thread(target=loop) for loop in loops]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            try:
+                for thread in threads:
+                    thread.join()
+            finally:
+                actuator.stop()
+                if isinstance(engine, HotSwapEngine):
+                    engine.stop()
+                if capture_proc is not None:
+                    capture_stop.set()
+                    capture_proc.join(2)
+                    ring.close()
+                    ring.unlink()
+                if trace_file:
+                    spans.export_chrome_trace(trace_file)
+                    print("延迟trace已保存: {}".format(trace_file))
                         
         except Exception as e:
             print("初始化YOLO模型时发生错误: {}".format(str(e)))
             print("请检查模型文件和依赖项是否正确安装")
             return
         
-        # 主循环已在上面的try块中实现
+        # 流水线已在上面的try块中运行
         print("程序结束")
         return
                 